@@ -0,0 +1,83 @@
+"""
+Size and speed of the cache codecs for a large London listing, compared to the legacy JSON format.
+
+    python -m benchmarks.codec_bench --events 500
+"""
+import argparse
+import json
+import logging
+import time
+from datetime import date
+
+from benchmarks.fixture_pages import FixturePages
+from lndngigs.codecs import get_codec, encode_events, decode_events, CodecException
+from lndngigs.event_listing import SongkickScraper
+
+
+def get_events(events_count):
+    pages = FixturePages()
+    return [
+        SongkickScraper.parse_event_page(
+            logging.getLogger("benchmark"),
+            "http://www.songkick.com/concerts/{}-event".format(n),
+            pages.get("http://www.songkick.com/concerts/{}-event".format(n)).decode("utf-8"),
+            date.today()
+        )
+        for n in range(events_count)
+    ]
+
+
+def measure(encode, decode, repeat):
+    encode_timings, decode_timings = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        data = encode()
+        encode_timings.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        decode(data)
+        decode_timings.append(time.perf_counter() - start)
+
+    return {
+        "bytes": len(data),
+        "encode_ms": round(min(encode_timings) * 1000, 3),
+        "decode_ms": round(min(decode_timings) * 1000, 3),
+    }
+
+
+def main(events_count, repeat):
+    events = get_events(events_count)
+    events_date = date.today()
+
+    def legacy_decode(data):
+        # What CachedEventListing used to do: json then a namedtuple per event, artist and venue
+        return decode_events(data, events_date)
+
+    results = {
+        "legacy_json": measure(
+            lambda: json.dumps({"cached_at": time.time(), "events": [event.to_dict() for event in events]}).encode("utf-8"),
+            legacy_decode,
+            repeat
+        )
+    }
+
+    for name in ("json", "msgpack", "json+zlib", "msgpack+zlib"):
+        try:
+            codec = get_codec(name)
+        except CodecException:
+            continue
+        results[name] = measure(
+            lambda: encode_events(events, time.time(), codec),
+            lambda data: decode_events(data, events_date),
+            repeat
+        )
+
+    return {"events": events_count, "codecs": results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    print(json.dumps(main(args.events, args.repeat), indent=2))
@@ -0,0 +1,100 @@
+"""
+Memory per 1,000 decoded events, with the former namedtuple entities (an instance `__dict__`, no sharing)
+versus the slotted ones, with and without interning; and `/gigs` body serialization throughput,
+dictionaries + json.dumps versus the direct encoder.
+
+    python -m benchmarks.entity_bench --events 1000
+"""
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+from collections import namedtuple
+from datetime import date
+
+from benchmarks.codec_bench import get_events
+from lndngigs.codecs import get_codec, encode_events, decode_events, render_events_json, HEADER
+from lndngigs.entities import Event, Venue, Artist
+
+
+class LegacyEvent(namedtuple("LegacyEvent", ["link", "artists", "venue", "date"])):
+    pass
+
+
+class LegacyVenue(namedtuple("LegacyVenue", ["url", "name", "address"])):
+    pass
+
+
+class LegacyArtist(namedtuple("LegacyArtist", ["url", "name"])):
+    pass
+
+
+def build_events(packed_events, event_class, artist_class, venue_class):
+    return [
+        event_class(
+            link=link,
+            artists=[artist_class(url=artist[0], name=artist[1]) for artist in artists],
+            venue=venue_class(url=venue[0], name=venue[1], address=venue[2]) if venue else None,
+            date=date.today()
+        )
+        for link, artists, venue in packed_events
+    ]
+
+
+def measure_memory(decode):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        events = decode()
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"bytes_per_1000_events": int(size * 1000 / len(events))}
+
+
+def measure_throughput(render, events_count, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = render()
+        timings.append(time.perf_counter() - start)
+    return {
+        "bytes": len(body),
+        "best_ms": round(min(timings) * 1000, 3),
+        "events_per_s": int(events_count / min(timings)),
+    }
+
+
+def main(events_count, repeat):
+    codec = get_codec("json")
+    data = encode_events(get_events(events_count), time.time(), codec)
+    events, _ = decode_events(data, date.today())
+
+    def load_packed_events():
+        return codec.loads(data[HEADER.size:])
+
+    memory = {
+        "namedtuple": measure_memory(lambda: build_events(load_packed_events(), LegacyEvent, LegacyArtist, LegacyVenue)),
+        "slotted": measure_memory(lambda: build_events(load_packed_events(), Event, Artist, Venue)),
+        "slotted_interned": measure_memory(lambda: decode_events(data, date.today())[0]),
+    }
+
+    serialization = {
+        "to_dict_json_dumps": measure_throughput(
+            lambda: json.dumps({"gigs": [event.to_dict() for event in events]}, separators=(",", ":")).encode("utf-8"),
+            events_count,
+            repeat
+        ),
+        "direct_encoder": measure_throughput(lambda: render_events_json(events), events_count, repeat),
+    }
+
+    return {"events": events_count, "memory": memory, "serialization": serialization}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    print(json.dumps(main(args.events, args.repeat), indent=2))
@@ -0,0 +1,38 @@
+import os
+import re
+import zlib
+
+FIXTURES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests", "fixtures", "songkick")
+
+
+class FixturePages:
+    """
+    Synthetic pages laid out like Songkick's (not recorded from the live site): metro area urls are mapped
+    to the listing page matching their `page` parameter, concert urls to one of the concert pages.
+    """
+    def __init__(self, path=FIXTURES_PATH):
+        self._listing_pages = {}
+        self._concert_pages = []
+        for file_name in sorted(os.listdir(path)):
+            with open(os.path.join(path, file_name), "rb") as f:
+                content = f.read()
+            if file_name.startswith("metro-area-page-"):
+                self._listing_pages[int(re.search(r"(\d+)", file_name).group(1))] = content
+            elif file_name.startswith("concert-"):
+                self._concert_pages.append(content)
+
+    @property
+    def listing_pages(self):
+        return [self._listing_pages[page] for page in sorted(self._listing_pages)]
+
+    @property
+    def concert_pages(self):
+        return list(self._concert_pages)
+
+    def get(self, url) -> bytes:
+        if "/metro-areas/" in url:
+            page = re.search(r"[?&]page=(\d+)", url)
+            return self._listing_pages.get(int(page.group(1)) if page else 1, b"")
+        if "/concerts/" in url:
+            return self._concert_pages[zlib.crc32(url.encode("utf-8")) % len(self._concert_pages)]
+        raise KeyError(url)
@@ -0,0 +1,78 @@
+"""
+Compares the per-URL `ClientSession` the scraper used to open with the pooled `HttpClient`.
+
+    python -m benchmarks.http_client_bench --requests 2000 --latency 0.005
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from aiohttp import ClientSession
+
+from benchmarks.stub_server import StubServer
+from lndngigs.async_event_listing import HttpClient
+
+
+async def fetch_url_new_session(url):
+    # What `fetch_url` used to do: one session (thus one connection pool) per URL
+    async with ClientSession() as session:
+        async with session.get(url) as response:
+            return (await response.read()).decode("utf-8")
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+async def run_scenario(fetch, urls):
+    latencies = []
+
+    async def timed_fetch(url):
+        start = time.perf_counter()
+        await fetch(url)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[timed_fetch(url) for url in urls])
+    elapsed = time.perf_counter() - start
+
+    return {
+        "requests": len(urls),
+        "elapsed_s": round(elapsed, 4),
+        "requests_per_s": round(len(urls) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+async def main(requests, latency, concurrency):
+    async with StubServer(latency=latency) as server:
+        urls = ["{}/concerts/{}".format(server.base_url, n) for n in range(requests)]
+
+        # The unbounded baseline can exhaust local file descriptors, cap it to `concurrency` * 10 sessions
+        semaphore = asyncio.Semaphore(concurrency * 10)
+
+        async def unpooled(url):
+            async with semaphore:
+                return await fetch_url_new_session(url)
+
+        before = await run_scenario(unpooled, urls)
+
+        http_client = HttpClient(concurrency=concurrency, limit_per_host=concurrency)
+        try:
+            after = await run_scenario(http_client.fetch_url, urls)
+        finally:
+            await http_client.close()
+
+    return {"session_per_url": before, "pooled_http_client": after}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.005)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(main(args.requests, args.latency, args.concurrency)), indent=2))
@@ -0,0 +1,94 @@
+"""
+Crawl wall-time of the London listing fixture, parsing in the event loop versus thread and process pools.
+Pages are served from memory so that the crawl is bound by parsing only.
+Also compares the parser backends on single pages.
+
+    python -m benchmarks.parse_bench --repeat 3 --workers 1 2 4
+"""
+import argparse
+import asyncio
+import json
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date
+
+from benchmarks.fixture_pages import FixturePages
+from lndngigs.async_event_listing import AsyncEventListingLite
+from lndngigs.event_listing import SongkickScraper
+
+
+class FixtureEventListing(AsyncEventListingLite):
+    def __init__(self, fixture_pages: FixturePages, **kwargs):
+        super().__init__(logger=logging.getLogger("benchmark"), event_loop=None, **kwargs)
+        self._fixture_pages = fixture_pages
+
+    async def fetch_url(self, url):
+        await asyncio.sleep(0)
+        return self._fixture_pages.get(url)
+
+
+async def crawl(fixture_pages, parse_executor):
+    event_listing = FixtureEventListing(fixture_pages, parse_executor=parse_executor)
+    start = time.perf_counter()
+    events = [event async for event in event_listing.iter_events("24426-uk-london", date.today())]
+    return time.perf_counter() - start, len(events)
+
+
+def run_scenario(fixture_pages, parse_executor, repeat):
+    timings = []
+    for _ in range(repeat):
+        elapsed, events_count = asyncio.run(crawl(fixture_pages, parse_executor))
+        timings.append(elapsed)
+    return {"events": events_count, "best_s": round(min(timings), 4), "mean_s": round(sum(timings) / len(timings), 4)}
+
+
+def parse_only(fixture_pages, repeat):
+    concert_pages = [page.decode("utf-8") for page in fixture_pages.concert_pages] * 20
+    listing_pages = [page.decode("utf-8") for page in fixture_pages.listing_pages] * 20
+    results = {}
+
+    for parser in ("css", "xpath"):
+        parse_event_page = getattr(SongkickScraper, "parse_event_page_{}".format(parser))
+        parse_event_listing_page = getattr(SongkickScraper, "parse_event_listing_page_{}".format(parser))
+        event_page_timings, listing_page_timings = [], []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for content in concert_pages:
+                parse_event_page("http://www.songkick.com/concerts/1", content, date.today())
+            event_page_timings.append((time.perf_counter() - start) / len(concert_pages))
+
+            start = time.perf_counter()
+            for content in listing_pages:
+                parse_event_listing_page("http://www.songkick.com/metro-areas/24426-uk-london", content)
+            listing_page_timings.append((time.perf_counter() - start) / len(listing_pages))
+
+        results[parser] = {
+            "event_page_us": round(min(event_page_timings) * 1e6, 1),
+            "listing_page_us": round(min(listing_page_timings) * 1e6, 1),
+        }
+
+    return results
+
+
+def main(repeat, workers):
+    fixture_pages = FixturePages()
+    results = {"parse_only": parse_only(fixture_pages, repeat), "inline": run_scenario(fixture_pages, None, repeat)}
+
+    for max_workers in workers:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results["threads_{}".format(max_workers)] = run_scenario(fixture_pages, executor, repeat)
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            # Warm up the worker processes, so that their start-up time is not measured
+            list(executor.map(abs, range(max_workers)))
+            results["processes_{}".format(max_workers)] = run_scenario(fixture_pages, executor, repeat)
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+    print(json.dumps(main(args.repeat, args.workers), indent=2))
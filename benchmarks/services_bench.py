@@ -0,0 +1,95 @@
+"""
+Flask request handling with listings built on every request (each request thread running crawls in its own event loop,
+with its own http session) versus the application-scoped services (one background event loop shared by all threads).
+Reports the construction cost per request and at startup, and the throughput of a threaded worker on cache misses.
+
+    python -m benchmarks.services_bench --requests 200 --threads 32 --days 28
+"""
+import argparse
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+import fakeredis
+
+from benchmarks.fixture_pages import FixturePages
+from benchmarks.stub_server import StubServer, BackgroundStubServer
+from benchmarks.web_load_bench import percentile, stubbed_upstream
+from lndngigs.factories import get_event_listing_lite
+from lndngigs.services import Services
+
+LOCATION = "24426-uk-london"
+
+
+def measure_construction(build, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        build()
+    return round((time.perf_counter() - start) / repeat * 1000000, 1)
+
+
+def run_requests(get_event_listing, requests, threads, days):
+    latencies = []
+
+    def handle(n):
+        start = time.perf_counter()
+        events = list(get_event_listing().get_events(LOCATION, date.today() + timedelta(days=n % days)))
+        latencies.append(time.perf_counter() - start)
+        return len(events)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(handle, range(requests)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "requests_per_s": round(requests / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+def per_request(logger, redis_client, requests, threads, days, repeat):
+    def build():
+        return get_event_listing_lite(logger=logger, redis_client=redis_client)
+
+    results = {"startup_ms": 0.0, "construction_us": measure_construction(build, repeat)}
+    results.update(run_requests(build, requests, threads, days))
+    return results
+
+
+def application_scoped(logger, redis_client, requests, threads, days, repeat):
+    start = time.perf_counter()
+    services = Services(logger=logger, redis_client=redis_client)
+    results = {"startup_ms": round((time.perf_counter() - start) * 1000, 3)}
+    try:
+        results["construction_us"] = measure_construction(services.get_event_listing, repeat)
+        results.update(run_requests(services.get_event_listing, requests, threads, days))
+    finally:
+        services.close()
+    return results
+
+
+def main(requests, threads, days, latency, jitter, repeat=1000):
+    logger = logging.getLogger("benchmark")
+    results = {}
+    for name, run in (("per_request", per_request), ("application_scoped", application_scoped)):
+        with BackgroundStubServer(StubServer(pages=FixturePages(), latency=latency, jitter=jitter, seed=1)) as stub_server:
+            # Both start from a cold cache
+            with stubbed_upstream(stub_server):
+                results[name] = run(logger, fakeredis.FakeRedis(), requests, threads, days, repeat)
+            results[name]["upstream_requests"] = stub_server.requests_count
+    return {"requests": requests, "threads": threads, "days": days, "results": results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--days", type=int, default=28)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--jitter", type=float, default=0.01)
+    args = parser.parse_args()
+    print(json.dumps(main(args.requests, args.threads, args.days, args.latency, args.jitter), indent=2))
@@ -0,0 +1,130 @@
+import asyncio
+import random
+import threading
+
+from aiohttp import web
+
+from benchmarks.fixture_pages import FixturePages
+from lndngigs.async_event_listing import HttpClient, Page
+from lndngigs.codecs import get_etag
+
+
+class StubServer:
+    """
+    Local stand-in for an upstream HTTP server.
+    GET requests are answered with the matching fixture page (or with `body` if no pages are given)
+    after `latency` seconds, plus up to `jitter` seconds; a fraction `error_rate` of the requests fails with a 503
+    and a fraction `stall_rate` of the requests stalls for `stall` seconds before being answered.
+    Requests for any of the `failing_paths` always fail with a 503.
+    """
+    def __init__(self, body=b"<html><body>Hello from the stub server</body></html>", pages: FixturePages = None,
+                 latency=0.01, jitter=0.0, error_rate=0.0, stall_rate=0.0, stall=30.0, seed=None, host="127.0.0.1", port=0,
+                 failing_paths=()):
+        self._body = body
+        self._failing_paths = set(failing_paths)
+        self._pages = pages
+        self._latency = latency
+        self._jitter = jitter
+        self._error_rate = error_rate
+        self._stall_rate = stall_rate
+        self._stall = stall
+        self._random = random.Random(seed)
+        self._host = host
+        self._port = port
+        self._runner = None
+        self._stopping = None
+        self.requests_count = 0
+        self.errors_count = 0
+        self.stalls_count = 0
+
+    @property
+    def base_url(self):
+        return "http://{}:{}".format(self._host, self._port)
+
+    async def handle(self, request):
+        self.requests_count += 1
+        delay = self._latency + self._random.uniform(0, self._jitter)
+        if self._random.random() < self._stall_rate:
+            self.stalls_count += 1
+            # Stalled requests are released when the server stops
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self._stall)
+            except asyncio.TimeoutError:
+                pass
+        if delay:
+            await asyncio.sleep(delay)
+        if str(request.rel_url) in self._failing_paths or self._random.random() < self._error_rate:
+            self.errors_count += 1
+            return web.Response(status=503, text="Service Unavailable")
+        if self._pages is None:
+            return web.Response(body=self._body, content_type="text/html")
+        try:
+            body = self._pages.get(str(request.rel_url))
+        except KeyError:
+            return web.Response(status=404, text="Not Found")
+        # Fixture pages never change: conditional requests are answered with a 304
+        etag = '"{}"'.format(get_etag(body))
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+        return web.Response(body=body, content_type="text/html", charset="utf-8", headers={"ETag": etag})
+
+    async def start(self):
+        self._stopping = asyncio.Event()
+        app = web.Application()
+        app.router.add_get("/{path:.*}", self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self._host, self._port)
+        await site.start()
+        self._port = self._runner.addresses[0][1]
+        return self
+
+    async def stop(self):
+        self._stopping.set()
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *args):
+        await self.stop()
+
+
+class BackgroundStubServer:
+    """
+    Runs a StubServer in its own thread and event loop, for clients that are not asyncio based
+    """
+    def __init__(self, stub_server: StubServer):
+        self.stub_server = stub_server
+        self._event_loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._event_loop.run_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self.stub_server.start(), self._event_loop).result()
+        return self.stub_server
+
+    def __exit__(self, *args):
+        asyncio.run_coroutine_threadsafe(self.stub_server.stop(), self._event_loop).result()
+        self._event_loop.call_soon_threadsafe(self._event_loop.stop)
+        self._thread.join()
+
+
+class StubHttpClient(HttpClient):
+    """
+    Sends the requests for Songkick pages to the stub server instead
+    """
+    SONGKICK_ORIGINS = ("https://www.songkick.com", "http://www.songkick.com")
+
+    def __init__(self, base_url, **kwargs):
+        super().__init__(**kwargs)
+        self._base_url = base_url
+
+    async def fetch_page(self, url, etag=None, last_modified=None) -> Page:
+        for origin in self.SONGKICK_ORIGINS:
+            if url.startswith(origin):
+                url = self._base_url + url[len(origin):]
+                break
+        return await super().fetch_page(url, etag=etag, last_modified=last_modified)
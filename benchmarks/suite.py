@@ -0,0 +1,167 @@
+"""
+Offline end-to-end benchmark suite: Songkick-like fixture pages are served by a local stub server
+and Redis is replaced by fakeredis (unless REDIS_URL is set). Results are emitted as JSON.
+
+    python -m benchmarks --output bench.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import subprocess
+import time
+from datetime import date
+
+import fakeredis
+import redis
+
+from benchmarks import entity_bench, services_bench
+from benchmarks.parse_bench import parse_only
+from benchmarks.fixture_pages import FixturePages
+from benchmarks.stub_server import StubServer, BackgroundStubServer, StubHttpClient
+from benchmarks.web_load_bench import percentile, load_test, stubbed_upstream, serve_flask, serve_aiohttp, gigs_urls
+from lndngigs.async_event_listing import AsyncEventListingLite
+from lndngigs.event_listing import CachedEventListing
+
+LOCATION = "24426-uk-london"
+
+
+def summarise_latencies(latencies):
+    return {
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "max_ms": round(max(latencies) * 1000, 3),
+    }
+
+
+def get_redis_client():
+    return redis.from_url(os.environ["REDIS_URL"]) if "REDIS_URL" in os.environ else fakeredis.FakeRedis()
+
+
+# Every tier that makes a crawl cheaper: listings (and their index), concert pages, page versions and artists
+CACHE_KEY_PATTERNS = ("events-lite:*", "concerts:*", "pages:*", "artists:*")
+
+
+def get_cold_redis_client(redis_client):
+    """
+    A new fakeredis, or the REDIS_URL one without any of the cached keys
+    """
+    if "REDIS_URL" not in os.environ:
+        return fakeredis.FakeRedis()
+    for pattern in CACHE_KEY_PATTERNS:
+        for key_name in redis_client.scan_iter(pattern):
+            redis_client.delete(key_name)
+    return redis_client
+
+
+def cold_crawl(pages, latency, jitter, error_rate, repeat):
+    async def crawl():
+        async with StubServer(pages=pages, latency=latency, jitter=jitter, error_rate=error_rate, seed=1) as server:
+            http_client = StubHttpClient(server.base_url)
+            event_listing = AsyncEventListingLite(logger=logging.getLogger("benchmark"), event_loop=None, http_client=http_client)
+            start = time.perf_counter()
+            first_event_at = None
+            events_count = 0
+            async for _ in event_listing.iter_events(LOCATION, date.today()):
+                first_event_at = first_event_at or time.perf_counter() - start
+                events_count += 1
+            elapsed = time.perf_counter() - start
+            await http_client.close()
+            return elapsed, first_event_at, events_count, server.requests_count
+
+    runs = [asyncio.run(crawl()) for _ in range(repeat)]
+    return {
+        "events": runs[0][2],
+        "upstream_requests": runs[0][3],
+        "best_s": round(min(run[0] for run in runs), 4),
+        "mean_s": round(sum(run[0] for run in runs) / len(runs), 4),
+        "time_to_first_event_s": round(min(run[1] for run in runs), 4),
+    }
+
+
+def warm_cache_hit(pages, redis_client, requests):
+    event_listing = CachedEventListing(
+        logger=logging.getLogger("benchmark"),
+        event_listing=None,
+        redis_client=redis_client,
+        cache_key_prefix="benchmark-{}".format(time.time())
+    )
+
+    # Warm up the cache with the listing fixture
+    events = [
+        AsyncEventListingLite.parse_event_page(logging.getLogger("benchmark"), "http://www.songkick.com/concerts/{}".format(n), pages.get("http://www.songkick.com/concerts/{}".format(n)).decode("utf-8"), date.today())
+        for n in range(300)
+    ]
+    event_listing.cache_events(LOCATION, date.today(), events)
+
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        assert len(list(event_listing.get_events(LOCATION, date.today()))) == len(events)
+        latencies.append(time.perf_counter() - start)
+
+    return dict(events=len(events), requests=requests, **summarise_latencies(latencies))
+
+
+def concurrent_gigs(pages, redis_client, latency, jitter, concurrency, requests, days):
+    results = {}
+    for name, serve in (("flask", serve_flask), ("aiohttp", serve_aiohttp)):
+        with BackgroundStubServer(StubServer(pages=pages, latency=latency, jitter=jitter, seed=1)) as stub_server:
+            # Both front ends start from a cold cache
+            with stubbed_upstream(stub_server), serve(get_cold_redis_client(redis_client)) as base_url:
+                results[name] = asyncio.run(load_test(gigs_urls(base_url, requests, days), concurrency))
+                results[name]["upstream_requests"] = stub_server.requests_count
+    return results
+
+
+def get_git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL).decode("utf-8").strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(latency=0.02, jitter=0.01, error_rate=0.0, concurrency=20, requests=200, repeat=3):
+    pages = FixturePages()
+    redis_client = get_redis_client()
+
+    return {
+        "meta": {
+            "revision": get_git_revision(),
+            "python": platform.python_version(),
+            "timestamp": time.time(),
+            "redis": "redis" if "REDIS_URL" in os.environ else "fakeredis",
+            "latency": latency,
+            "jitter": jitter,
+            "error_rate": error_rate,
+        },
+        "scenarios": {
+            "cold_crawl": cold_crawl(pages, latency, jitter, error_rate, repeat),
+            "warm_cache_hit": warm_cache_hit(pages, redis_client, requests),
+            "concurrent_gigs": concurrent_gigs(pages, redis_client, latency, jitter, concurrency, requests, days=7),
+            "parse_only": parse_only(pages, repeat),
+            "entities": entity_bench.main(1000, repeat),
+            "services": services_bench.main(requests, concurrency, days=7, latency=latency, jitter=jitter),
+        }
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--jitter", type=float, default=0.01)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="Write the results to this file rather than stdout")
+    args = parser.parse_args()
+
+    results = json.dumps(run(args.latency, args.jitter, args.error_rate, args.concurrency, args.requests, args.repeat), indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(results)
+    else:
+        print(results)
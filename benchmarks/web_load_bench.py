@@ -0,0 +1,132 @@
+"""
+Load test of the Flask front end versus the asyncio-native one, on concurrent cache misses.
+Upstream pages are served by the stub server, Redis is replaced by fakeredis.
+
+    python -m benchmarks.web_load_bench --requests 400 --concurrency 50 --days 28
+"""
+import argparse
+import asyncio
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+import fakeredis
+from aiohttp import ClientSession, web
+from werkzeug.serving import make_server
+
+import lndngigs.factories
+from benchmarks.fixture_pages import FixturePages
+from benchmarks.stub_server import StubServer, BackgroundStubServer, StubHttpClient
+from lndngigs import async_web, web as flask_web
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+async def load_test(urls, concurrency):
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with ClientSession() as session:
+        async def get(url):
+            async with semaphore:
+                start = time.perf_counter()
+                async with session.get(url) as response:
+                    await response.read()
+                    assert response.status == 200, response.status
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*[get(url) for url in urls])
+        elapsed = time.perf_counter() - start
+
+    return {
+        "requests": len(urls),
+        "concurrency": concurrency,
+        "requests_per_s": round(len(urls) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "max_ms": round(max(latencies) * 1000, 3),
+    }
+
+
+@contextmanager
+def stubbed_upstream(stub_server):
+    # The front ends build their scrapers through the factories, which share one http client and local cache per process
+    lndngigs.factories._http_client = StubHttpClient(stub_server.base_url, concurrency=100, limit_per_host=100)
+    lndngigs.factories._local_cache = None
+    try:
+        yield
+    finally:
+        if lndngigs.factories._local_cache is not None:
+            lndngigs.factories._local_cache.stop_listening()
+        lndngigs.factories._http_client = None
+        lndngigs.factories._local_cache = None
+
+
+@contextmanager
+def serve_flask(redis_client):
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    app = flask_web.build_app(logger=logging.getLogger("benchmark"), redis_client=redis_client)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield "http://127.0.0.1:{}".format(server.server_port)
+    finally:
+        server.shutdown()
+        app.extensions["lndngigs"].close()
+
+
+@contextmanager
+def serve_aiohttp(redis_client):
+    event_loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=event_loop.run_forever, daemon=True)
+    thread.start()
+
+    async def start():
+        runner = web.AppRunner(async_web.build_app(logger=logging.getLogger("benchmark"), redis_client=redis_client), access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", 0).start()
+        return runner
+
+    runner = asyncio.run_coroutine_threadsafe(start(), event_loop).result()
+    try:
+        yield "http://127.0.0.1:{}".format(runner.addresses[0][1])
+    finally:
+        asyncio.run_coroutine_threadsafe(runner.cleanup(), event_loop).result()
+        event_loop.call_soon_threadsafe(event_loop.stop)
+        thread.join()
+
+
+def gigs_urls(base_url, requests, days):
+    return [
+        "{}/gigs/london/{}".format(base_url, date.today() + timedelta(days=n % days))
+        for n in range(requests)
+    ]
+
+
+def main(requests, concurrency, days, latency, jitter):
+    results = {}
+    for name, serve in (("flask", serve_flask), ("aiohttp", serve_aiohttp)):
+        with BackgroundStubServer(StubServer(pages=FixturePages(), latency=latency, jitter=jitter, seed=1)) as stub_server:
+            with stubbed_upstream(stub_server), serve(fakeredis.FakeRedis()) as base_url:
+                results[name] = asyncio.run(load_test(gigs_urls(base_url, requests, days), concurrency))
+                results[name]["upstream_requests"] = stub_server.requests_count
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--days", type=int, default=28)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--jitter", type=float, default=0.01)
+    args = parser.parse_args()
+    print(json.dumps(main(args.requests, args.concurrency, args.days, args.latency, args.jitter), indent=2))
@@ -1,50 +1,659 @@
 import asyncio
+import json
+import logging
+import random
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import Executor
 
-from aiohttp import ClientSession
+from aiohttp import ClientError, ClientSession, ClientTimeout, TCPConnector
+from redis.exceptions import RedisError
 
-from lndngigs.event_listing import EventListingInterface, SongkickScraper
+from lndngigs.codecs import get_codec, get_etag, encode_event, decode_event
+from lndngigs.concurrency import AdaptiveLimiter, run_blocking
+from lndngigs.enrichment import ArtistEnricher
+from lndngigs.entities import Event, EntityInterner
+from lndngigs.event_cache import EventPageCache
+from lndngigs.event_listing import EventListingInterface, SongkickScraper, partition_events_by_date
+from lndngigs.metrics import UPSTREAM_FETCH_SECONDS, UPSTREAM_FETCH_BYTES, CRAWL_PAGES
+from lndngigs.revalidation import RevalidationStore, PageVersion
 
+Page = namedtuple("Page", ["status", "content", "etag", "last_modified"])
 
-async def fetch_url(url):
-    async with ClientSession() as session:
-        async with session.get(url) as response:
-            return (await response.read()).decode("utf-8")
+
+def is_overloaded(status):
+    return status == 429 or status >= 500
+
+
+class UpstreamStatusError(ClientError):
+    """
+    Final response (retries included) other than 2xx or 304: its content is not a page to be parsed
+    """
+    def __init__(self, url, status):
+        super().__init__("{} responded with status {}".format(url, status))
+        self.url = url
+        self.status = status
+
+
+class HttpClient:
+    """
+    Long-lived HTTP client shared by all the fetches of a scraper.
+    Connections are pooled and kept alive, DNS lookups are cached and the number of in-flight requests
+    is adapted to the upstream latency and errors (AIMD, up to `concurrency`).
+    Requests have a deadline and are retried with jitter on timeouts, connection errors, 429 and 5xx responses;
+    with `hedge`, a duplicate request is sent when the first one is slower than the recent p95.
+    `before_request` (a coroutine function) is awaited before every request is sent, retries and hedges included.
+    """
+    def __init__(self, concurrency=20, limit_per_host=10, dns_cache_ttl=300, keepalive_timeout=30,
+                 connect_timeout=5, read_timeout=15, request_timeout=20, retries=2, retry_backoff=0.2,
+                 latency_target=2.0, hedge=False, before_request=None):
+        self._concurrency = concurrency
+        self._limit_per_host = limit_per_host
+        self._dns_cache_ttl = dns_cache_ttl
+        self._keepalive_timeout = keepalive_timeout
+        self._timeout = ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+        self._request_timeout = request_timeout
+        self._retries = retries
+        self._retry_backoff = retry_backoff
+        self._latency_target = latency_target
+        self._hedge = hedge
+        self.before_request = before_request
+        # Sessions can only be used within the event loop they were created in
+        self._sessions = {}
+        self.requests_count = 0
+        self.retries_count = 0
+        self.hedged_requests_count = 0
+
+    def _get_session(self):
+        event_loop = asyncio.get_running_loop()
+        session, limiter = self._sessions.get(event_loop, (None, None))
+        if session is None or session.closed:
+            session = ClientSession(
+                connector=TCPConnector(
+                    limit=self._concurrency,
+                    limit_per_host=self._limit_per_host,
+                    ttl_dns_cache=self._dns_cache_ttl,
+                    keepalive_timeout=self._keepalive_timeout,
+                ),
+                timeout=self._timeout,
+            )
+            limiter = AdaptiveLimiter(
+                initial_limit=self._concurrency,
+                max_limit=self._concurrency,
+                latency_target=self._latency_target
+            )
+            self._sessions[event_loop] = session, limiter
+        return session, limiter
+
+    def get_limiter(self) -> AdaptiveLimiter:
+        return self._get_session()[1]
+
+    async def fetch_url(self, url) -> bytes:
+        return (await self.fetch_page(url)).content
+
+    async def fetch_page(self, url, etag=None, last_modified=None) -> Page:
+        """
+        Conditional GET when validators are given: the content of a 304 response is empty.
+        Raises `UpstreamStatusError` if the last attempt is answered with any other status than 2xx or 304.
+        """
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+        session, limiter = self._get_session()
+
+        for attempt in range(self._retries + 1):
+            is_last_attempt = attempt == self._retries
+            try:
+                page = await self._fetch_hedged(session, limiter, url, headers)
+            except (asyncio.TimeoutError, ClientError):
+                if is_last_attempt:
+                    raise
+            else:
+                if 200 <= page.status < 300 or page.status == 304:
+                    return page
+                if is_last_attempt or not is_overloaded(page.status):
+                    raise UpstreamStatusError(url, page.status)
+            self.retries_count += 1
+            # Full jitter, so that failed requests are not retried in lockstep
+            await asyncio.sleep(random.uniform(0, self._retry_backoff * 2 ** attempt))
+
+    async def _fetch_hedged(self, session, limiter, url, headers) -> Page:
+        hedge_after = limiter.get_latency_percentile(95) if self._hedge else None
+        tasks = {asyncio.ensure_future(self._fetch_once(session, limiter, url, headers))}
+        try:
+            if hedge_after is not None:
+                done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+                if not done:
+                    self.hedged_requests_count += 1
+                    tasks.add(asyncio.ensure_future(self._fetch_once(session, limiter, url, headers)))
+
+            while True:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    # The first successful response wins, a failure only counts when there is nothing left to wait for
+                    if not tasks or task.exception() is None:
+                        return task.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _fetch_once(self, session, limiter, url, headers) -> Page:
+        if self.before_request is not None:
+            await self.before_request()
+        await limiter.acquire()
+        self.requests_count += 1
+        start = time.monotonic()
+        try:
+            page = await asyncio.wait_for(self._request(session, url, headers), self._request_timeout)
+        except asyncio.CancelledError:
+            # e.g. the other request of a hedged pair won: nothing learnt about the upstream
+            limiter.release()
+            raise
+        except Exception:
+            limiter.release(time.monotonic() - start, overloaded=True)
+            raise
+        latency = time.monotonic() - start
+        limiter.release(latency, overloaded=is_overloaded(page.status))
+        UPSTREAM_FETCH_SECONDS.observe(latency)
+        UPSTREAM_FETCH_BYTES.observe(len(page.content))
+        return page
+
+    @staticmethod
+    async def _request(session, url, headers) -> Page:
+        async with session.get(url, headers=headers) as response:
+            return Page(
+                status=response.status,
+                content=await response.read(),
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified")
+            )
+
+    async def close(self):
+        session, _ = self._sessions.pop(asyncio.get_running_loop(), (None, None))
+        if session is not None and not session.closed:
+            await session.close()
+
+
+_parser_logger = logging.getLogger("lndngigs")
+
+
+# Parsing can be offloaded to a process pool: only the url and the raw content cross the boundary
+def parse_event_page(url, content: bytes, events_date):
+    return SongkickScraper.parse_event_page(_parser_logger, url, content.decode("utf-8"), events_date)
+
+
+def parse_event_listing_page(url, content: bytes):
+    return SongkickScraper.parse_event_listing_page(_parser_logger, url, content.decode("utf-8"))
+
+
+# Parsed results kept by the revalidation store
+def dump_event(event) -> bytes:
+    return encode_event(event, 0, get_codec("json"))
+
+
+def load_event(data: bytes):
+    return decode_event(data)[0]
+
+
+def dump_event_listing_page(parsed) -> bytes:
+    event_urls, page_urls = parsed
+    return json.dumps([sorted(event_urls), sorted(page_urls)]).encode("utf-8")
+
+
+def load_event_listing_page(data: bytes):
+    event_urls, page_urls = json.loads(data.decode("utf-8"))
+    return set(event_urls), set(page_urls)
+
+
+class PageVersions:
+    """
+    Revalidation store of a single crawl: the versions of the pages linked by a listing page are looked up
+    together (one round-trip per listing page) and the new versions are written back together once the crawl is over.
+    When Redis is unavailable, pages are just downloaded and parsed again.
+    """
+    def __init__(self, revalidation_store: RevalidationStore, logger=None):
+        self._revalidation_store = revalidation_store
+        self._logger = logger or logging.getLogger("lndngigs")
+        self._lookups = {}
+        self._updates = {}
+
+    def _get_many(self, urls):
+        try:
+            return self._revalidation_store.get_many(urls)
+        except RedisError as ex:
+            self._logger.warning("Page versions not available ({!r})".format(ex))
+            return {}
+
+    def _set_many(self, versions):
+        try:
+            self._revalidation_store.set_many(versions)
+        except RedisError as ex:
+            self._logger.warning("{} page versions not stored ({!r})".format(len(versions), ex))
+
+    def prefetch(self, urls):
+        urls = [url for url in urls if url not in self._lookups]
+        if urls:
+            lookup = asyncio.ensure_future(run_blocking(self._get_many, urls))
+            self._lookups.update((url, lookup) for url in urls)
+
+    async def get(self, url) -> PageVersion:
+        self.prefetch([url])
+        return (await self._lookups[url]).get(url)
+
+    def set(self, url, version: PageVersion):
+        self._updates[url] = version
+
+    async def flush(self):
+        for lookup in self._lookups.values():
+            lookup.cancel()
+        updates, self._updates = self._updates, {}
+        if updates:
+            await run_blocking(self._set_many, updates)
+
+
+class CrawlStats:
+    def __init__(self):
+        self.listing_pages = 0
+        self.event_pages = 0
+        self.pages_fetched = 0
+        self.bytes_fetched = 0
+        self.not_modified = 0
+        self.saved_bytes = 0
+        self.saved_parses = 0
+        self.failed_pages = 0
+        # Some pages could not be scraped (errors, or the crawl deadline passed)
+        self.partial = False
+
+    def to_dict(self):
+        return dict(vars(self))
+
+
+_thread_local = threading.local()
+
+
+def get_thread_event_loop():
+    """
+    Event loop private to the calling thread
+    """
+    event_loop = getattr(_thread_local, "event_loop", None)
+    if event_loop is None or event_loop.is_closed():
+        event_loop = _thread_local.event_loop = asyncio.new_event_loop()
+    return event_loop
+
+
+def is_running_in(event_loop):
+    """
+    Whether the calling code runs within `event_loop`
+    """
+    try:
+        return asyncio.get_running_loop() is event_loop
+    except RuntimeError:
+        return False
 
 
 class AsyncEventListingLite(SongkickScraper, EventListingInterface):
-    def __init__(self, logger, event_loop):
+    def __init__(self, logger, event_loop, http_client: HttpClient = None, parse_executor: Executor = None,
+                 event_cache: EventPageCache = None, revalidation_store: RevalidationStore = None, crawl_timeout=None,
+                 enricher: ArtistEnricher = None):
+        """
+        Pages are parsed in the event loop unless a `parse_executor` is given
+        (a process pool, or a thread pool since lxml releases the GIL while parsing).
+        Concert pages found in the `event_cache` are not fetched at all,
+        other pages are revalidated (conditional GET) against the `revalidation_store`.
+        Crawls taking longer than `crawl_timeout` seconds stop with partial results.
+        With an `enricher`, artists metadata is added once the crawl is over: events are not streamed anymore.
+        """
         self._logger = logger
         self._event_loop = event_loop
+        self._event_loop_thread = threading.current_thread()
+        self._http_client = http_client or HttpClient()
+        self._parse_executor = parse_executor
+        self._event_cache = event_cache
+        self._revalidation_store = revalidation_store
+        self._crawl_timeout = crawl_timeout
+        self._enricher = enricher
+        self.last_crawl_stats = None
 
-    async def scrape_event(self, events_date, url):
-        return self.parse_event_page(self._logger, url, await fetch_url(url), events_date)
+    async def fetch_url(self, url) -> bytes:
+        return await self._http_client.fetch_url(url)
 
-    async def scrape_event_listing_page(self, events_date, url):
-        event_urls, page_urls = self.parse_event_listing_page(self._logger, url, await fetch_url(url))
-        return await asyncio.gather(*[self.scrape_event(events_date, url) for url in event_urls]), page_urls
+    async def fetch_page(self, url, etag=None, last_modified=None) -> Page:
+        return await self._http_client.fetch_page(url, etag=etag, last_modified=last_modified)
 
-    async def scrape_events(self, events_date, url):
-        scraped_page_urls = set()
-        discovered_page_urls = {url}
-        all_events = []
+    async def parse(self, parse_function, *args):
+        if self._parse_executor is None:
+            return parse_function(*args)
+        return await asyncio.get_running_loop().run_in_executor(self._parse_executor, parse_function, *args)
 
-        while discovered_page_urls:
-            scraping_tasks = [self.scrape_event_listing_page(events_date, url) for url in discovered_page_urls]
+    def get_page_versions(self) -> PageVersions:
+        return PageVersions(self._revalidation_store, self._logger) if self._revalidation_store is not None else None
 
-            # Scrape the discovered pages
-            for page_events, new_page_urls in await asyncio.gather(*scraping_tasks):
-                # Adds the discovered to the scraped set
-                scraped_page_urls |= set(discovered_page_urls)
-                discovered_page_urls = {
-                    url for url in new_page_urls
-                    if url not in scraped_page_urls
-                    and "page=1" not in url  # This will prevent the first page from being scraped twice
-                }
-                all_events += page_events
+    async def scrape_page(self, url, parse_function, args, dump, load, stats: CrawlStats, versions: PageVersions = None):
+        """
+        Pages not modified since the last crawl (304, or same body) are not parsed again: the previous result is reused.
+        Page versions are read from and written to the crawl `versions`, when not given they are flushed straight away.
+        """
+        if self._revalidation_store is None:
+            content = await self.fetch_url(url)
+            stats.pages_fetched += 1
+            stats.bytes_fetched += len(content)
+            return await self.parse(parse_function, url, content, *args)
 
-        return all_events
+        if versions is None:
+            versions = self.get_page_versions()
+            try:
+                return await self.scrape_page(url, parse_function, args, dump, load, stats, versions)
+            finally:
+                await versions.flush()
 
-    def get_events(self, location, events_date):
-        yield from self._event_loop.run_until_complete(
-            self.scrape_events(events_date, self.get_events_listing_url(location, events_date))
+        version = await versions.get(url)
+        page = await self.fetch_page(
+            url,
+            etag=version.etag if version else None,
+            last_modified=version.last_modified if version else None
+        )
+        stats.pages_fetched += 1
+        stats.bytes_fetched += len(page.content)
+
+        if version is not None:
+            if page.status == 304:
+                stats.not_modified += 1
+                stats.saved_bytes += version.content_length
+                stats.saved_parses += 1
+                return load(version.parsed)
+            if get_etag(page.content) == version.body_hash:
+                stats.saved_parses += 1
+                if (page.etag, page.last_modified) != (version.etag, version.last_modified):
+                    versions.set(url, version._replace(etag=page.etag, last_modified=page.last_modified))
+                return load(version.parsed)
+
+        parsed = await self.parse(parse_function, url, page.content, *args)
+        if page.status == 200:
+            versions.set(url, PageVersion(
+                etag=page.etag,
+                last_modified=page.last_modified,
+                body_hash=get_etag(page.content),
+                content_length=len(page.content),
+                parsed=dump(parsed)
+            ))
+        return parsed
+
+    async def scrape_event(self, events_date, url, stats: CrawlStats = None, versions: PageVersions = None):
+        stats = stats or CrawlStats()
+        stats.event_pages += 1
+        event = await self.scrape_page(url, parse_event_page, (events_date,), dump_event, load_event, stats, versions)
+        if events_date is not None and event.date != events_date:
+            event = event._replace(date=events_date)
+        return event
+
+    async def scrape_event_listing_page(self, url, stats: CrawlStats = None, versions: PageVersions = None):
+        stats = stats or CrawlStats()
+        stats.listing_pages += 1
+        return await self.scrape_page(
+            url, parse_event_listing_page, (), dump_event_listing_page, load_event_listing_page, stats, versions
+        )
+
+    async def get_cached_events(self, events_date, event_urls):
+        if self._event_cache is None or not event_urls:
+            return []
+        try:
+            cached_events = await run_blocking(self._event_cache.get_events, event_urls)
+        except RedisError as ex:
+            # The concert pages are scraped instead
+            self._logger.warning("Cached concert pages not available ({!r})".format(ex))
+            return []
+        return [
+            # Listings by date know better: the cached event might come from a date range listing
+            event if events_date is None else event._replace(date=events_date)
+            for event in cached_events.values()
+        ]
+
+    async def cache_scraped_events(self, events):
+        """
+        Concert pages scraped by a crawl are cached together, once the crawl is over.
+        Pages that did not parse into a complete event (no artists or no venue) are left out.
+        """
+        events = [event for event in events if event.artists and event.venue is not None]
+        if self._event_cache is not None and events:
+            try:
+                await run_blocking(self._event_cache.cache_events, events)
+            except RedisError as ex:
+                self._logger.warning("{} concert pages not cached ({!r})".format(len(events), ex))
+
+    async def crawl_events(self, events_date, url, stats: CrawlStats = None):
+        """
+        Work-queue crawl: listing and event pages are scheduled as soon as they are discovered
+        (the global concurrency budget is enforced by the http client) and events are yielded as soon as they are parsed.
+        Pages that cannot be scraped, or are still pending when the crawl deadline passes, are skipped and the
+        crawl `stats` are marked as partial; only the first listing page is essential.
+        """
+        stats = stats or CrawlStats()
+        event_loop = asyncio.get_running_loop()
+        deadline = event_loop.time() + self._crawl_timeout if self._crawl_timeout else None
+        scheduled_urls = {url}
+        # Artists and venues appearing in many concerts are shared by their events
+        interner = EntityInterner()
+        versions = self.get_page_versions()
+        scraped_events = []
+        first_page = asyncio.ensure_future(self.scrape_event_listing_page(url, stats, versions))
+        pending = {first_page}
+
+        def schedule(coro_factory, urls):
+            for new_url in urls:
+                if new_url not in scheduled_urls:
+                    scheduled_urls.add(new_url)
+                    pending.add(asyncio.ensure_future(coro_factory(new_url)))
+
+        try:
+            while pending:
+                timeout = deadline - event_loop.time() if deadline is not None else None
+                if timeout is not None and timeout <= 0:
+                    self._logger.warning("Crawl of {} timed out, {} pages left behind".format(url, len(pending)))
+                    stats.partial = True
+                    return
+
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    pending.remove(task)
+                    if task is not first_page and task.exception() is not None:
+                        self._logger.warning("Could not scrape a page of {}: {!r}".format(url, task.exception()))
+                        stats.failed_pages += 1
+                        stats.partial = True
+                        continue
+                    result = task.result()
+                    if isinstance(result, Event):
+                        scraped_events.append(result)
+                        yield interner.intern_event(result)
+                    else:
+                        event_urls, page_urls = result
+                        cached_events = await self.get_cached_events(
+                            events_date,
+                            [event_url for event_url in event_urls if event_url not in scheduled_urls]
+                        )
+                        for event in cached_events:
+                            scheduled_urls.add(event.link)
+                            yield interner.intern_event(event)
+                        # This will prevent the first page from being scraped twice
+                        page_urls = [page_url for page_url in page_urls if "page=1" not in page_url]
+                        if versions is not None:
+                            versions.prefetch([
+                                new_url for new_url in list(event_urls) + page_urls if new_url not in scheduled_urls
+                            ])
+                        schedule(lambda event_url: self.scrape_event(events_date, event_url, stats, versions), event_urls)
+                        schedule(lambda page_url: self.scrape_event_listing_page(page_url, stats, versions), page_urls)
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            await self.cache_scraped_events(scraped_events)
+            if versions is not None:
+                await versions.flush()
+            self.last_crawl_stats = stats
+            CRAWL_PAGES.observe(stats.listing_pages, page_type="listing")
+            CRAWL_PAGES.observe(stats.event_pages, page_type="event")
+            self._logger.debug(
+                "Crawled {}: {pages_fetched} pages, {bytes_fetched} bytes fetched, {not_modified} not modified, "
+                "{saved_bytes} bytes and {saved_parses} parses saved, {failed_pages} failed".format(url, **stats.to_dict())
+            )
+
+    async def scrape_events(self, events_date, url, stats: CrawlStats = None):
+        return [event async for event in self.crawl_events(events_date, url, stats)]
+
+    async def enrich_events(self, events):
+        if self._enricher is None:
+            return events
+        return await self._enricher.enrich(events)
+
+    async def scrape_enriched_events(self, events_date, url, stats: CrawlStats = None):
+        return await self.enrich_events(await self.scrape_events(events_date, url, stats))
+
+    def iter_events(self, location, events_date, stats: CrawlStats = None):
+        return self.crawl_events(events_date, self.get_events_listing_url(location, events_date), stats)
+
+    async def crawl_event_urls(self, url, stats: CrawlStats = None, versions: PageVersions = None):
+        """
+        Concert urls found in all the listing pages, without visiting any concert page
+        """
+        stats = stats or CrawlStats()
+        event_urls = set()
+        scheduled_urls = {url}
+        pending = {asyncio.ensure_future(self.scrape_event_listing_page(url, stats, versions))}
+
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    pending.remove(task)
+                    page_event_urls, page_urls = task.result()
+                    event_urls.update(page_event_urls)
+                    new_page_urls = [
+                        page_url for page_url in page_urls if page_url not in scheduled_urls and "page=1" not in page_url
+                    ]
+                    if versions is not None:
+                        versions.prefetch(new_page_urls)
+                    for page_url in new_page_urls:
+                        scheduled_urls.add(page_url)
+                        pending.add(asyncio.ensure_future(self.scrape_event_listing_page(page_url, stats, versions)))
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        return event_urls
+
+    async def scrape_events_delta(self, events_date, url, cached_events):
+        """
+        Diffs the listing against the cached events: vanished concerts are dropped and only new ones are scraped
+        """
+        stats = CrawlStats()
+        versions = self.get_page_versions()
+        try:
+            event_urls = await self.crawl_event_urls(url, stats, versions)
+
+            kept_events = [event for event in cached_events if event.link in event_urls]
+            new_urls = event_urls - {event.link for event in kept_events}
+            new_events = await self.get_cached_events(events_date, new_urls)
+            scrape_urls = new_urls - {event.link for event in new_events}
+            if versions is not None:
+                versions.prefetch(scrape_urls)
+            scraped_events = await asyncio.gather(*[
+                self.scrape_event(events_date, event_url, stats, versions) for event_url in scrape_urls
+            ])
+            await self.cache_scraped_events(scraped_events)
+            new_events += scraped_events
+        finally:
+            if versions is not None:
+                await versions.flush()
+
+        self.last_crawl_stats = stats
+        self._logger.debug("Delta refresh of {}: {} events kept, {} new, {} dropped ({} pages fetched)".format(
+            url, len(kept_events), len(new_events), len(cached_events) - len(kept_events), stats.pages_fetched
+        ))
+        return await self.enrich_events(kept_events + new_events)
+
+    def get_events_delta(self, location, events_date, cached_events):
+        return self._get_runner()(
+            self.scrape_events_delta(events_date, self.get_events_listing_url(location, events_date), cached_events)
         )
+
+    async def scrape_events_bulk(self, keys):
+        """
+        A single date range crawl per location (events are then partitioned by the date on their page),
+        all the locations being crawled concurrently.
+        Locations that could only be scraped partially, or not at all, are left out of the results.
+        """
+        dates_by_location = {}
+        for location, events_date in keys:
+            dates_by_location.setdefault(location, set()).add(events_date)
+
+        async def scrape_location(location, dates):
+            url = self.get_events_listing_url(location, min(dates), max(dates))
+            stats = CrawlStats()
+            try:
+                events = await self.scrape_events(None, url, stats)
+            except Exception as ex:
+                self._logger.warning("Could not scrape {}: {!r}".format(url, ex))
+                return location, {}
+            return location, {} if stats.partial else partition_events_by_date(events, dates)
+
+        events_by_key = {
+            (location, events_date): events
+            for location, events_by_date in await asyncio.gather(*[
+                scrape_location(location, dates) for location, dates in dates_by_location.items()
+            ])
+            for events_date, events in events_by_date.items()
+        }
+
+        # Artists are enriched all together, each of them is looked up once
+        enriched_events = iter(await self.enrich_events([event for events in events_by_key.values() for event in events]))
+        return {
+            key: [next(enriched_events) for _ in events]
+            for key, events in events_by_key.items()
+        }
+
+    def _get_runner(self):
+        if self._event_loop is not None and self._event_loop.is_running():
+            # The event loop is running in another thread (e.g. an asyncio server): coroutines are submitted to it
+            if is_running_in(self._event_loop):
+                raise RuntimeError("Blocking calls would block the event loop, use coroutines instead")
+
+            def run(coro):
+                return asyncio.run_coroutine_threadsafe(coro, self._event_loop).result()
+
+            return run
+
+        # The event loop belongs to the thread that built the listing, other threads (e.g. background refreshes) use their own
+        event_loop = self._event_loop if threading.current_thread() is self._event_loop_thread else get_thread_event_loop()
+        return event_loop.run_until_complete
+
+    def get_events(self, location, events_date):
+        """
+        Returns (as the generator return value) whether the events are partial
+        """
+        run = self._get_runner()
+        stats = CrawlStats()
+
+        if self._enricher is not None:
+            # Artists are deduplicated across the whole crawl
+            url = self.get_events_listing_url(location, events_date)
+            yield from run(self.scrape_enriched_events(events_date, url, stats))
+            return stats.partial
+
+        events = self.iter_events(location, events_date, stats)
+
+        # Drives the async generator one event at a time, so that consumers can start processing events straight away
+        try:
+            while True:
+                try:
+                    yield run(events.__anext__())
+                except StopAsyncIteration:
+                    return stats.partial
+        finally:
+            run(events.aclose())
+
+    def get_events_bulk(self, keys):
+        return self._get_runner()(self.scrape_events_bulk(keys))
@@ -0,0 +1,219 @@
+"""
+asyncio-native front end, exposing the same routes as `lndngigs.web`.
+Listings, the http client and the Redis client are built once at startup and many cache misses are served concurrently.
+
+    gunicorn lndngigs.async_web:create_app --worker-class aiohttp.GunicornWebWorker --bind 0.0.0.0:8000
+"""
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from aiohttp import web
+
+from lndngigs.async_event_listing import CrawlStats
+from lndngigs.factories import get_logger, get_redis_client, get_async_event_listing, get_cached_event_listing, get_http_client, \
+    get_metadata_http_client, get_event_index, get_snapshot_store
+from lndngigs.metrics import registry, REQUEST_SECONDS
+from lndngigs.responses import get_gigs_response, render_gigs_response, iter_ndjson, render_event_ndjson, \
+    get_ndjson_headers, NDJSON_CONTENT_TYPE, NDJSON_PARTIAL_LINE, parse_bulk_locations, parse_bulk_dates, render_bulk_gigs, \
+    render_indexed_gigs
+from lndngigs.utils import Config, ValidationException
+
+
+@web.middleware
+async def observe_latency(request, handler):
+    started_at = time.perf_counter()
+    response = await handler(request)
+    handler_name = getattr(handler, "__name__", None)
+    if handler_name in ("gigs", "bulk_gigs"):
+        REQUEST_SECONDS.observe(time.perf_counter() - started_at, handler=handler_name, status=response.status)
+    return response
+
+
+def build_app(logger, redis_client, max_blocking_calls=64):
+    app = web.Application(middlewares=[observe_latency])
+    # Redis and the cache logic are synchronous: they run in these threads, while crawls run in the event loop
+    executor = ThreadPoolExecutor(max_workers=max_blocking_calls, thread_name_prefix="gigs")
+    # Built at startup, as scrapers are bound to the server event loop
+    listings = {}
+
+    async def on_startup(app):
+        listings["no_cache"] = get_async_event_listing(logger=logger, event_loop=asyncio.get_running_loop())
+        listings["cached"] = get_cached_event_listing(
+            logger=logger,
+            event_listing=get_async_event_listing(
+                logger=logger,
+                event_loop=asyncio.get_running_loop(),
+                redis_client=redis_client
+            ),
+            redis_client=redis_client
+        ) if redis_client or get_snapshot_store() else None
+
+        if listings["cached"] is not None and get_snapshot_store() is not None and Config().SNAPSHOT_PRELOAD:
+            await asyncio.get_running_loop().run_in_executor(executor, listings["cached"].preload_snapshot)
+
+    async def on_cleanup(app):
+        executor.shutdown(wait=False)
+        await get_http_client().close()
+        await get_metadata_http_client().close()
+
+    async def stream_gigs(request, event_listing, location, events_date):
+        event_loop = asyncio.get_running_loop()
+
+        if event_listing is listings["no_cache"]:
+            response = web.StreamResponse(headers={"Content-Type": NDJSON_CONTENT_TYPE})
+            await response.prepare(request)
+            stats = CrawlStats()
+            # The crawl is stopped as soon as the client goes away, rather than when the generator is collected
+            events = event_listing.iter_events(location, events_date, stats)
+            try:
+                async for event in events:
+                    await response.write(render_event_ndjson(event))
+            finally:
+                await events.aclose()
+            if stats.partial:
+                await response.write(NDJSON_PARTIAL_LINE)
+        else:
+            entry = await event_loop.run_in_executor(executor, event_listing.get_entry, location, events_date)
+            response = web.StreamResponse(headers=get_ndjson_headers(entry))
+            await response.prepare(request)
+            # Cache misses crawl (and eventually cache) in the executor, one event at a time
+            lines = iter_ndjson(entry.events)
+            try:
+                while True:
+                    line = await event_loop.run_in_executor(executor, next, lines, None)
+                    if line is None:
+                        break
+                    await response.write(line)
+            finally:
+                await event_loop.run_in_executor(executor, lines.close)
+
+        await response.write_eof()
+        return response
+
+    async def index(request):
+        return web.Response(text="Hello from lndnGigs!")
+
+    async def gigs(request):
+        location = request.match_info.get("location", "london")
+        events_date = request.match_info.get("events_date", "today")
+
+        if request.query.get("mode") == "nocache" or not listings["cached"]:
+            event_listing = listings["no_cache"]
+        else:
+            event_listing = listings["cached"]
+
+        try:
+            parsed_location = event_listing.parse_event_location(location)
+        except ValidationException as ex:
+            return web.json_response({
+                "error": "Invalid location: {}".format(ex)
+            }, status=406)
+
+        try:
+            parsed_events_date = event_listing.parse_event_date(events_date)
+        except ValidationException as ex:
+            return web.json_response({
+                "error": "Invalid date: {}".format(ex)
+            }, status=406)
+
+        if request.query.get("format") == "ndjson":
+            return await stream_gigs(request, event_listing, parsed_location, parsed_events_date)
+
+        if_none_match = request.headers.get("If-None-Match")
+        accept_encoding = request.headers.get("Accept-Encoding")
+
+        if event_listing is listings["no_cache"]:
+            stats = CrawlStats()
+            events = [event async for event in event_listing.iter_events(parsed_location, parsed_events_date, stats)]
+            response = render_gigs_response(
+                events,
+                if_none_match=if_none_match,
+                accept_encoding=accept_encoding,
+                partial=stats.partial
+            )
+        else:
+            response = await asyncio.get_running_loop().run_in_executor(
+                executor,
+                lambda: get_gigs_response(
+                    event_listing,
+                    location=parsed_location,
+                    events_date=parsed_events_date,
+                    if_none_match=if_none_match,
+                    accept_encoding=accept_encoding
+                )
+            )
+
+        return web.Response(body=response.body, status=response.status, headers=response.headers)
+
+    async def bulk_gigs(request):
+        if request.query.get("mode") == "nocache" or not listings["cached"]:
+            event_listing = listings["no_cache"]
+        else:
+            event_listing = listings["cached"]
+
+        try:
+            parsed_locations = parse_bulk_locations(event_listing, request.match_info["locations"])
+        except ValidationException as ex:
+            return web.json_response({
+                "error": "Invalid location: {}".format(ex)
+            }, status=406)
+
+        try:
+            dates = parse_bulk_dates(event_listing, request.query.get("from"), request.query.get("to"))
+        except ValidationException as ex:
+            return web.json_response({
+                "error": "Invalid date: {}".format(ex)
+            }, status=406)
+
+        keys = [(location_id, events_date) for location_id in parsed_locations.values() for events_date in dates]
+
+        if event_listing is listings["no_cache"]:
+            events_by_key = await event_listing.scrape_events_bulk(keys)
+        else:
+            events_by_key = await asyncio.get_running_loop().run_in_executor(executor, event_listing.get_events_bulk, keys)
+
+        return web.json_response(render_bulk_gigs(parsed_locations, dates, events_by_key))
+
+    async def indexed_gigs(get_events, term, term_name):
+        if not redis_client:
+            return web.json_response({"error": "The events index is not available"}, status=503)
+
+        try:
+            entries = await asyncio.get_running_loop().run_in_executor(executor, get_events, term)
+        except ValidationException as ex:
+            return web.json_response({
+                "error": "Invalid {}: {}".format(term_name, ex)
+            }, status=406)
+
+        return web.json_response(render_indexed_gigs(entries))
+
+    async def artist_gigs(request):
+        return await indexed_gigs(get_event_index(redis_client).get_artist_events, request.match_info["artist"], "artist")
+
+    async def venue_gigs(request):
+        return await indexed_gigs(get_event_index(redis_client).get_venue_events, request.match_info["venue_id"], "venue")
+
+    async def metrics(request):
+        return web.Response(body=registry.render().encode("utf-8"), headers={"Content-Type": registry.CONTENT_TYPE})
+
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    app.router.add_get("/", index)
+    app.router.add_get("/metrics", metrics)
+    app.router.add_get("/gigs", gigs)
+    app.router.add_get("/gigs/{location}/{events_date}", gigs)
+    app.router.add_get("/gigs/{locations}", bulk_gigs)
+    app.router.add_get("/artists/{artist}/gigs", artist_gigs)
+    app.router.add_get("/venues/{venue_id}/gigs", venue_gigs)
+
+    return app
+
+
+def create_app():
+    config = Config()
+    return build_app(logger=get_logger(config.DEBUG), redis_client=get_redis_client(config))
+
+
+if __name__ == "__main__":
+    web.run_app(create_app(), port=8000)
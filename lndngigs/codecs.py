@@ -0,0 +1,323 @@
+"""
+Binary format of the cached events.
+
+Every entry starts with a fixed header: magic bytes, schema version, codec id and the time the entry was cached.
+The payload is a compact representation of the events, with the common Songkick url prefix stripped:
+
+    event  = [link, [artist, ...], venue or None]
+    artist = [url, name] (Artist) or [url, name, tags, image_url] (ArtistWithMeta)
+    venue  = [url, name, address]
+"""
+import gzip
+import hashlib
+import json
+import struct
+import zlib
+from datetime import date
+from json.encoder import encode_basestring_ascii
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+from lndngigs.entities import Event, ArtistWithMeta, EntityInterner
+
+MAGIC = b"LG"
+SCHEMA_VERSION = 1
+HEADER = struct.Struct(">2sBBd")
+
+URL_PREFIX = "http://www.songkick.com"
+
+
+class CodecException(Exception):
+    pass
+
+
+class JsonCodec:
+    codec_id = 1
+    name = "json"
+
+    def dumps(self, value) -> bytes:
+        return json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+    def loads(self, data: bytes):
+        return json.loads(data.decode("utf-8"))
+
+
+class MsgpackCodec:
+    codec_id = 2
+    name = "msgpack"
+
+    def __init__(self):
+        if msgpack is None:
+            raise CodecException("msgpack is not installed")
+
+    def dumps(self, value) -> bytes:
+        return msgpack.packb(value, use_bin_type=True)
+
+    def loads(self, data: bytes):
+        return msgpack.unpackb(data, raw=False)
+
+
+class ZlibCodec:
+    """
+    Compresses the output of another codec
+    """
+    def __init__(self, codec, codec_id, level=6):
+        self._codec = codec
+        self.codec_id = codec_id
+        self.name = "{}+zlib".format(codec.name)
+        self._level = level
+
+    def dumps(self, value) -> bytes:
+        return zlib.compress(self._codec.dumps(value), self._level)
+
+    def loads(self, data: bytes):
+        return self._codec.loads(zlib.decompress(data))
+
+
+_codec_factories = {
+    "json": JsonCodec,
+    "msgpack": MsgpackCodec,
+    "json+zlib": lambda: ZlibCodec(JsonCodec(), codec_id=3),
+    "msgpack+zlib": lambda: ZlibCodec(MsgpackCodec(), codec_id=4),
+}
+
+_codecs_by_id = {}
+
+
+def get_codec(name):
+    try:
+        codec = _codec_factories[name]()
+    except KeyError:
+        raise CodecException("Unknown codec `{}`. Try with: {}".format(name, ", ".join(_codec_factories)))
+    _codecs_by_id[codec.codec_id] = codec
+    return codec
+
+
+def _get_codec_by_id(codec_id):
+    if codec_id not in _codecs_by_id:
+        for name in _codec_factories:
+            try:
+                get_codec(name)
+            except CodecException:
+                pass
+    try:
+        return _codecs_by_id[codec_id]
+    except KeyError:
+        raise CodecException("Unsupported codec id {}".format(codec_id))
+
+
+def _strip_prefix(url):
+    return url[len(URL_PREFIX):] if url and url.startswith(URL_PREFIX) else url
+
+
+def _add_prefix(url):
+    return URL_PREFIX + url if url and url.startswith("/") else url
+
+
+def _pack_artist(artist):
+    if isinstance(artist, ArtistWithMeta):
+        return [_strip_prefix(artist.url), artist.name, artist.tags, artist.image_url]
+    return [_strip_prefix(artist.url), artist.name]
+
+
+def _unpack_artist(artist, interner: EntityInterner):
+    if len(artist) == 4:
+        return interner.artist_with_meta(url=_add_prefix(artist[0]), name=artist[1], tags=artist[2], image_url=artist[3])
+    return interner.artist(url=_add_prefix(artist[0]), name=artist[1])
+
+
+def pack_events(events):
+    return [
+        [
+            _strip_prefix(event.link),
+            [_pack_artist(artist) for artist in event.artists],
+            [_strip_prefix(event.venue.url), event.venue.name, event.venue.address] if event.venue else None
+        ]
+        for event in events
+    ]
+
+
+def unpack_events(packed_events, events_date):
+    interner = EntityInterner()
+    return [
+        Event(
+            link=_add_prefix(link),
+            artists=[_unpack_artist(artist, interner) for artist in artists],
+            venue=interner.venue(url=_add_prefix(venue[0]), name=venue[1], address=venue[2]) if venue else None,
+            date=events_date
+        )
+        for link, artists, venue in packed_events
+    ]
+
+
+def encode_events(events, cached_at, codec) -> bytes:
+    return HEADER.pack(MAGIC, SCHEMA_VERSION, codec.codec_id, cached_at) + codec.dumps(pack_events(events))
+
+
+def _decode_legacy_events(data, events_date):
+    # JSON entries written before the binary format: either a list of events or {"cached_at": ..., "events": [...]}
+    cached = json.loads(data.decode("utf-8"))
+    if isinstance(cached, list):
+        cached = {"cached_at": None, "events": cached}
+    interner = EntityInterner()
+
+    def parse_artist(artist):
+        if "tags" in artist and "image_url" in artist:
+            return interner.artist_with_meta(url=artist["url"], name=artist["name"], tags=artist["tags"], image_url=artist["image_url"])
+        return interner.artist(url=artist["url"], name=artist["name"])
+
+    events = [
+        Event(
+            link=event["link"],
+            artists=[parse_artist(artist) for artist in event["artists"]],
+            venue=interner.venue(url=event["venue"]["url"], name=event["venue"]["name"], address=event["venue"]["address"]) if event["venue"] else None,
+            date=events_date
+        )
+        for event in cached["events"]
+    ]
+    return events, cached["cached_at"]
+
+
+def decode_events(data: bytes, events_date):
+    """
+    Returns a tuple (events, cached_at)
+    """
+    if not data.startswith(MAGIC):
+        return _decode_legacy_events(data, events_date)
+
+    _, schema_version, codec_id, cached_at = HEADER.unpack_from(data)
+    if schema_version != SCHEMA_VERSION:
+        raise CodecException("Unsupported schema version {}".format(schema_version))
+
+    return unpack_events(_get_codec_by_id(codec_id).loads(data[HEADER.size:]), events_date), cached_at
+
+
+def encode_event(event, cached_at, codec) -> bytes:
+    # Single concert pages are cached regardless of the listing they belong to: the date is part of the payload
+    packed_event = [event.date.isoformat() if event.date else None] + pack_events([event])[0]
+    return HEADER.pack(MAGIC, SCHEMA_VERSION, codec.codec_id, cached_at) + codec.dumps(packed_event)
+
+
+def decode_event(data: bytes):
+    """
+    Returns a tuple (event, cached_at)
+    """
+    _, schema_version, codec_id, cached_at = HEADER.unpack_from(data)
+    if schema_version != SCHEMA_VERSION:
+        raise CodecException("Unsupported schema version {}".format(schema_version))
+
+    events_date, *packed_event = _get_codec_by_id(codec_id).loads(data[HEADER.size:])
+    event, = unpack_events([packed_event], date.fromisoformat(events_date) if events_date else None)
+    return event, cached_at
+
+
+# Pre-serialized `/gigs` response bodies: served as they are on cache hits, with an ETag and precompressed variants
+RESPONSE_MAGIC = b"LR"
+RESPONSE_HEADER = struct.Struct(">2sBd16s")
+RESPONSE_ENCODING_HEADER = struct.Struct(">BI")
+
+
+def _dump_string(value):
+    return encode_basestring_ascii(value) if value is not None else "null"
+
+
+def _dump_artist_json(artist):
+    if isinstance(artist, ArtistWithMeta):
+        return '{{"url":{},"name":{},"tags":{},"image_url":{}}}'.format(
+            _dump_string(artist.url),
+            _dump_string(artist.name),
+            json.dumps(artist.tags, separators=(",", ":")),
+            _dump_string(artist.image_url)
+        )
+    return '{{"url":{},"name":{}}}'.format(_dump_string(artist.url), _dump_string(artist.name))
+
+
+def _dump_venue_json(venue):
+    return '{{"url":{},"name":{},"address":{}}}'.format(
+        _dump_string(venue.url), _dump_string(venue.name), _dump_string(venue.address)
+    )
+
+
+def dump_event_json(event, fragments=None) -> str:
+    """
+    Same JSON as `json.dumps(event.to_dict(), separators=(",", ":"))`, without building the dictionaries.
+    Artists and venues shared by several events are serialized once per `fragments` (a dictionary, by object id),
+    which must not outlive the events.
+    """
+    fragments = {} if fragments is None else fragments
+
+    def dump(entity, dump_entity):
+        fragment = fragments.get(id(entity))
+        if fragment is None:
+            fragment = fragments[id(entity)] = dump_entity(entity)
+        return fragment
+
+    return '{{"link":{},"artists":[{}],"venue":{},"date":"{}"}}'.format(
+        _dump_string(event.link),
+        ",".join([dump(artist, _dump_artist_json) for artist in event.artists]),
+        dump(event.venue, _dump_venue_json) if event.venue else "null",
+        event.date.isoformat()
+    )
+
+
+def render_events_json(events, partial=False) -> bytes:
+    # Events are kept alive while rendering, object ids in `fragments` are not reused
+    events = list(events)
+    fragments = {}
+    body = '{{"gigs":[{}]{}}}'.format(
+        ",".join([dump_event_json(event, fragments) for event in events]),
+        ',"partial":true' if partial else ""
+    )
+    return body.encode("utf-8")
+
+
+def get_etag(body: bytes):
+    return hashlib.sha256(body).hexdigest()[:32]
+
+
+def compress_body(body: bytes):
+    """
+    Returns the body in all the supported content encodings
+    """
+    bodies = {"identity": body, "gzip": gzip.compress(body, compresslevel=6)}
+    if brotli is not None:
+        bodies["br"] = brotli.compress(body)
+    return bodies
+
+
+def encode_response(body: bytes, cached_at) -> bytes:
+    data = [RESPONSE_HEADER.pack(RESPONSE_MAGIC, SCHEMA_VERSION, cached_at, bytes.fromhex(get_etag(body)))]
+    for encoding, encoded_body in compress_body(body).items():
+        data.append(RESPONSE_ENCODING_HEADER.pack(len(encoding), len(encoded_body)))
+        data.append(encoding.encode("ascii"))
+        data.append(encoded_body)
+    return b"".join(data)
+
+
+def decode_response(data: bytes):
+    """
+    Returns a tuple (bodies by content encoding, etag, cached_at)
+    """
+    magic, schema_version, cached_at, etag = RESPONSE_HEADER.unpack_from(data)
+    if magic != RESPONSE_MAGIC or schema_version != SCHEMA_VERSION:
+        raise CodecException("Unsupported response format")
+
+    bodies = {}
+    offset = RESPONSE_HEADER.size
+    while offset < len(data):
+        encoding_length, body_length = RESPONSE_ENCODING_HEADER.unpack_from(data, offset)
+        offset += RESPONSE_ENCODING_HEADER.size
+        encoding = data[offset:offset + encoding_length].decode("ascii")
+        offset += encoding_length
+        bodies[encoding] = data[offset:offset + body_length]
+        offset += body_length
+
+    return bodies, etag.hex(), cached_at
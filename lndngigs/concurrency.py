@@ -0,0 +1,160 @@
+import asyncio
+import threading
+import time
+from collections import deque
+
+try:
+    import uvloop
+except ImportError:  # pragma: no cover
+    uvloop = None
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit for upstream requests, bound to the event loop it is used in.
+    The limit grows by one every `limit` requests answered within `latency_target`,
+    and is cut by `backoff` on overload signals: 429/5xx responses, timeouts and slow responses.
+    """
+    def __init__(self, initial_limit=10, min_limit=1, max_limit=100, latency_target=2.0, backoff=0.5, window=200):
+        self._limit = float(initial_limit)
+        self._min_limit = min_limit
+        self._max_limit = max_limit
+        self._latency_target = latency_target
+        self._backoff = backoff
+        self._latencies = deque(maxlen=window)
+        self._in_flight = 0
+        self._waiters = deque()
+        self._last_decrease = 0.0
+
+    @property
+    def limit(self):
+        return max(self._min_limit, int(self._limit))
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    def get_latency_percentile(self, percentile):
+        """
+        Latency percentile of the recent successful requests, None until enough of them have been observed
+        """
+        if len(self._latencies) < 20:
+            return None
+        latencies = sorted(self._latencies)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * percentile / 100))]
+
+    async def acquire(self):
+        while self._in_flight >= self.limit:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                self._wake_up()
+                raise
+        self._in_flight += 1
+
+    def release(self, latency=None, overloaded=False):
+        """
+        Without a `latency` (e.g. the request was cancelled) the limit is left as it is
+        """
+        self._in_flight -= 1
+
+        if latency is not None and not overloaded:
+            # Slow responses included: the percentiles are those of the upstream, not of its fast responses
+            self._latencies.append(latency)
+
+        if latency is not None and (overloaded or latency > self._latency_target):
+            # A burst of failures counts as a single signal: at most one decrease per latency target
+            now = time.monotonic()
+            if now - self._last_decrease > self._latency_target:
+                self._limit = max(self._min_limit, self._limit * self._backoff)
+                self._last_decrease = now
+        elif latency is not None:
+            self._limit = min(self._max_limit, self._limit + 1 / self._limit)
+
+        self._wake_up()
+
+    def _wake_up(self):
+        for _ in range(self.limit - self._in_flight):
+            if not self._waiters:
+                return
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+
+
+class RateLimiter:
+    """
+    Token bucket: at most `rate` acquisitions per second on average, in bursts of up to `burst`.
+    Not bound to an event loop, it can be shared by the scrapers of a process.
+    """
+    def __init__(self, rate, burst=1):
+        self._rate = rate
+        self._burst = burst
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self._burst, self._tokens + (now - self._updated_at) * self._rate)
+        self._updated_at = now
+
+    async def acquire(self):
+        self._refill()
+        while self._tokens < 1:
+            await asyncio.sleep((1 - self._tokens) / self._rate)
+            self._refill()
+        self._tokens -= 1
+
+
+async def run_blocking(function, *args):
+    # Redis round-trips of the crawls run in the default thread pool, instead of blocking the event loop
+    return await asyncio.get_running_loop().run_in_executor(None, function, *args)
+
+
+def new_event_loop(implementation="asyncio"):
+    if implementation == "asyncio":
+        return asyncio.new_event_loop()
+    if implementation == "uvloop":
+        if uvloop is None:
+            raise Exception("uvloop is not installed")
+        return uvloop.new_event_loop()
+    raise Exception("Unknown event loop `{}`".format(implementation))
+
+
+class BackgroundEventLoop:
+    """
+    Event loop running forever in a daemon thread, for synchronous code (e.g. the threads of a WSGI server)
+    to submit coroutines to: concurrent callers are multiplexed on the same loop, sharing its connections.
+    """
+    def __init__(self, implementation="asyncio", name="event-loop"):
+        self.event_loop = new_event_loop(implementation)
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        started = threading.Event()
+        # Callers can tell whether to submit coroutines or run them by themselves as soon as the loop is running
+        self.event_loop.call_soon(started.set)
+        self._thread.start()
+        started.wait()
+
+    def _run(self):
+        asyncio.set_event_loop(self.event_loop)
+        self.event_loop.run_forever()
+
+    def submit(self, coro):
+        """
+        Schedules the coroutine in the event loop, returns a `concurrent.futures.Future`
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self.event_loop)
+
+    def run(self, coro, timeout=None):
+        return self.submit(coro).result(timeout)
+
+    def close(self):
+        if self.event_loop.is_closed():
+            return
+        self.event_loop.call_soon_threadsafe(self.event_loop.stop)
+        self._thread.join()
+        self.event_loop.close()
@@ -0,0 +1,244 @@
+"""
+Artist metadata (tags, image) enrichment of the scraped events.
+Artists are deduplicated across all the events of a crawl, looked up in a long-lived Redis cache first
+and only then, in batches, from the metadata provider.
+"""
+import asyncio
+import json
+from collections import namedtuple
+from datetime import timedelta
+from urllib.parse import urlencode
+
+from aiohttp import ClientError
+from redis import Redis
+from redis.exceptions import RedisError
+
+from lndngigs.codecs import URL_PREFIX
+from lndngigs.concurrency import RateLimiter, run_blocking
+from lndngigs.entities import ArtistWithMeta
+
+ArtistMetadata = namedtuple("ArtistMetadata", ["tags", "image_url"])
+
+
+class MetadataProvider:
+    # Artists looked up per request, and maximum requests per second (None: unlimited)
+    batch_size = 1
+    requests_per_second = None
+
+    async def get_metadata(self, artists):
+        """
+        Metadata of the given artists, as a dictionary artist url => ArtistMetadata.
+        Artists unknown to the provider are left out.
+        """
+        raise NotImplementedError
+
+
+class StubMetadataProvider(MetadataProvider):
+    """
+    Offline provider, serving `metadata` (artist name => ArtistMetadata) after `latency` seconds.
+    Without `metadata` every artist is known, with no tags and no image.
+    """
+    def __init__(self, metadata=None, latency=0, batch_size=50, requests_per_second=None):
+        self._metadata = metadata
+        self._latency = latency
+        self.batch_size = batch_size
+        self.requests_per_second = requests_per_second
+        self.requests_count = 0
+        self.lookups_count = 0
+
+    async def get_metadata(self, artists):
+        self.requests_count += 1
+        self.lookups_count += len(artists)
+        await asyncio.sleep(self._latency)
+        if self._metadata is None:
+            return {artist.url: ArtistMetadata(tags=[], image_url=None) for artist in artists}
+        return {artist.url: self._metadata[artist.name] for artist in artists if artist.name in self._metadata}
+
+
+class LastfmMetadataProvider(MetadataProvider):
+    API_URL = "http://ws.audioscrobbler.com/2.0/"
+    # Last.fm has no batch lookup, and asks API clients not to exceed 5 requests per second
+    batch_size = 1
+    requests_per_second = 5
+
+    def __init__(self, api_key, http_client, max_tags=5):
+        self._api_key = api_key
+        self._http_client = http_client
+        self._max_tags = max_tags
+
+    def get_artist_url(self, artist):
+        return "{}?{}".format(self.API_URL, urlencode({
+            "method": "artist.getinfo",
+            "artist": artist.name,
+            "api_key": self._api_key,
+            "format": "json",
+        }))
+
+    async def get_metadata(self, artists):
+        metadata = {}
+        for artist in artists:
+            try:
+                page = await self._http_client.fetch_page(self.get_artist_url(artist))
+            except ClientError as ex:
+                # Unknown artist (404): cached as such, other errors fail the batch
+                if getattr(ex, "status", None) != 404:
+                    raise
+                continue
+            info = json.loads(page.content.decode("utf-8")).get("artist")
+            if info:
+                images = [image["#text"] for image in info.get("image", []) if image.get("#text")]
+                metadata[artist.url] = ArtistMetadata(
+                    tags=[tag["name"] for tag in info.get("tags", {}).get("tag", [])][:self._max_tags],
+                    image_url=images[-1] if images else None
+                )
+        return metadata
+
+
+class ArtistMetadataCache:
+    """
+    Artist metadata by artist url. Artists unknown to the provider are cached as well, so they are not looked up every crawl.
+    """
+    def __init__(self, redis_client: Redis, cache_key_prefix="artists", cache_ttl=timedelta(days=30)):
+        self._redis_client = redis_client
+        self._cache_key_prefix = cache_key_prefix
+        self._cache_ttl = cache_ttl
+
+    def get_cache_key_name(self, url):
+        if url.startswith(URL_PREFIX):
+            url = url[len(URL_PREFIX):]
+        return "{}:{}".format(self._cache_key_prefix, url)
+
+    def get_metadata(self, urls):
+        """
+        Cached metadata as a dictionary url => ArtistMetadata, or None for artists unknown to the provider
+        """
+        urls = list(urls)
+        if not urls:
+            return {}
+        metadata = {}
+        for url, data in zip(urls, self._redis_client.mget([self.get_cache_key_name(url) for url in urls])):
+            if data is not None:
+                value = json.loads(data.decode("utf-8"))
+                metadata[url] = ArtistMetadata(*value) if value is not None else None
+        return metadata
+
+    def cache_metadata(self, metadata):
+        pipeline = self._redis_client.pipeline()
+        for url, artist_metadata in metadata.items():
+            pipeline.setex(
+                name=self.get_cache_key_name(url),
+                value=json.dumps(list(artist_metadata) if artist_metadata is not None else None),
+                time=self._cache_ttl
+            )
+        pipeline.execute()
+
+
+class EnrichmentStats:
+    def __init__(self):
+        self.artists = 0
+        self.cached = 0
+        self.looked_up = 0
+        self.failed = 0
+        self.timed_out = 0
+
+    def to_dict(self):
+        return dict(vars(self))
+
+
+class ArtistEnricher:
+    """
+    Replaces the artists of the events with `ArtistWithMeta`. Lookups run in batches, at most `concurrency` at a time
+    and within the provider rate; artists not looked up within `timeout` seconds (or unknown) are left as they are.
+    """
+    def __init__(self, logger, provider: MetadataProvider, metadata_cache: ArtistMetadataCache = None, concurrency=4,
+                 timeout=None):
+        self._logger = logger
+        self._provider = provider
+        self._metadata_cache = metadata_cache
+        self._concurrency = concurrency
+        self._timeout = timeout
+        # Shared by all the enrichments of this process
+        self._rate_limiter = RateLimiter(provider.requests_per_second) if provider.requests_per_second else None
+        self.last_stats = None
+
+    async def lookup(self, artists, semaphore):
+        async with semaphore:
+            if self._rate_limiter is not None:
+                await self._rate_limiter.acquire()
+            return artists, await self._provider.get_metadata(artists)
+
+    async def get_cached_metadata(self, artists):
+        if self._metadata_cache is None:
+            return {}
+        try:
+            return await run_blocking(self._metadata_cache.get_metadata, [artist.url for artist in artists])
+        except RedisError as ex:
+            # Every artist is looked up instead
+            self._logger.warning("Cached artists metadata not available ({!r})".format(ex))
+            return {}
+
+    async def cache_metadata(self, metadata):
+        if self._metadata_cache is None:
+            return
+        try:
+            await run_blocking(self._metadata_cache.cache_metadata, metadata)
+        except RedisError as ex:
+            self._logger.warning("{} artists metadata not cached ({!r})".format(len(metadata), ex))
+
+    async def get_metadata(self, artists, stats: EnrichmentStats):
+        metadata = await self.get_cached_metadata(artists)
+        stats.cached = len(metadata)
+
+        missing = [artist for artist in artists if artist.url not in metadata]
+        if not missing:
+            return metadata
+
+        semaphore = asyncio.Semaphore(self._concurrency)
+        pending = {
+            asyncio.ensure_future(self.lookup(missing[start:start + self._provider.batch_size], semaphore))
+            for start in range(0, len(missing), self._provider.batch_size)
+        }
+        done, pending = await asyncio.wait(pending, timeout=self._timeout)
+        stats.timed_out = len(pending)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+        looked_up = {}
+        for task in done:
+            if task.exception() is not None:
+                self._logger.warning("Could not look up artists metadata: {!r}".format(task.exception()))
+                stats.failed += 1
+                continue
+            batch, batch_metadata = task.result()
+            looked_up.update({artist.url: batch_metadata.get(artist.url) for artist in batch})
+
+        stats.looked_up = len(looked_up)
+        if looked_up:
+            await self.cache_metadata(looked_up)
+        metadata.update(looked_up)
+        return metadata
+
+    async def enrich(self, events):
+        stats = EnrichmentStats()
+        artists = {
+            artist.url: artist
+            for event in events
+            for artist in event.artists
+            if artist.url and not isinstance(artist, ArtistWithMeta)
+        }
+        stats.artists = len(artists)
+        metadata = await self.get_metadata(list(artists.values()), stats) if artists else {}
+
+        def enrich_artist(artist):
+            artist_metadata = metadata.get(artist.url)
+            if artist_metadata is None or isinstance(artist, ArtistWithMeta):
+                return artist
+            return ArtistWithMeta(url=artist.url, name=artist.name, tags=artist_metadata.tags, image_url=artist_metadata.image_url)
+
+        self.last_stats = stats
+        self._logger.debug(
+            "Enriched {artists} artists: {cached} cached, {looked_up} looked up, "
+            "{failed} batches failed, {timed_out} batches timed out".format(**stats.to_dict())
+        )
+        return [event._replace(artists=[enrich_artist(artist) for artist in event.artists]) for event in events]
@@ -1,17 +1,22 @@
+import sys
 from collections import namedtuple
 
 
 class Event(namedtuple("Event", ["link", "artists", "venue", "date"])):
+    __slots__ = ()
+
     def to_dict(self):
         return {
             "link": self.link,
             "artists": [artist.to_dict() for artist in self.artists],
             "venue": self.venue.to_dict() if self.venue else None,
-            "date": self.date.strftime('%Y-%m-%d'),
+            "date": self.date.isoformat(),
         }
 
 
 class Venue(namedtuple("Venue", ["url", "name", "address"])):
+    __slots__ = ()
+
     def to_dict(self):
         return {
             "url": self.url,
@@ -21,6 +26,8 @@ class Venue(namedtuple("Venue", ["url", "name", "address"])):
 
 
 class Artist(namedtuple("Artist", ["url", "name"])):
+    __slots__ = ()
+
     def to_dict(self):
         return {
             "url": self.url,
@@ -29,6 +36,8 @@ class Artist(namedtuple("Artist", ["url", "name"])):
 
 
 class ArtistWithMeta(namedtuple("ArtistWithMeta", ["url", "name", "tags", "image_url"])):
+    __slots__ = ()
+
     def to_dict(self):
         return {
             "url": self.url,
@@ -36,3 +45,42 @@ class ArtistWithMeta(namedtuple("ArtistWithMeta", ["url", "name", "tags", "image
             "tags": self.tags,
             "image_url": self.image_url
         }
+
+
+class EntityInterner:
+    """
+    Shares equal artists and venues (and their urls) across the events of a listing:
+    headline artists and popular venues would otherwise be duplicated in every event.
+    """
+    def __init__(self):
+        self._entities = {}
+
+    def _intern(self, key, entity):
+        return self._entities.setdefault(key, entity)
+
+    def artist(self, url, name):
+        key = (Artist, url, name)
+        return self._entities.get(key) or self._intern(key, Artist(url=sys.intern(url) if url else url, name=name))
+
+    def artist_with_meta(self, url, name, tags, image_url):
+        key = (ArtistWithMeta, url, name, tuple(tags or ()), image_url)
+        return self._entities.get(key) or self._intern(
+            key, ArtistWithMeta(url=sys.intern(url) if url else url, name=name, tags=tags, image_url=image_url)
+        )
+
+    def venue(self, url, name, address):
+        key = (Venue, url, name, address)
+        return self._entities.get(key) or self._intern(
+            key, Venue(url=sys.intern(url) if url else url, name=name, address=address)
+        )
+
+    def intern_artist(self, artist):
+        if isinstance(artist, ArtistWithMeta):
+            return self.artist_with_meta(*artist)
+        return self.artist(*artist)
+
+    def intern_event(self, event):
+        return event._replace(
+            artists=[self.intern_artist(artist) for artist in event.artists],
+            venue=self.venue(*event.venue) if event.venue else None
+        )
@@ -0,0 +1,54 @@
+import time
+from datetime import timedelta
+
+from redis import Redis
+
+from lndngigs.codecs import get_codec, encode_event, decode_event, URL_PREFIX
+
+
+class EventPageCache:
+    """
+    Parsed concert pages, keyed by concert url.
+    Concert details hardly ever change, so they outlive the listings they appear in: on a warm cache,
+    recrawling a listing only costs its listing pages.
+    """
+    def __init__(self, redis_client: Redis, cache_key_prefix="concerts", cache_ttl=timedelta(days=7), codec=None):
+        self._redis_client = redis_client
+        self._cache_key_prefix = cache_key_prefix
+        self._cache_ttl = cache_ttl
+        self._codec = codec or get_codec("json+zlib")
+        self.hits = 0
+        self.misses = 0
+
+    def get_cache_key_name(self, url):
+        if url.startswith(URL_PREFIX):
+            url = url[len(URL_PREFIX):]
+        return "{}:{}".format(self._cache_key_prefix, url)
+
+    def get_events(self, urls):
+        """
+        Cached events for the given concert urls, read with a single MGET. Returns a dictionary url => event.
+        """
+        urls = list(urls)
+        if not urls:
+            return {}
+
+        events = {
+            url: decode_event(data)[0]
+            for url, data in zip(urls, self._redis_client.mget([self.get_cache_key_name(url) for url in urls]))
+            if data is not None
+        }
+        self.hits += len(events)
+        self.misses += len(urls) - len(events)
+        return events
+
+    def cache_events(self, events):
+        cached_at = time.time()
+        pipeline = self._redis_client.pipeline()
+        for event in events:
+            pipeline.setex(
+                name=self.get_cache_key_name(event.link),
+                value=encode_event(event, cached_at, self._codec),
+                time=self._cache_ttl
+            )
+        pipeline.execute()
@@ -0,0 +1,138 @@
+import json
+import re
+import time
+from datetime import date
+
+from redis import Redis
+
+from lndngigs.metrics import REDIS_SECONDS
+from lndngigs.utils import ValidationException
+
+
+def normalize_term(term):
+    """
+    Lowercase slug: "Sigur Rós" and "sigur-rós" are the same artist
+    """
+    return re.sub(r"[\W_]+", "-", term.strip().lower()).strip("-")
+
+
+def get_url_id(url):
+    """
+    Last path segment of a Songkick url, e.g. "1-radiohead" for "/artists/1-radiohead"
+    """
+    return url.rstrip("/").rsplit("/", 1)[-1] if url else None
+
+
+class EventIndex:
+    """
+    Inverted index of the cached listings: artist names, artist ids and venue ids => events.
+    Every term is a Redis sorted set of (location, event) entries scored by the expiry time of the listing they
+    belong to, so entries expire with their listing. Each listing also keeps the set of its entries:
+    re-caching a listing removes the events that are no longer in it.
+    """
+    def __init__(self, redis_client: Redis, cache_key_prefix="index"):
+        self._redis_client = redis_client
+        self._cache_key_prefix = cache_key_prefix
+
+    def get_term_key_name(self, kind, term):
+        return "{}:{}:{}".format(self._cache_key_prefix, kind, term)
+
+    def get_listing_key_name(self, location, events_date):
+        return "{}:listing:{}:{}".format(self._cache_key_prefix, location, events_date)
+
+    def get_terms(self, event):
+        terms = set()
+        for artist in event.artists:
+            if artist.name and normalize_term(artist.name):
+                terms.add(self.get_term_key_name("artist", normalize_term(artist.name)))
+            if artist.url:
+                terms.add(self.get_term_key_name("artist", normalize_term(get_url_id(artist.url))))
+        if event.venue and event.venue.url:
+            terms.add(self.get_term_key_name("venue", normalize_term(get_url_id(event.venue.url))))
+        return terms
+
+    @staticmethod
+    def get_member(location, event):
+        return json.dumps([location, event.to_dict()], sort_keys=True)
+
+    def index_events_bulk(self, pipeline, events_by_key, expires_at):
+        """
+        Queues in `pipeline` the index updates for the events of many (location, date) pairs.
+        The previous entries of the listings and the expiry of the terms are read first, in a single round-trip.
+        """
+        now = time.time()
+        keys = list(events_by_key)
+        entries_by_key = [
+            {
+                json.dumps([term_key_name, self.get_member(location, event)])
+                for event in events_by_key[location, events_date]
+                for term_key_name in self.get_terms(event)
+            }
+            for location, events_date in keys
+        ]
+        term_key_names = sorted({json.loads(entry)[0] for entries in entries_by_key for entry in entries})
+
+        read_pipeline = self._redis_client.pipeline()
+        for location, events_date in keys:
+            read_pipeline.smembers(self.get_listing_key_name(location, events_date))
+        for term_key_name in term_key_names:
+            read_pipeline.zrevrange(term_key_name, 0, 0, withscores=True)
+        with REDIS_SECONDS.time(operation="index_read"):
+            results = read_pipeline.execute()
+        previous_entries = results[:len(keys)]
+        # A term is kept as long as the most recent listing indexed in it: older listings (e.g. restored from a
+        # snapshot) never shorten it
+        terms_expire_at = {
+            term_key_name: int(max([expires_at] + [score for _, score in latest])) + 1
+            for term_key_name, latest in zip(term_key_names, results[len(keys):])
+        }
+
+        for (location, events_date), previous, entries in zip(keys, previous_entries, entries_by_key):
+            listing_key_name = self.get_listing_key_name(location, events_date)
+
+            for entry in {entry.decode("utf-8") for entry in previous} - entries:
+                term_key_name, member = json.loads(entry)
+                pipeline.zrem(term_key_name, member)
+                pipeline.srem(listing_key_name, entry)
+
+            for entry in entries:
+                term_key_name, member = json.loads(entry)
+                pipeline.zremrangebyscore(term_key_name, "-inf", now)
+                pipeline.zadd(term_key_name, {member: expires_at})
+                pipeline.expireat(term_key_name, terms_expire_at[term_key_name])
+            if entries:
+                pipeline.sadd(listing_key_name, *entries)
+                pipeline.expireat(listing_key_name, int(expires_at) + 1)
+
+    def get_events(self, kind, terms):
+        """
+        Upcoming indexed events matching any of the terms, as (location, event dictionary) pairs sorted by date
+        """
+        now = time.time()
+        today = date.today().strftime("%Y-%m-%d")
+        pipeline = self._redis_client.pipeline()
+        for term in terms:
+            pipeline.zrangebyscore(self.get_term_key_name(kind, term), now, "+inf")
+        with REDIS_SECONDS.time(operation="index_lookup"):
+            members = {member for term_members in pipeline.execute() for member in term_members}
+
+        entries = [tuple(json.loads(member.decode("utf-8"))) for member in members]
+        return sorted(
+            (entry for entry in entries if entry[1]["date"] >= today),
+            key=lambda entry: (entry[1]["date"], entry[1]["link"])
+        )
+
+    def get_artist_events(self, artist):
+        """
+        `artist` is either an artist name or a Songkick artist id (e.g. "1-radiohead")
+        """
+        term = normalize_term(artist)
+        if not term:
+            raise ValidationException("`{}` is not a valid artist".format(artist))
+        return self.get_events("artist", [term])
+
+    def get_venue_events(self, venue_id):
+        term = normalize_term(venue_id)
+        if not term:
+            raise ValidationException("`{}` is not a valid venue".format(venue_id))
+        return self.get_events("venue", [term])
@@ -1,17 +1,98 @@
-import json
-from datetime import timedelta, date
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import Executor, ThreadPoolExecutor
+from datetime import timedelta, date, datetime
 
 from redis import Redis
-from lxml import html
-
-from lndngigs.entities import Event, Venue, ArtistWithMeta, Artist
-from lndngigs.utils import ValidationException, parse_date
+from redis.exceptions import RedisError, ConnectionError as RedisConnectionError
+from lxml import etree, html
+
+from lndngigs.codecs import get_codec, encode_events, decode_events, render_events_json, encode_response, decode_response
+from lndngigs.entities import Event, Venue, Artist
+from lndngigs.event_index import EventIndex
+from lndngigs.job_queue import ScrapeJobQueue
+from lndngigs.local_cache import LocalCache
+from lndngigs.metrics import CACHE_REQUESTS, REDIS_SECONDS, PARSE_SECONDS
+from lndngigs.snapshot_store import SnapshotStore
+from lndngigs.utils import ValidationException, parse_date, SingleFlight, RedisLease
+
+
+class CacheEntry(namedtuple("CacheEntry", ["events", "cached_at", "status"])):
+    HIT = "HIT"
+    STALE = "STALE"
+    MISS = "MISS"
+
+    @property
+    def age(self):
+        return max(0.0, time.time() - self.cached_at) if self.cached_at is not None else 0.0
+
+
+class CachedResponse(namedtuple("CachedResponse", ["bodies", "etag", "cached_at", "status"])):
+    """
+    Pre-serialized `/gigs` response body, by content encoding
+    """
+    @property
+    def age(self):
+        return max(0.0, time.time() - self.cached_at)
+
+
+def collect_events(events, collected: list):
+    """
+    Yields the events while appending them to `collected`.
+    Returns what the events generator returned: True if the events are partial (e.g. the crawl timed out).
+    """
+    events = iter(events)
+    while True:
+        try:
+            event = next(events)
+        except StopIteration as stop:
+            return bool(stop.value)
+        collected.append(event)
+        yield event
+
+
+def consume_events(events):
+    """
+    Returns a tuple (events as a list, whether the events are partial)
+    """
+    collected = []
+    events = collect_events(events, collected)
+    try:
+        while True:
+            next(events)
+    except StopIteration as stop:
+        return collected, stop.value
 
 
 class EventListingInterface:
     def get_events(self, location, events_date):
+        """
+        Events generator: it may return True to signal that the events are partial
+        """
         raise NotImplementedError
 
+    def get_cached_response(self, location, events_date) -> CachedResponse:
+        return None
+
+    def get_events_bulk(self, keys):
+        """
+        Events for many (location, date) pairs, as a dictionary keyed by pair
+        """
+        return {(location, events_date): list(self.get_events(location, events_date)) for location, events_date in keys}
+
+    def get_events_delta(self, location, events_date, cached_events):
+        """
+        Refreshed events, given the previous ones: listings that cannot diff simply scrape everything again
+        """
+        return list(self.get_events(location, events_date))
+
+    def get_entry(self, location, events_date) -> CacheEntry:
+        """
+        Events with their cache metadata; listings without a cache always produce fresh events
+        """
+        return CacheEntry(events=self.get_events(location, events_date), cached_at=None, status=None)
+
     def parse_event_date(self, date_str):
         raise NotImplementedError
 
@@ -19,7 +100,62 @@ class EventListingInterface:
         raise NotImplementedError
 
 
+def _has_class(tag, class_name):
+    return "{}[contains(concat(' ', normalize-space(@class), ' '), ' {} ')]".format(tag, class_name)
+
+
+# XPath fast path: expressions are compiled once, and match the same elements as the CSS selectors they replace
+_xpath_line_up_artists = etree.XPath(
+    "descendant::{}/descendant::a[starts-with(@href, '/artists/')]".format(_has_class("*", "line-up"))
+)
+_xpath_summary_artists = etree.XPath(
+    "descendant::{}/descendant::a[starts-with(@href, '/artists/')]".format(_has_class("*", "summary"))
+)
+_xpath_venues = etree.XPath(
+    "descendant::{}/descendant::a[starts-with(@href, '/venues/')]".format(_has_class("*", "location"))
+)
+_xpath_venue_address = etree.XPath("descendant::{}/descendant::span".format(_has_class("p", "venue-hcard")))
+_xpath_event_datetimes = etree.XPath("descendant::time/@datetime")
+_xpath_event_urls = etree.XPath("descendant::a[starts-with(@href, '/concerts/')]/@href")
+_xpath_page_urls = etree.XPath("descendant::{}/descendant::a/@href".format(_has_class("*", "pagination")))
+
+_html_parsers = threading.local()
+
+
+def parse_event_datetime(datetimes):
+    """
+    Date of the first parsable `time[datetime]` attribute (e.g. 2016-03-12T19:00:00+0000)
+    """
+    for value in datetimes:
+        try:
+            return datetime.strptime(value.strip()[:10], "%Y-%m-%d").date()
+        except ValueError:
+            continue
+    return None
+
+
+def partition_events_by_date(events, dates):
+    """
+    Splits the events scraped from a date range listing by date, only keeping the given dates
+    """
+    events_by_date = {events_date: [] for events_date in dates}
+    for event in events:
+        if event.date in events_by_date:
+            events_by_date[event.date].append(event)
+    return events_by_date
+
+
+def _get_html_parser():
+    # lxml parsers should not be shared across threads
+    if not hasattr(_html_parsers, "parser"):
+        _html_parsers.parser = etree.HTMLParser(collect_ids=False, remove_comments=True, remove_pis=True)
+    return _html_parsers.parser
+
+
 class SongkickScraper:
+    # Parser backend: "xpath" (precompiled XPath fast path) or "css" (cssselect)
+    PARSER = "xpath"
+
     LOCATIONS = {
         # Uk
         "london": "24426-uk-london",
@@ -63,13 +199,20 @@ class SongkickScraper:
             return events_date
 
     @classmethod
-    def get_events_listing_url(cls, location, events_date):
+    def get_events_listing_url(cls, location, events_date, until_date=None):
+        """
+        Listing of the events happening on `events_date`, or between `events_date` and `until_date`
+        """
+        until_date = until_date or events_date
         date_filters = \
             "filters%5BminDate%5D={month:02}%2F{day:02}%2F{year}" \
-            "&filters%5BmaxDate%5D={month:02}%2F{day:02}%2F{year}".format(
+            "&filters%5BmaxDate%5D={until_month:02}%2F{until_day:02}%2F{until_year}".format(
                 year=events_date.year,
                 month=events_date.month,
                 day=events_date.day,
+                until_year=until_date.year,
+                until_month=until_date.month,
+                until_day=until_date.day,
             )
 
         return "https://www.songkick.com/metro-areas/{location}?utf8=✓{date_filters}".format(
@@ -77,9 +220,69 @@ class SongkickScraper:
             date_filters=date_filters
         )
 
-    @staticmethod
-    def parse_event_page(logger, url, content, events_date) -> Event:
+    @classmethod
+    def parse_event_page(cls, logger, url, content, events_date) -> Event:
         logger.debug("Scraping event at {}".format(url))
+        with PARSE_SECONDS.time(page_type="event"):
+            if cls.PARSER == "css":
+                return cls.parse_event_page_css(url, content, events_date)
+            return cls.parse_event_page_xpath(url, content, events_date)
+
+    @classmethod
+    def parse_event_listing_page(cls, logger, url, content):
+        logger.debug("Scraping event listing at {}".format(url))
+        with PARSE_SECONDS.time(page_type="listing"):
+            if cls.PARSER == "css":
+                return cls.parse_event_listing_page_css(url, content)
+            return cls.parse_event_listing_page_xpath(url, content)
+
+    @staticmethod
+    def parse_event_page_xpath(url, content, events_date) -> Event:
+        """
+        Without an `events_date` (date range listings), the date is read from the page
+        """
+        tree = etree.fromstring(content, _get_html_parser())
+
+        artists = [
+            Artist(
+                url="http://www.songkick.com{}".format(element.attrib["href"]),
+                name=element.text.strip()
+            )
+            # Sometimes the line-up is missing, let's try to get them from the summary
+            for element in _xpath_line_up_artists(tree) or _xpath_summary_artists(tree)
+        ]
+
+        venue = None
+        venue_elements = _xpath_venues(tree)
+        if venue_elements:
+            venue = Venue(
+                url="http://www.songkick.com{}".format(venue_elements[0].attrib["href"]),
+                name=venue_elements[0].text.strip(),
+                address=", ".join(
+                    [
+                        element.text.strip()
+                        for element in _xpath_venue_address(tree)
+                        if element.text is not None and element.text.strip() != ""
+                    ][:3]
+                )
+            )
+
+        if events_date is None:
+            events_date = parse_event_datetime(_xpath_event_datetimes(tree))
+
+        return Event(link=url, artists=artists, venue=venue, date=events_date)
+
+    @staticmethod
+    def parse_event_listing_page_xpath(url, content):
+        tree = etree.fromstring(content, _get_html_parser())
+
+        event_urls = {"http://www.songkick.com{}".format(href) for href in _xpath_event_urls(tree)}
+        page_urls = {"http://www.songkick.com{}".format(href) for href in _xpath_page_urls(tree)}
+
+        return event_urls, page_urls
+
+    @staticmethod
+    def parse_event_page_css(url, content, events_date) -> Event:
         tree = html.fromstring(content)
 
         artists = [
@@ -121,11 +324,13 @@ class SongkickScraper:
             if element.attrib["href"].startswith("/venues/")
         ])
 
+        if events_date is None:
+            events_date = parse_event_datetime([element.attrib["datetime"] for element in tree.cssselect("time[datetime]")])
+
         return Event(link=url, artists=artists, venue=venue, date=events_date)
 
     @staticmethod
-    def parse_event_listing_page(logger, url, content):
-        logger.debug("Scraping event listing at {}".format(url))
+    def parse_event_listing_page_css(url, content):
         tree = html.fromstring(content)
 
         event_urls = {
@@ -142,81 +347,584 @@ class SongkickScraper:
         return event_urls, page_urls
 
 
+class PartialEventsException(Exception):
+    pass
+
+
+class PartialEvents(list):
+    """
+    Events of a crawl that did not complete: shared with the requests waiting for it, but never cached
+    """
+
+
+# Cache fills in progress in this process, shared by all the CachedEventListing instances
+_cache_fills = SingleFlight()
+
+_background_refreshes = ThreadPoolExecutor(max_workers=4, thread_name_prefix="cache-refresh")
+
+
 class CachedEventListing(EventListingInterface):
-    def __init__(self, logger, event_listing: EventListingInterface, redis_client: Redis, cache_key_prefix: str, cache_ttl=timedelta(days=1)):
+    """
+    Events are cached for `cache_ttl` (hard TTL), but are considered stale after `soft_ttl`:
+    stale events are served straight away while they get refreshed in the background.
+    With `delta_refresh`, refreshes diff the listing against the cached events rather than recrawling every concert.
+    With a `refresh_queue`, refreshes are left to the workers (see `lndngigs.worker`) rather than done in this process.
+    Cached events are added to the `event_index`, if any, as they are written.
+    With a `snapshot_store`, cached events are also written to local disk, and read from it when Redis misses them
+    or is unavailable (or not configured at all: `redis_client` can be None).
+    """
+    def __init__(self, logger, event_listing: EventListingInterface, redis_client: Redis, cache_key_prefix: str, cache_ttl=timedelta(days=1),
+                 soft_ttl=None, refresh_executor: Executor = None, track_popularity=False, codec=None,
+                 local_cache: LocalCache = None,
+                 lease_ttl=timedelta(minutes=2), lease_wait=timedelta(minutes=1), lease_poll_interval=0.1,
+                 single_flight: SingleFlight = None, delta_refresh=False, refresh_queue: ScrapeJobQueue = None,
+                 event_index: EventIndex = None, snapshot_store: SnapshotStore = None):
         self._logger = logger
         self._event_listing = event_listing
         self._redis_client = redis_client
         self._cache_key_prefix = cache_key_prefix
         self._cache_ttl = cache_ttl
+        self._soft_ttl = min(soft_ttl, cache_ttl) if soft_ttl is not None else cache_ttl
+        self._refresh_executor = refresh_executor or _background_refreshes
+        self._track_popularity = track_popularity
+        self._codec = codec or get_codec("json+zlib")
+        self._local_cache = local_cache
+        self._lease_ttl = lease_ttl
+        self._lease_wait = lease_wait
+        self._lease_poll_interval = lease_poll_interval
+        self._single_flight = single_flight or _cache_fills
+        self._delta_refresh = delta_refresh
+        self._refresh_queue = refresh_queue
+        self._event_index = event_index
+        self._snapshot_store = snapshot_store
+
+    @property
+    def _redis(self) -> Redis:
+        if self._redis_client is None:
+            raise RedisConnectionError("Redis is not configured")
+        return self._redis_client
+
+    def _on_redis_error(self, ex, action):
+        # Without a snapshot to fall back to, Redis errors are not recoverable
+        if self._snapshot_store is None:
+            raise ex
+        self._logger.warning("Redis is unavailable ({!r}), {}".format(ex, action))
 
     def get_cache_key_name(self, location, events_date):
         return "{}:{}:{}".format(self._cache_key_prefix, location, events_date)
 
-    def get_cached_events(self, location, events_date):
+    def get_response_key_name(self, location, events_date):
+        return "{}:response".format(self.get_cache_key_name(location, events_date))
+
+    @property
+    def soft_ttl(self):
+        return self._soft_ttl
+
+    @property
+    def popularity_key_name(self):
+        return "{}:popularity".format(self._cache_key_prefix)
+
+    @property
+    def invalidations_channel(self):
+        return "{}:invalidations".format(self._cache_key_prefix)
+
+    def get_partial_key_name(self, location, events_date):
+        return "{}:partial".format(self.get_cache_key_name(location, events_date))
+
+    @property
+    def refreshed_at_key_name(self):
+        return "{}:refreshed-at".format(self._cache_key_prefix)
+
+    def get_popularity(self):
+        return {
+            location.decode("utf-8"): score
+            for location, score in self._redis.zrange(self.popularity_key_name, 0, -1, withscores=True)
+        }
+
+    def get_refreshed_at(self):
+        return {
+            key.decode("utf-8"): float(refreshed_at)
+            for key, refreshed_at in self._redis.hgetall(self.refreshed_at_key_name).items()
+        }
+
+    def prune_refreshed_at(self, before=None):
+        """
+        Forgets when the listings of the days before `before` (default: today) were refreshed
+        """
+        before = (before or date.today()).isoformat()
+        past_keys = [
+            key for key in self._redis.hkeys(self.refreshed_at_key_name)
+            if key.decode("utf-8").rsplit(":", 1)[-1] < before
+        ]
+        if past_keys:
+            self._redis.hdel(self.refreshed_at_key_name, *past_keys)
+        return len(past_keys)
+
+    def get_cached_entry(self, location, events_date, track_popularity=False):
         key_name = self.get_cache_key_name(location, events_date)
 
-        if not self._redis_client.exists(key_name):
-            self._logger.debug("Cache miss `{}`".format(key_name))
-            return None
+        cached = self._local_cache.get(key_name) if self._local_cache is not None else None
+
+        if cached is None and self._redis_client is None:
+            # Without Redis, the snapshot store is the cache
+            return self._get_snapshot_entry(location, events_date, max_age=self._cache_ttl)
+
+        if cached is None:
+            try:
+                if track_popularity:
+                    # Requests served by the local cache are not counted: popularity is sampled at most once per local TTL
+                    pipeline = self._redis.pipeline()
+                    pipeline.zincrby(self.popularity_key_name, 1, location)
+                    pipeline.get(key_name)
+                    with REDIS_SECONDS.time(operation="get"):
+                        _, data = pipeline.execute()
+                else:
+                    with REDIS_SECONDS.time(operation="get"):
+                        data = self._redis.get(key_name)
+            except RedisError as ex:
+                self._on_redis_error(ex, "reading `{}` from the local snapshot".format(key_name))
+                # Last known good events, however old they are
+                return self._get_snapshot_entry(location, events_date, max_age=None)
+            if data is None:
+                entry = self._get_snapshot_entry(location, events_date, max_age=self._cache_ttl)
+                if entry is None:
+                    self._logger.debug("Cache miss `{}`".format(key_name))
+                return entry
+
+            events, cached_at = decode_events(data, events_date)
+            cached = tuple(events), cached_at
+            self._cache_locally(key_name, cached, cached_at)
 
         self._logger.debug("Cache hit `{}`".format(key_name))
 
-        event_json = self._redis_client.get(key_name).decode("utf-8")
+        return self._get_cache_entry(*cached)
+
+    def get_cached_entries(self, keys, track_popularity=False):
+        """
+        Cached entries for many (location, date) pairs, read from Redis with a single pipelined MGET.
+        Returns a dictionary keyed by pair, misses are left out.
+        """
+        entries = {}
+        remote_keys = []
+
+        for location, events_date in keys:
+            cached = self._local_cache.get(self.get_cache_key_name(location, events_date)) if self._local_cache is not None else None
+            if cached is None:
+                remote_keys.append((location, events_date))
+            else:
+                entries[location, events_date] = self._get_cache_entry(*cached)
+
+        if remote_keys:
+            snapshot_max_age = self._cache_ttl
+            if self._redis_client is None:
+                values = [None] * len(remote_keys)
+            else:
+                try:
+                    pipeline = self._redis.pipeline()
+                    if track_popularity:
+                        for location in {location for location, _ in remote_keys}:
+                            pipeline.zincrby(self.popularity_key_name, 1, location)
+                    pipeline.mget([self.get_cache_key_name(location, events_date) for location, events_date in remote_keys])
+                    with REDIS_SECONDS.time(operation="mget"):
+                        values = pipeline.execute()[-1]
+                except RedisError as ex:
+                    self._on_redis_error(ex, "reading {} entries from the local snapshot".format(len(remote_keys)))
+                    values = [None] * len(remote_keys)
+                    snapshot_max_age = None
+
+            for (location, events_date), data in zip(remote_keys, values):
+                if data is not None:
+                    events, cached_at = decode_events(data, events_date)
+                    cached = tuple(events), cached_at
+                    self._cache_locally(self.get_cache_key_name(location, events_date), cached, cached_at)
+                    entries[location, events_date] = self._get_cache_entry(*cached)
+                else:
+                    entry = self._get_snapshot_entry(location, events_date, max_age=snapshot_max_age)
+                    if entry is not None:
+                        entries[location, events_date] = entry
+
+        self._logger.debug("Cache hits: {} out of {}".format(len(entries), len(keys)))
+        return entries
+
+    def _get_snapshot_entry(self, location, events_date, max_age):
+        """
+        Events of the snapshot store no older than `max_age` (None: any age), None if there are none
+        """
+        if self._snapshot_store is None:
+            return None
+        snapshot = self._snapshot_store.get_events(location, events_date)
+        if snapshot is None:
+            return None
+        events, cached_at = snapshot
+        if max_age is not None and time.time() - cached_at >= max_age.total_seconds():
+            return None
+
+        key_name = self.get_cache_key_name(location, events_date)
+        self._logger.debug("Snapshot hit `{}`".format(key_name))
+        cached = tuple(events), cached_at
+        self._cache_locally(key_name, cached, cached_at)
+        return self._get_cache_entry(*cached)
+
+    def _get_cache_entry(self, events, cached_at):
+        is_stale = cached_at is None or time.time() - cached_at >= self._soft_ttl.total_seconds()
+        return CacheEntry(events=list(events), cached_at=cached_at, status=CacheEntry.STALE if is_stale else CacheEntry.HIT)
+
+    def _cache_locally(self, key_name, value, cached_at):
+        if self._local_cache is not None:
+            # Never outlive the Redis entry
+            expires_at = cached_at + self._cache_ttl.total_seconds() if cached_at is not None else None
+            self._local_cache.set(key_name, value, expires_at=expires_at)
+
+    def get_cached_response(self, location, events_date):
+        """
+        The response body ready to be served, without decoding the events; stale responses trigger a refresh
+        """
+        key_name = self.get_response_key_name(location, events_date)
+
+        cached = self._local_cache.get(key_name) if self._local_cache is not None else None
+
+        if cached is None and self._redis_client is None:
+            # Responses are only cached in Redis: the events are read from the snapshot store
+            return None
 
-        def parse_artist(artist):
+        if cached is None:
             try:
-                return ArtistWithMeta(
-                    url=artist["url"],
-                    name=artist["name"],
-                    tags=artist["tags"],
-                    image_url=artist["image_url"]
-                )
-            except KeyError:
-                return Artist(
-                    url=artist["url"],
-                    name=artist["name"]
-                )
+                if self._track_popularity:
+                    # As for cached entries, requests served by the local cache are not counted
+                    pipeline = self._redis.pipeline()
+                    pipeline.zincrby(self.popularity_key_name, 1, location)
+                    pipeline.get(key_name)
+                    with REDIS_SECONDS.time(operation="get_response"):
+                        _, data = pipeline.execute()
+                    if data is None:
+                        # Misses are counted once the events are looked up
+                        self._redis.zincrby(self.popularity_key_name, -1, location)
+                else:
+                    with REDIS_SECONDS.time(operation="get_response"):
+                        data = self._redis.get(key_name)
+            except RedisError as ex:
+                # The events are then read from the snapshot
+                self._on_redis_error(ex, "`{}` not available".format(key_name))
+                return None
+            if data is None:
+                return None
+            cached = decode_response(data)
+            self._cache_locally(key_name, cached, cached[2])
+
+        bodies, etag, cached_at = cached
+        if time.time() - cached_at >= self._soft_ttl.total_seconds():
+            self.schedule_refresh(location, events_date)
+            CACHE_REQUESTS.inc(location=location, status=CacheEntry.STALE)
+            return CachedResponse(bodies=bodies, etag=etag, cached_at=cached_at, status=CacheEntry.STALE)
+        CACHE_REQUESTS.inc(location=location, status=CacheEntry.HIT)
+        return CachedResponse(bodies=bodies, etag=etag, cached_at=cached_at, status=CacheEntry.HIT)
+
+    def get_cached_events(self, location, events_date):
+        entry = self.get_cached_entry(location, events_date)
+        return entry.events if entry is not None else None
+
+    def cache_events(self, location, events_date, events_with_tags):
+        self.cache_events_bulk({(location, events_date): events_with_tags})
+
+    def cache_events_bulk(self, events_by_key):
+        """
+        Caches the events of many (location, date) pairs in a single pipeline (and in the snapshot store)
+        """
+        cached_at = time.time()
+
+        if self._snapshot_store is not None:
+            self._snapshot_store.cache_events_bulk(events_by_key, cached_at)
 
-        def parse_venue(venue):
-            return Venue(url=venue["url"], name=venue["name"], address=venue["address"]) if venue else None
-
-        return [
-            Event(
-                link=event["link"],
-                artists=[
-                    parse_artist(artist)
-                    for artist in event["artists"]
-                ],
-                venue=parse_venue(event["venue"]),
-                date=events_date
+        try:
+            if self._redis_client is not None:
+                self._cache_in_redis(events_by_key, cached_at)
+        except RedisError as ex:
+            self._on_redis_error(ex, "{} entries only cached in the local snapshot".format(len(events_by_key)))
+
+        for (location, events_date), events_with_tags in events_by_key.items():
+            key_name = self.get_cache_key_name(location, events_date)
+            self._cache_locally(key_name, (tuple(events_with_tags), cached_at), cached_at)
+            self._logger.debug("{} events cached: `{}`".format(len(events_with_tags), key_name))
+
+    def _cache_in_redis(self, events_by_key, cached_at):
+        # Entries restored from the snapshot keep their age, and expire when they would have expired
+        ttl = max(1, int(cached_at + self._cache_ttl.total_seconds() - time.time()))
+        cached_responses = []
+
+        pipeline = self._redis.pipeline()
+        for (location, events_date), events_with_tags in events_by_key.items():
+            key_name = self.get_cache_key_name(location, events_date)
+            response_key_name = self.get_response_key_name(location, events_date)
+            response = encode_response(render_events_json(events_with_tags), cached_at)
+
+            pipeline.setex(
+                name=key_name,
+                value=encode_events(events_with_tags, cached_at, self._codec),
+                time=ttl
             )
-            for event in json.loads(event_json)
+            pipeline.setex(name=response_key_name, value=response, time=ttl)
+            pipeline.hset(self.refreshed_at_key_name, key_name, cached_at)
+            if self._local_cache is not None:
+                self._local_cache.publish_invalidation(pipeline, self.invalidations_channel, key_name)
+                self._local_cache.publish_invalidation(pipeline, self.invalidations_channel, response_key_name)
+            cached_responses.append((response_key_name, response))
+        if self._event_index is not None:
+            self._event_index.index_events_bulk(pipeline, events_by_key, expires_at=cached_at + self._cache_ttl.total_seconds())
+        with REDIS_SECONDS.time(operation="set"):
+            pipeline.execute()
+
+        for response_key_name, response in cached_responses:
+            self._cache_locally(response_key_name, decode_response(response), cached_at)
+
+    def preload_snapshot(self):
+        """
+        Restores into Redis the snapshot listings it is missing (e.g. Redis was flushed or is brand new),
+        so that they are served rather than crawled again. Past days are pruned from the snapshot store.
+        Returns the number of listings restored.
+        """
+        if self._snapshot_store is None or self._redis_client is None:
+            return 0
+
+        self._snapshot_store.prune()
+        now = time.time()
+        snapshots = [
+            (key, events, cached_at)
+            for key, events, cached_at in self._snapshot_store.get_all_events()
+            if now - cached_at < self._cache_ttl.total_seconds()
         ]
+        if not snapshots:
+            return 0
 
-    def cache_events(self, location, events_date, events_with_tags):
-        key_name = self.get_cache_key_name(location, events_date)
-        self._redis_client.setex(
-            name=key_name,
-            value=json.dumps([
-                event.to_dict()
-                for event in events_with_tags
-            ]).encode("utf-8"),
-            time=self._cache_ttl
-        )
-        self._logger.debug("{} events cached: `{}`".format(len(events_with_tags), key_name))
+        try:
+            pipeline = self._redis.pipeline()
+            for (location, events_date), _, _ in snapshots:
+                pipeline.exists(self.get_cache_key_name(location, events_date))
+            missing = [snapshot for snapshot, exists in zip(snapshots, pipeline.execute()) if not exists]
+            for key, events, cached_at in missing:
+                self._cache_in_redis({key: events}, cached_at)
+        except RedisError as ex:
+            self._on_redis_error(ex, "snapshot not restored")
+            return 0
+
+        self._logger.info("{} listings restored from the local snapshot".format(len(missing)))
+        return len(missing)
+
+    def get_entry(self, location, events_date):
+        entry = self.get_cached_entry(location, events_date, track_popularity=self._track_popularity)
+
+        if entry is None:
+            CACHE_REQUESTS.inc(location=location, status=CacheEntry.MISS)
+            return CacheEntry(events=self._get_or_fill_events(location, events_date), cached_at=None, status=CacheEntry.MISS)
+
+        CACHE_REQUESTS.inc(location=location, status=entry.status)
+
+        if entry.status == CacheEntry.STALE:
+            self._logger.debug("Stale entry `{}`".format(self.get_cache_key_name(location, events_date)))
+            self.schedule_refresh(location, events_date)
+
+        return entry
 
     def get_events(self, location, events_date):
-        events = self.get_cached_events(location, events_date)
-        if events is not None:
-            yield from events
+        return (yield from self.get_entry(location, events_date).events)
+
+    def get_events_bulk(self, keys):
+        """
+        Cache hits are read in one round-trip, misses are scraped together (one shared crawl when the listing allows it).
+        Pairs that could not be scraped entirely are left out.
+        Bulk misses are not coordinated with other processes: concurrent per-pair misses still are.
+        """
+        entries = self.get_cached_entries(keys, track_popularity=self._track_popularity)
+
+        for (location, events_date), entry in entries.items():
+            CACHE_REQUESTS.inc(location=location, status=entry.status)
+            if entry.status == CacheEntry.STALE:
+                self.schedule_refresh(location, events_date)
+
+        missing_keys = [key for key in keys if key not in entries]
+        for location, _ in missing_keys:
+            CACHE_REQUESTS.inc(location=location, status=CacheEntry.MISS)
+        scraped_events = self._event_listing.get_events_bulk(missing_keys) if missing_keys else {}
+        if scraped_events:
+            self.cache_events_bulk(scraped_events)
+
+        return {
+            key: entries[key].events if key in entries else scraped_events[key]
+            for key in keys
+            if key in entries or key in scraped_events
+        }
+
+    def schedule_refresh(self, location, events_date):
+        if self._refresh_queue is not None:
+            try:
+                self._refresh_queue.enqueue_scrape(location, events_date)
+            except RedisError as ex:
+                self._on_redis_error(ex, "`{}` not refreshed".format(self.get_cache_key_name(location, events_date)))
         else:
-            self._logger.debug("Retrieving events for {} in {}...".format(events_date, location))
-            events = []
-            for event in self._event_listing.get_events(location, events_date):
-                yield event
-                events.append(event)
-            self.cache_events(location, events_date, events)
+            self._refresh_executor.submit(self.refresh_events, location, events_date)
+
+    def refresh_events(self, location, events_date, raise_errors=False):
+        """
+        Recrawls and caches the events, unless someone else (in this or other processes) is already doing it.
+        Returns the refreshed events, None if the refresh did not happen.
+        Errors are logged, and raised as well with `raise_errors`.
+        """
+        key_name = self.get_cache_key_name(location, events_date)
+
+        fill, is_leader = self._single_flight.join(key_name)
+        if not is_leader:
+            return
+
+        refreshed_events = None
+        try:
+            lease = self._acquire_lease(key_name)
+            try:
+                if lease is None or lease.acquired:
+                    self._logger.debug("Refreshing events for {} in {}...".format(events_date, location))
+                    cached_entry = self.get_cached_entry(location, events_date) if self._delta_refresh else None
+                    if cached_entry is not None:
+                        # Only the listing pages and the concerts that were not there before are scraped
+                        refreshed_events = self._event_listing.get_events_delta(location, events_date, cached_entry.events)
+                    else:
+                        refreshed_events, partial = consume_events(self._event_listing.get_events(location, events_date))
+                        if partial:
+                            raise PartialEventsException("Partial events for `{}`, not refreshed".format(key_name))
+                    self.cache_events(location, events_date, refreshed_events)
+            finally:
+                self._release_lease(lease)
+        except Exception:
+            refreshed_events = None
+            self._logger.exception("Could not refresh `{}`".format(key_name))
+            if raise_errors:
+                raise
+        finally:
+            fill.set_result(refreshed_events)
+            self._single_flight.leave(key_name)
+
+        return refreshed_events
+
+    def _get_or_fill_events(self, location, events_date):
+        key_name = self.get_cache_key_name(location, events_date)
+
+        while True:
+            # Single-flight: concurrent misses in this process share the same cache fill
+            fill, is_leader = self._single_flight.join(key_name)
+            if is_leader:
+                return (yield from self._fill_cache(location, events_date, fill))
+
+            self._logger.debug("Waiting for in-flight cache fill `{}`".format(key_name))
+            events = fill.result()
+            if isinstance(events, PartialEvents):
+                # The crawl timed out: crawling again would only make this request wait longer
+                yield from events
+                return True
+            if events is None:
+                # The fill was abandoned half way through, let's see if someone else managed to cache the events
+                events = self.get_cached_events(location, events_date)
+            if events is not None:
+                yield from events
+                return
+
+    def _fill_cache(self, location, events_date, fill):
+        key_name = self.get_cache_key_name(location, events_date)
+        filled_events = None
+
+        try:
+            # Across processes, only the lease holder crawls while the others wait for the cache to be populated
+            lease = self._acquire_lease(key_name)
+            events = None if lease is None or lease.acquired else self._wait_for_cache_fill(location, events_date, lease)
+
+            if isinstance(events, PartialEvents):
+                yield from events
+                filled_events = events
+                return True
+            elif events is not None:
+                yield from events
+            else:
+                if lease is not None and not lease.acquired:
+                    # Either the holder gave up or it is taking too long, best effort to take over
+                    lease.acquire()
+                try:
+                    self._logger.debug("Retrieving events for {} in {}...".format(events_date, location))
+                    events = []
+                    partial = yield from collect_events(self._event_listing.get_events(location, events_date), events)
+                    if partial:
+                        # Served as they are, but never cached
+                        self._logger.warning("Partial events for `{}`, not cached".format(key_name))
+                        filled_events = PartialEvents(events)
+                        self._share_partial_events(location, events_date, filled_events, lease)
+                        return True
+                    self.cache_events(location, events_date, events)
+                finally:
+                    self._release_lease(lease)
+
+            filled_events = events
+        except Exception as ex:
+            fill.set_exception(ex)
+            raise
+        finally:
+            if not fill.done():
+                fill.set_result(filled_events)
+            self._single_flight.leave(key_name)
+
+    def _acquire_lease(self, key_name):
+        """
+        Cross-process lease on the fill of `key_name`. Returns None if Redis is unavailable and there is a snapshot store:
+        fills are then only coordinated within this process, as they are without Redis.
+        """
+        if self._redis_client is None:
+            return None
+        try:
+            lease = RedisLease(self._redis, "{}:lock".format(key_name), ttl=self._lease_ttl)
+            lease.acquire()
+            return lease
+        except RedisError as ex:
+            self._on_redis_error(ex, "`{}` filled without a lease".format(key_name))
+            return None
+
+    def _release_lease(self, lease: RedisLease):
+        if lease is None:
+            return
+        try:
+            lease.release()
+        except RedisError as ex:
+            # The lease expires on its own anyway
+            self._on_redis_error(ex, "lease not released")
+
+    def _share_partial_events(self, location, events_date, events: PartialEvents, lease: RedisLease):
+        """
+        Partial events are kept for a little while, for the other processes waiting for the same fill
+        """
+        if lease is None:
+            return
+        try:
+            self._redis.set(
+                self.get_partial_key_name(location, events_date),
+                encode_events(events, time.time(), self._codec),
+                px=self._lease_wait
+            )
+        except RedisError as ex:
+            self._logger.warning("Partial events not shared ({!r})".format(ex))
+
+    def _get_partial_events(self, location, events_date):
+        data = self._redis.get(self.get_partial_key_name(location, events_date))
+        return PartialEvents(decode_events(data, events_date)[0]) if data is not None else None
+
+    def _wait_for_cache_fill(self, location, events_date, lease: RedisLease):
+        """
+        Events cached by the lease holder, or the partial events it could crawl.
+        Returns None if the holder gave up or did not finish in time.
+        """
+        self._logger.debug("Waiting for another process to fill `{}`".format(self.get_cache_key_name(location, events_date)))
+        deadline = time.time() + self._lease_wait.total_seconds()
+        while time.time() < deadline:
+            time.sleep(self._lease_poll_interval)
+            if not lease.is_held():
+                events = self.get_cached_events(location, events_date)
+                return events if events is not None else self._get_partial_events(location, events_date)
+            events = self.get_cached_events(location, events_date)
+            if events is not None:
+                return events
+        return None
 
     def parse_event_date(self, date_str):
         return self._event_listing.parse_event_date(date_str)
@@ -1,12 +1,21 @@
-import asyncio
 import logging
 import sys
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import timedelta
 
 import redis
 from redis import Redis
 
+from lndngigs.codecs import get_codec
+from lndngigs.enrichment import ArtistEnricher, ArtistMetadataCache, LastfmMetadataProvider, StubMetadataProvider
+from lndngigs.event_cache import EventPageCache
+from lndngigs.event_index import EventIndex
 from lndngigs.event_listing import CachedEventListing, EventListingInterface
-from lndngigs.async_event_listing import AsyncEventListingLite
+from lndngigs.job_queue import ScrapeJobQueue
+from lndngigs.local_cache import LocalCache
+from lndngigs.revalidation import RevalidationStore
+from lndngigs.snapshot_store import SnapshotStore
+from lndngigs.async_event_listing import AsyncEventListingLite, HttpClient, get_thread_event_loop
 from lndngigs.utils import Config
 
 
@@ -26,24 +35,196 @@ def get_logger(debug=False) -> logging.Logger:
     return logger
 
 
-def get_event_listing_lite(logger, redis_client: Redis) -> EventListingInterface:
+_http_client = None
+
+
+def get_http_client() -> HttpClient:
+    # One pooled client per process: connections, DNS lookups and the concurrency budget are shared across requests
+    global _http_client
+    if _http_client is None:
+        config = Config()
+        _http_client = HttpClient(
+            concurrency=config.HTTP_CONCURRENCY,
+            limit_per_host=config.HTTP_LIMIT_PER_HOST,
+            connect_timeout=config.HTTP_CONNECT_TIMEOUT,
+            read_timeout=config.HTTP_READ_TIMEOUT,
+            request_timeout=config.HTTP_REQUEST_TIMEOUT,
+            retries=config.HTTP_RETRIES,
+            latency_target=config.HTTP_LATENCY_TARGET,
+            hedge=config.HTTP_HEDGE,
+        )
+    return _http_client
+
+
+_parse_executor = None
+
+
+def get_parse_executor() -> Executor:
+    # Pages are parsed in the event loop unless PARSE_WORKERS is set
+    global _parse_executor
+    config = Config()
+    if _parse_executor is None and config.PARSE_WORKERS > 0:
+        if config.PARSE_EXECUTOR == "thread":
+            _parse_executor = ThreadPoolExecutor(max_workers=config.PARSE_WORKERS, thread_name_prefix="parser")
+        else:
+            _parse_executor = ProcessPoolExecutor(max_workers=config.PARSE_WORKERS)
+    return _parse_executor
+
+
+_local_cache = None
+
+
+def get_local_cache(redis_client: Redis, cache_key_prefix) -> LocalCache:
+    # One in-process cache per worker, kept coherent with the other workers via Redis pub/sub
+    global _local_cache
+    config = Config()
+    if _local_cache is None and config.LOCAL_CACHE_SIZE > 0:
+        _local_cache = LocalCache(max_size=config.LOCAL_CACHE_SIZE, ttl=timedelta(seconds=config.LOCAL_CACHE_TTL))
+        _local_cache.listen_for_invalidations(redis_client, "{}:invalidations".format(cache_key_prefix))
+    return _local_cache
+
+
+def get_event_page_cache(redis_client: Redis) -> EventPageCache:
+    config = Config()
+    return EventPageCache(
+        redis_client=redis_client,
+        cache_key_prefix="concerts",
+        cache_ttl=timedelta(seconds=config.EVENT_CACHE_TTL),
+        codec=get_codec(config.CACHE_CODEC)
+    )
+
+
+def get_revalidation_store(redis_client: Redis) -> RevalidationStore:
+    return RevalidationStore(
+        redis_client=redis_client,
+        cache_key_prefix="pages",
+        cache_ttl=timedelta(seconds=Config().PAGE_REVALIDATION_TTL)
+    )
+
+
+_metadata_http_client = None
+
+
+def get_metadata_http_client() -> HttpClient:
+    # Not Songkick's client: the metadata provider gets its own connections and concurrency limit,
+    # so that its slowdowns do not throttle the crawls (nor are its requests charged to the warmer budget)
+    global _metadata_http_client
+    if _metadata_http_client is None:
+        config = Config()
+        _metadata_http_client = HttpClient(
+            concurrency=config.ENRICHMENT_CONCURRENCY,
+            limit_per_host=config.ENRICHMENT_CONCURRENCY,
+            connect_timeout=config.HTTP_CONNECT_TIMEOUT,
+            read_timeout=config.HTTP_READ_TIMEOUT,
+            request_timeout=config.HTTP_REQUEST_TIMEOUT,
+            retries=config.HTTP_RETRIES,
+            latency_target=config.HTTP_LATENCY_TARGET,
+        )
+    return _metadata_http_client
+
+
+def get_metadata_provider(config: Config):
+    if config.ENRICHMENT_PROVIDER == "lastfm":
+        return LastfmMetadataProvider(api_key=config.LASTFM_API_KEY, http_client=get_metadata_http_client())
+    if config.ENRICHMENT_PROVIDER == "stub":
+        return StubMetadataProvider()
+    raise Exception("Unknown enrichment provider `{}`".format(config.ENRICHMENT_PROVIDER))
+
+
+_artist_enricher = None
+
+
+def get_artist_enricher(redis_client: Redis) -> ArtistEnricher:
+    # One per process, as the provider rate budget is shared by all the crawls; None unless ENRICHMENT_PROVIDER is set
+    global _artist_enricher
+    config = Config()
+    if _artist_enricher is None and config.ENRICHMENT_PROVIDER:
+        _artist_enricher = ArtistEnricher(
+            logger=logging.getLogger("lndngigs"),
+            provider=get_metadata_provider(config),
+            metadata_cache=ArtistMetadataCache(
+                redis_client=redis_client,
+                cache_key_prefix="artists",
+                cache_ttl=timedelta(seconds=config.ARTIST_CACHE_TTL)
+            ),
+            concurrency=config.ENRICHMENT_CONCURRENCY,
+            timeout=config.ENRICHMENT_TIMEOUT
+        )
+    return _artist_enricher
+
+
+def get_async_event_listing(logger, event_loop=None, redis_client: Redis = None,
+                            crawl_deadline=True) -> AsyncEventListingLite:
+    return AsyncEventListingLite(
+        logger=logger,
+        event_loop=event_loop or get_thread_event_loop(),
+        http_client=get_http_client(),
+        parse_executor=get_parse_executor(),
+        event_cache=get_event_page_cache(redis_client) if redis_client else None,
+        revalidation_store=get_revalidation_store(redis_client) if redis_client else None,
+        # Without a deadline, crawls only stop once every page was scraped or given up on
+        crawl_timeout=Config().CRAWL_TIMEOUT if crawl_deadline else None,
+        # Streamed, uncached crawls are not enriched
+        enricher=get_artist_enricher(redis_client) if redis_client else None
+    )
+
+
+def get_event_index(redis_client: Redis) -> EventIndex:
+    return EventIndex(redis_client=redis_client, cache_key_prefix="events-lite:index")
+
+
+_snapshot_store = None
+
+
+def get_snapshot_store() -> SnapshotStore:
+    # None unless SNAPSHOT_PATH is set
+    global _snapshot_store
+    config = Config()
+    if _snapshot_store is None and config.SNAPSHOT_PATH:
+        _snapshot_store = SnapshotStore(path=config.SNAPSHOT_PATH, codec=get_codec(config.CACHE_CODEC))
+    return _snapshot_store
+
+
+def get_scrape_job_queue(redis_client: Redis) -> ScrapeJobQueue:
+    config = Config()
+    return ScrapeJobQueue(
+        redis_client=redis_client,
+        queue_name="scrape-jobs",
+        visibility_timeout=timedelta(seconds=config.JOB_VISIBILITY_TIMEOUT),
+        max_attempts=config.JOB_MAX_ATTEMPTS
+    )
+
+
+def get_cached_event_listing(logger, event_listing: EventListingInterface, redis_client: Redis) -> CachedEventListing:
     return CachedEventListing(
         logger=logger,
-        event_listing=AsyncEventListingLite(
-            logger=logger,
-            event_loop=asyncio.get_event_loop()
-        ),
+        event_listing=event_listing,
         redis_client=redis_client,
-        cache_key_prefix="events-lite"
+        cache_key_prefix="events-lite",
+        soft_ttl=timedelta(hours=1),
+        track_popularity=True,
+        codec=get_codec(Config().CACHE_CODEC),
+        # Without Redis, events are only cached in the snapshot store
+        local_cache=get_local_cache(redis_client, "events-lite") if redis_client else None,
+        delta_refresh=Config().DELTA_REFRESH,
+        # Stale entries are refreshed by the scrape workers rather than by the web workers
+        refresh_queue=get_scrape_job_queue(redis_client) if Config().REFRESH_QUEUE and redis_client else None,
+        event_index=get_event_index(redis_client) if redis_client else None,
+        snapshot_store=get_snapshot_store()
     )
 
 
-def get_event_listing_lite_no_cache(logger) -> EventListingInterface:
-    return AsyncEventListingLite(
+def get_event_listing_lite(logger, redis_client: Redis) -> EventListingInterface:
+    return get_cached_event_listing(
         logger=logger,
-        event_loop=asyncio.get_event_loop()
+        event_listing=get_async_event_listing(logger, redis_client=redis_client),
+        redis_client=redis_client
     )
 
 
+def get_event_listing_lite_no_cache(logger) -> EventListingInterface:
+    return get_async_event_listing(logger)
+
+
 def get_redis_client(config: Config) -> Redis:
     return redis.from_url(config.REDIS_URL) if config.REDIS_URL else None
@@ -0,0 +1,178 @@
+import json
+import time
+import uuid
+from collections import namedtuple
+from datetime import date, timedelta
+
+from redis import Redis
+
+# `token` identifies the reservation: once a job is queued again, the worker that reserved it before cannot complete it
+Job = namedtuple("Job", ["key", "payload", "attempts", "token"])
+
+
+class JobQueue:
+    """
+    Reliable Redis job queue.
+    Jobs are deduplicated by key while queued or in progress. Reserved jobs are invisible to other workers until
+    their visibility timeout expires: jobs that are not acknowledged by then (e.g. the worker died) are queued again.
+    Failed jobs are retried up to `max_attempts` times, then moved to the failed jobs.
+    """
+    def __init__(self, redis_client: Redis, queue_name="jobs", visibility_timeout=timedelta(minutes=2), max_attempts=3):
+        self._redis_client = redis_client
+        self._queue_name = queue_name
+        self._visibility_timeout = visibility_timeout
+        self._max_attempts = max_attempts
+
+    def _key_name(self, name):
+        return "{}:{}".format(self._queue_name, name)
+
+    @property
+    def pending_key_name(self):
+        return self._key_name("pending")
+
+    @property
+    def processing_key_name(self):
+        return self._key_name("processing")
+
+    @property
+    def failed_key_name(self):
+        return self._key_name("failed")
+
+    def enqueue(self, key, payload):
+        """
+        Returns False if the job is already queued or in progress
+        """
+        payloads_key_name = self._key_name("payloads")
+
+        def enqueue_if_new(pipe):
+            if pipe.hexists(payloads_key_name, key):
+                return False
+            # Deduplicated and queued all at once: a job can never be known without being queued
+            pipe.multi()
+            pipe.hset(payloads_key_name, key, json.dumps(payload))
+            pipe.hset(self._key_name("attempts"), key, 0)
+            pipe.lpush(self.pending_key_name, key)
+            return True
+
+        return self._redis_client.transaction(enqueue_if_new, payloads_key_name, value_from_callable=True)
+
+    def reserve(self, timeout=1) -> Job:
+        """
+        Next job, None if there is none after waiting `timeout` seconds (not waiting at all with no timeout)
+        """
+        if timeout:
+            key = self._redis_client.brpoplpush(self.pending_key_name, self.processing_key_name, timeout=timeout)
+        else:
+            key = self._redis_client.rpoplpush(self.pending_key_name, self.processing_key_name)
+        if key is None:
+            return None
+        key = key.decode("utf-8")
+        token = uuid.uuid4().hex
+
+        pipeline = self._redis_client.pipeline()
+        pipeline.zadd(self._key_name("deadlines"), {key: time.time() + self._visibility_timeout.total_seconds()})
+        pipeline.hset(self._key_name("reservations"), key, token)
+        pipeline.hincrby(self._key_name("attempts"), key, 1)
+        pipeline.hget(self._key_name("payloads"), key)
+        _, _, attempts, payload = pipeline.execute()
+
+        return Job(
+            key=key, payload=json.loads(payload.decode("utf-8")) if payload else None, attempts=attempts, token=token
+        )
+
+    def _complete(self, job: Job, queue_commands):
+        """
+        Removes the reservation of `job` and queues `queue_commands(pipe)`, all at once.
+        Returns False, without doing anything, if the job was queued again in the meantime (it expired).
+        """
+        reservations_key_name = self._key_name("reservations")
+
+        def complete_if_reserved(pipe):
+            token = pipe.hget(reservations_key_name, job.key)
+            if token is None or token.decode("utf-8") != job.token:
+                return False
+            pipe.multi()
+            pipe.lrem(self.processing_key_name, 1, job.key)
+            pipe.zrem(self._key_name("deadlines"), job.key)
+            pipe.hdel(reservations_key_name, job.key)
+            queue_commands(pipe)
+            return True
+
+        return self._redis_client.transaction(complete_if_reserved, reservations_key_name, value_from_callable=True)
+
+    def ack(self, job: Job):
+        """
+        Returns False if the job expired and was queued again: it is left to its next run
+        """
+        def forget(pipe):
+            pipe.hdel(self._key_name("payloads"), job.key)
+            pipe.hdel(self._key_name("attempts"), job.key)
+
+        return self._complete(job, forget)
+
+    def fail(self, job: Job):
+        """
+        Retries the job, unless it ran out of attempts. Returns False if the job expired and was queued again.
+        """
+        def retry_or_give_up(pipe):
+            if job.attempts < self._max_attempts:
+                pipe.lpush(self.pending_key_name, job.key)
+            else:
+                pipe.lpush(self.failed_key_name, json.dumps({
+                    "key": job.key, "payload": job.payload, "failed_at": time.time()
+                }))
+                pipe.hdel(self._key_name("payloads"), job.key)
+                pipe.hdel(self._key_name("attempts"), job.key)
+
+        return self._complete(job, retry_or_give_up)
+
+    def requeue_expired(self):
+        """
+        Jobs reserved for longer than the visibility timeout go back to the queue. Returns how many were requeued.
+        """
+        now = time.time()
+        requeued = 0
+        for key in self._redis_client.lrange(self.processing_key_name, 0, -1):
+            deadline = self._redis_client.zscore(self._key_name("deadlines"), key)
+            if deadline is None:
+                # The job was just reserved and its deadline is about to be set, or the worker died right after
+                # reserving it: either way it gets a full visibility timeout (unless the worker sets a deadline first)
+                self._redis_client.zadd(
+                    self._key_name("deadlines"), {key: now + self._visibility_timeout.total_seconds()}, nx=True
+                )
+                continue
+            if deadline > now:
+                continue
+            # Only one of the workers requeueing at the same time gets to remove it
+            if self._redis_client.lrem(self.processing_key_name, 1, key):
+                pipeline = self._redis_client.pipeline()
+                pipeline.zrem(self._key_name("deadlines"), key)
+                # The worker that reserved it can no longer complete it
+                pipeline.hdel(self._key_name("reservations"), key)
+                pipeline.lpush(self.pending_key_name, key)
+                pipeline.execute()
+                requeued += 1
+        return requeued
+
+    def stats(self):
+        pipeline = self._redis_client.pipeline()
+        pipeline.llen(self.pending_key_name)
+        pipeline.llen(self.processing_key_name)
+        pipeline.llen(self.failed_key_name)
+        pending, processing, failed = pipeline.execute()
+        return {"pending": pending, "processing": processing, "failed": failed}
+
+
+class ScrapeJobQueue(JobQueue):
+    """
+    (location, date) crawl jobs
+    """
+    def enqueue_scrape(self, location, events_date):
+        return self.enqueue("{}:{}".format(location, events_date.isoformat()), {
+            "location": location,
+            "events_date": events_date.isoformat(),
+        })
+
+    @staticmethod
+    def get_scrape(job: Job):
+        return job.payload["location"], date.fromisoformat(job.payload["events_date"])
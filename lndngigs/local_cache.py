@@ -0,0 +1,150 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import timedelta
+
+from redis import Redis
+from redis.exceptions import RedisError
+
+
+class LocalCache:
+    """
+    In-process LRU cache with a TTL, sitting in front of Redis.
+    Entries are invalidated across processes through a Redis pub/sub channel.
+    """
+    def __init__(self, max_size=256, ttl=timedelta(minutes=1)):
+        self._max_size = max_size
+        self._ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._listener = None
+        # Tells apart the invalidations sent by this cache
+        self.id = uuid.uuid4().hex
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        with self._lock:
+            try:
+                value, expires_at = self._entries[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            if expires_at <= time.time():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, expires_at=None):
+        """
+        Entries expire after the cache TTL, or earlier if `expires_at` (a timestamp) comes first
+        """
+        expires_at = min(time.time() + self._ttl.total_seconds(), expires_at or float("inf"))
+        with self._lock:
+            self._entries[key] = value, expires_at
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+    def publish_invalidation(self, redis_client: Redis, channel, key):
+        redis_client.publish(channel, "{} {}".format(self.id, key))
+
+    def listen_for_invalidations(self, redis_client: Redis, channel, retry_interval=5.0):
+        """
+        Evicts the keys rewritten by other processes, in a background thread.
+        Redis does not have to be up: the thread subscribes as soon as it can, and again whenever the connection drops.
+        """
+        if self._listener is not None:
+            return self._listener
+
+        def handle_invalidation(message):
+            sender_id, key = message["data"].decode("utf-8").split(" ", 1)
+            if sender_id != self.id:
+                self.invalidate(key)
+
+        self._listener = InvalidationListener(redis_client, channel, handle_invalidation, self.clear, retry_interval)
+        self._listener.start()
+        return self._listener
+
+    def stop_listening(self):
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+
+
+class InvalidationListener(threading.Thread):
+    """
+    Subscribed straight away if Redis is up, otherwise as soon as it is reachable (and again if the connection drops)
+    """
+    def __init__(self, redis_client: Redis, channel, on_message, on_reconnect, retry_interval):
+        super().__init__(name="local-cache-invalidations", daemon=True)
+        self._redis_client = redis_client
+        self._channel = channel
+        self._on_message = on_message
+        self._on_reconnect = on_reconnect
+        self._retry_interval = retry_interval
+        self._stopped = threading.Event()
+        self._disconnected = False
+        self._pubsub = self._try_subscribe()
+
+    @property
+    def subscribed(self):
+        return self._pubsub is not None
+
+    def _try_subscribe(self):
+        pubsub = self._redis_client.pubsub(ignore_subscribe_messages=True)
+        try:
+            pubsub.subscribe(**{self._channel: self._on_message})
+        except RedisError:
+            pubsub.close()
+            self._disconnected = True
+            return None
+        if self._disconnected:
+            # Invalidations sent while not subscribed are lost
+            self._on_reconnect()
+            self._disconnected = False
+        return pubsub
+
+    def run(self):
+        while not self._stopped.is_set():
+            if self._pubsub is None:
+                self._pubsub = self._try_subscribe()
+                if self._pubsub is None:
+                    self._stopped.wait(self._retry_interval)
+                    continue
+            try:
+                self._pubsub.get_message(timeout=1)
+            except RedisError:
+                self._pubsub.close()
+                self._pubsub = None
+                self._disconnected = True
+        if self._pubsub is not None:
+            self._pubsub.close()
+
+    def stop(self):
+        self._stopped.set()
@@ -0,0 +1,235 @@
+"""
+In-process metrics, exposed in the Prometheus text format by the `/metrics` endpoints.
+Recording a sample costs a lock and a few list operations, cheap enough to be always on.
+Every sample is also passed to the registered hooks, e.g. to assert on them in tests:
+
+    with registry.recorded() as samples:
+        ...
+    assert samples[0].name == "lndngigs_parse_seconds"
+
+Metrics live in the memory of each process: with several workers, each of them exposes its own.
+"""
+import threading
+import time
+from bisect import bisect_left
+from collections import namedtuple
+from contextlib import contextmanager
+
+Sample = namedtuple("Sample", ["name", "value", "labels"])
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BYTES_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{{{}}}".format(",".join(
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in labels
+    ))
+
+
+class Metric:
+    TYPE = None
+
+    def __init__(self, registry, name, documentation, labelnames=()):
+        self._registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _get_label_values(self, labels):
+        try:
+            label_values = tuple(str(labels[name]) for name in self.labelnames)
+        except KeyError as ex:
+            raise ValueError("Missing label {} for metric {}".format(ex, self.name))
+        if len(labels) != len(self.labelnames):
+            raise ValueError("Unexpected labels for metric {}: {}".format(self.name, ", ".join(sorted(labels))))
+        return label_values
+
+    def render(self):
+        lines = [
+            "# HELP {} {}".format(self.name, self.documentation),
+            "# TYPE {} {}".format(self.name, self.TYPE),
+        ]
+        with self._lock:
+            values = sorted(self._values.items())
+        for label_values, value in values:
+            lines.extend(self._render_value(list(zip(self.labelnames, label_values)), value))
+        return lines
+
+    def _render_value(self, labels, value):
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    TYPE = "counter"
+
+    def inc(self, amount=1, **labels):
+        label_values = self._get_label_values(labels)
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+        self._registry.notify(self.name, amount, labels)
+
+    def get(self, **labels):
+        return self._values.get(self._get_label_values(labels), 0)
+
+    def _render_value(self, labels, value):
+        return ["{}{} {}".format(self.name, _format_labels(labels), _format_value(value))]
+
+
+class Histogram(Metric):
+    TYPE = "histogram"
+
+    def __init__(self, registry, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        label_values = self._get_label_values(labels)
+        bucket = bisect_left(self.buckets, value)
+        with self._lock:
+            bucket_counts, total = self._values.get(label_values) or ([0] * len(self.buckets), 0)
+            bucket_counts[bucket] += 1
+            self._values[label_values] = bucket_counts, total + value
+        self._registry.notify(self.name, value, labels)
+
+    @contextmanager
+    def time(self, **labels):
+        """
+        Observes the seconds spent in the block
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def get_count(self, **labels):
+        bucket_counts, _ = self._values.get(self._get_label_values(labels)) or ([0], 0)
+        return sum(bucket_counts)
+
+    def get_sum(self, **labels):
+        _, total = self._values.get(self._get_label_values(labels)) or ((), 0)
+        return total
+
+    def _render_value(self, labels, value):
+        bucket_counts, total = value
+        lines = []
+        cumulative_count = 0
+        for upper_bound, count in zip(self.buckets, bucket_counts):
+            cumulative_count += count
+            lines.append("{}_bucket{} {}".format(
+                self.name, _format_labels(labels + [("le", _format_value(upper_bound))]), cumulative_count
+            ))
+        lines.append("{}_sum{} {}".format(self.name, _format_labels(labels), _format_value(total)))
+        lines.append("{}_count{} {}".format(self.name, _format_labels(labels), cumulative_count))
+        return lines
+
+
+class MetricsRegistry:
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        self._metrics = {}
+        self._hooks = []
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self._register(Counter(self, name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(self, name, documentation, labelnames, buckets))
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError("Metric {} already registered".format(metric.name))
+        self._metrics[metric.name] = metric
+        return metric
+
+    def get(self, name):
+        return self._metrics[name]
+
+    def add_hook(self, hook):
+        """
+        `hook(name, value, labels)` is called with every recorded sample, in the thread recording it
+        """
+        self._hooks = self._hooks + [hook]
+
+    def remove_hook(self, hook):
+        self._hooks = [registered_hook for registered_hook in self._hooks if registered_hook is not hook]
+
+    def notify(self, name, value, labels):
+        for hook in self._hooks:
+            hook(name, value, labels)
+
+    @contextmanager
+    def recorded(self):
+        """
+        Samples recorded within the block
+        """
+        samples = []
+
+        def hook(name, value, labels):
+            samples.append(Sample(name, value, labels))
+
+        self.add_hook(hook)
+        try:
+            yield samples
+        finally:
+            self.remove_hook(hook)
+
+    def render(self) -> str:
+        return "\n".join(
+            line
+            for metric in list(self._metrics.values())
+            for line in metric.render()
+        ) + "\n"
+
+
+registry = MetricsRegistry()
+
+CACHE_REQUESTS = registry.counter(
+    "lndngigs_cache_requests_total",
+    "Event listing cache lookups, by location and status (HIT, STALE, MISS)",
+    ["location", "status"]
+)
+REDIS_SECONDS = registry.histogram(
+    "lndngigs_redis_seconds",
+    "Redis round-trip time of the event listing cache, by operation",
+    ["operation"]
+)
+UPSTREAM_FETCH_SECONDS = registry.histogram(
+    "lndngigs_upstream_fetch_seconds",
+    "Latency of the requests to the upstream website (retries and hedged requests are counted separately)"
+)
+UPSTREAM_FETCH_BYTES = registry.histogram(
+    "lndngigs_upstream_fetch_bytes",
+    "Size of the pages fetched from the upstream website",
+    buckets=BYTES_BUCKETS
+)
+PARSE_SECONDS = registry.histogram(
+    "lndngigs_parse_seconds",
+    "Time spent parsing a page, by page type (listing, event)",
+    ["page_type"]
+)
+CRAWL_PAGES = registry.histogram(
+    "lndngigs_crawl_pages",
+    "Pages scraped per crawl, by page type (listing, event)",
+    ["page_type"],
+    buckets=COUNT_BUCKETS
+)
+REQUEST_SECONDS = registry.histogram(
+    "lndngigs_request_seconds",
+    "Time to serve a request, by handler and status code",
+    ["handler", "status"]
+)
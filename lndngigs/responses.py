@@ -0,0 +1,182 @@
+from collections import namedtuple
+from datetime import timedelta
+
+from lndngigs.codecs import render_events_json, compress_body, get_etag, dump_event_json
+from lndngigs.event_listing import CachedEventListing, SongkickScraper, consume_events
+from lndngigs.utils import ValidationException
+
+GigsResponse = namedtuple("GigsResponse", ["status", "body", "headers"])
+
+NDJSON_CONTENT_TYPE = "application/x-ndjson"
+
+
+def parse_accept_encoding(accept_encoding):
+    encodings = set()
+    for item in (accept_encoding or "").split(","):
+        encoding, _, params = item.strip().partition(";")
+        quality = params.strip()
+        if quality.startswith("q="):
+            try:
+                if float(quality[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        if encoding:
+            encodings.add(encoding.strip().lower())
+    return encodings
+
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    candidates = {candidate.strip() for candidate in if_none_match.split(",")}
+    return "*" in candidates or '"{}"'.format(etag) in candidates or 'W/"{}"'.format(etag) in candidates
+
+
+def build_gigs_response(bodies, etag, if_none_match=None, accept_encoding=None, max_age=0, headers=None) -> GigsResponse:
+    """
+    Picks the best pre-serialized body for the client: 304 if it already has it, else the smallest encoding it accepts
+    """
+    headers = dict(headers or {})
+    headers.update({
+        "ETag": '"{}"'.format(etag),
+        "Cache-Control": "public, max-age={}".format(max(0, int(max_age))),
+        "Vary": "Accept-Encoding",
+    })
+
+    if etag_matches(if_none_match, etag):
+        return GigsResponse(status=304, body=b"", headers=headers)
+
+    accepted_encodings = parse_accept_encoding(accept_encoding)
+    encoding = min(
+        [encoding for encoding in bodies if encoding != "identity" and encoding in accepted_encodings],
+        key=lambda encoding: len(bodies[encoding]),
+        default="identity"
+    )
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    headers["Content-Type"] = "application/json"
+
+    return GigsResponse(status=200, body=bodies[encoding], headers=headers)
+
+
+def render_gigs_response(events, if_none_match=None, accept_encoding=None, max_age=0, headers=None,
+                         partial=False) -> GigsResponse:
+    body = render_events_json(events, partial=partial)
+    return build_gigs_response(
+        compress_body(body), get_etag(body), if_none_match, accept_encoding, 0 if partial else max_age, headers
+    )
+
+
+def get_gigs_response(event_listing, location, events_date, if_none_match=None, accept_encoding=None) -> GigsResponse:
+    """
+    Serves the pre-serialized body when cached, otherwise renders the events (caching them along the way)
+    """
+    cached_response = event_listing.get_cached_response(location=location, events_date=events_date)
+    soft_ttl = event_listing.soft_ttl.total_seconds() if isinstance(event_listing, CachedEventListing) else 0
+
+    if cached_response is not None:
+        return build_gigs_response(
+            cached_response.bodies,
+            cached_response.etag,
+            if_none_match=if_none_match,
+            accept_encoding=accept_encoding,
+            max_age=soft_ttl - cached_response.age,
+            headers={"X-Cache": cached_response.status, "Age": str(int(cached_response.age))}
+        )
+
+    entry = event_listing.get_entry(location=location, events_date=events_date)
+    events, partial = consume_events(entry.events)
+    return render_gigs_response(
+        events,
+        if_none_match=if_none_match,
+        accept_encoding=accept_encoding,
+        max_age=soft_ttl if entry.status else 0,
+        headers={"X-Cache": entry.status, "Age": str(int(entry.age))} if entry.status else {},
+        partial=partial
+    )
+
+
+def render_event_ndjson(event) -> bytes:
+    return dump_event_json(event).encode("utf-8") + b"\n"
+
+
+NDJSON_PARTIAL_LINE = b'{"partial":true}\n'
+
+
+def iter_ndjson(events):
+    """
+    One line per event, written as soon as the listing produces it, and a final `{"partial":true}` line if the
+    listing could not be scraped entirely.
+    Closing it early (e.g. the client went away) closes the events generator, so partial listings are never cached.
+    """
+    events = iter(events)
+    try:
+        while True:
+            try:
+                event = next(events)
+            except StopIteration as stop:
+                if stop.value:
+                    yield NDJSON_PARTIAL_LINE
+                return
+            yield render_event_ndjson(event)
+    finally:
+        if hasattr(events, "close"):
+            events.close()
+
+
+def get_ndjson_headers(entry):
+    headers = {"Content-Type": NDJSON_CONTENT_TYPE}
+    if entry.status:
+        headers.update({"X-Cache": entry.status, "Age": str(int(entry.age))})
+    return headers
+
+
+def parse_bulk_locations(event_listing, locations):
+    """
+    Comma separated locations, as a dictionary location name => location id
+    """
+    return {
+        location: event_listing.parse_event_location(location)
+        for location in locations.lower().split(",")
+        if location.strip()
+    }
+
+
+def parse_bulk_dates(event_listing, from_date_str, to_date_str):
+    from_date = event_listing.parse_event_date(from_date_str or "today")
+    to_date = event_listing.parse_event_date(to_date_str) if to_date_str else from_date
+    if to_date < from_date:
+        raise ValidationException("`to` must not be earlier than `from`")
+    return [from_date + timedelta(days=days) for days in range((to_date - from_date).days + 1)]
+
+
+def render_bulk_gigs(locations, dates, events_by_key):
+    """
+    Pairs missing from `events_by_key` could not be scraped entirely: they are rendered empty and marked as partial
+    """
+    body = {
+        "gigs": {
+            location: {
+                events_date.isoformat(): [event.to_dict() for event in events_by_key.get((location_id, events_date), [])]
+                for events_date in dates
+            }
+            for location, location_id in locations.items()
+        }
+    }
+    if any((location_id, events_date) not in events_by_key for location_id in locations.values() for events_date in dates):
+        body["partial"] = True
+    return body
+
+
+def render_indexed_gigs(entries):
+    """
+    Events found in the artist / venue index, as (location id, event dictionary) pairs
+    """
+    location_names = {location_id: location for location, location_id in SongkickScraper.LOCATIONS.items()}
+    return {
+        "gigs": [
+            dict(event, location=location_names.get(location_id, location_id))
+            for location_id, event in entries
+        ]
+    }
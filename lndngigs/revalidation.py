@@ -0,0 +1,65 @@
+from collections import namedtuple
+from datetime import timedelta
+
+from redis import Redis
+
+PageVersion = namedtuple("PageVersion", ["etag", "last_modified", "body_hash", "content_length", "parsed"])
+
+
+class RevalidationStore:
+    """
+    Validators (ETag, Last-Modified, body hash) and parsed result of the last version of each upstream page,
+    so that unchanged pages are neither downloaded nor parsed again
+    """
+    def __init__(self, redis_client: Redis, cache_key_prefix="pages", cache_ttl=timedelta(days=7)):
+        self._redis_client = redis_client
+        self._cache_key_prefix = cache_key_prefix
+        self._cache_ttl = cache_ttl
+
+    def get_cache_key_name(self, url):
+        return "{}:{}".format(self._cache_key_prefix, url)
+
+    @staticmethod
+    def _load(version) -> PageVersion:
+        if not version:
+            return None
+        return PageVersion(
+            etag=version[b"etag"].decode("utf-8") or None,
+            last_modified=version[b"last_modified"].decode("utf-8") or None,
+            body_hash=version[b"body_hash"].decode("utf-8"),
+            content_length=int(version[b"content_length"]),
+            parsed=version[b"parsed"]
+        )
+
+    def get(self, url) -> PageVersion:
+        return self._load(self._redis_client.hgetall(self.get_cache_key_name(url)))
+
+    def get_many(self, urls):
+        """
+        Last versions of the given pages, in a single round-trip. Returns a dictionary url => PageVersion (or None).
+        """
+        urls = list(urls)
+        if not urls:
+            return {}
+        pipeline = self._redis_client.pipeline(transaction=False)
+        for url in urls:
+            pipeline.hgetall(self.get_cache_key_name(url))
+        return {url: self._load(version) for url, version in zip(urls, pipeline.execute())}
+
+    def set(self, url, version: PageVersion):
+        self.set_many({url: version})
+
+    def set_many(self, versions):
+        pipeline = self._redis_client.pipeline()
+        for url, version in versions.items():
+            key_name = self.get_cache_key_name(url)
+            pipeline.delete(key_name)
+            pipeline.hset(key_name, mapping={
+                "etag": version.etag or "",
+                "last_modified": version.last_modified or "",
+                "body_hash": version.body_hash,
+                "content_length": version.content_length,
+                "parsed": version.parsed,
+            })
+            pipeline.expire(key_name, self._cache_ttl)
+        pipeline.execute()
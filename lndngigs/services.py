@@ -0,0 +1,46 @@
+"""
+Application-scoped objects of the Flask front end, built once per worker process and shared by its request threads.
+Crawls run in a single event loop in a background thread (uvloop with `EVENT_LOOP=uvloop`): request threads submit
+them to it, so that a threaded worker multiplexes many concurrent cache misses over one http session.
+"""
+from redis import Redis
+
+from lndngigs.concurrency import BackgroundEventLoop
+from lndngigs.event_listing import EventListingInterface
+from lndngigs.factories import get_async_event_listing, get_cached_event_listing, get_http_client, get_snapshot_store, \
+    get_metadata_http_client
+from lndngigs.utils import Config
+
+
+class Services:
+    def __init__(self, logger, redis_client: Redis = None, config: Config = None):
+        config = config or Config()
+        self.logger = logger
+        # A single connection pool, shared by all the request threads
+        self.redis_client = redis_client
+        self.http_client = get_http_client()
+        self.background_loop = BackgroundEventLoop(implementation=config.EVENT_LOOP, name="lndngigs-event-loop")
+
+        self.event_listing_no_cache = get_async_event_listing(logger=logger, event_loop=self.background_loop.event_loop)
+        # Without Redis, listings can still be cached in the local snapshot store
+        self.cached_event_listing = get_cached_event_listing(
+            logger=logger,
+            event_listing=get_async_event_listing(
+                logger=logger,
+                event_loop=self.background_loop.event_loop,
+                redis_client=redis_client
+            ),
+            redis_client=redis_client
+        ) if redis_client is not None or get_snapshot_store() is not None else None
+
+    def get_event_listing(self, use_cache=True) -> EventListingInterface:
+        if use_cache and self.cached_event_listing is not None:
+            return self.cached_event_listing
+        return self.event_listing_no_cache
+
+    def close(self):
+        if self.background_loop.event_loop.is_closed():
+            return
+        self.background_loop.run(self.http_client.close())
+        self.background_loop.run(get_metadata_http_client().close())
+        self.background_loop.close()
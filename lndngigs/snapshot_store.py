@@ -0,0 +1,81 @@
+import sqlite3
+import threading
+import time
+from datetime import date, timedelta
+
+from lndngigs.codecs import get_codec, encode_events, decode_events
+
+
+class SnapshotStore:
+    """
+    Last known good listings, on local disk (SQLite), under the Redis cache.
+    Written through on every cache write and read when Redis misses or is unavailable, so that a Redis outage
+    or a flushed Redis serves the previous listings rather than crawling all of them again.
+    Past dates are pruned. Processes on the same host can share the file.
+    """
+    def __init__(self, path, codec=None, busy_timeout=timedelta(seconds=5)):
+        self._path = path
+        self._codec = codec or get_codec("json+zlib")
+        self._busy_timeout = busy_timeout
+        # sqlite3 connections cannot be shared between threads
+        self._connections = threading.local()
+        with self._get_connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS listings ("
+                "location TEXT NOT NULL, events_date TEXT NOT NULL, cached_at REAL NOT NULL, data BLOB NOT NULL, "
+                "PRIMARY KEY (location, events_date))"
+            )
+
+    def _get_connection(self):
+        connection = getattr(self._connections, "connection", None)
+        if connection is None:
+            connection = self._connections.connection = sqlite3.connect(
+                self._path, timeout=self._busy_timeout.total_seconds()
+            )
+            # Readers do not block the writer (and the other way around)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def get_events(self, location, events_date):
+        """
+        Returns a tuple (events, cached_at), None if the listing was never cached
+        """
+        row = self._get_connection().execute(
+            "SELECT data FROM listings WHERE location = ? AND events_date = ?",
+            (location, events_date.isoformat())
+        ).fetchone()
+        return decode_events(row[0], events_date) if row is not None else None
+
+    def cache_events_bulk(self, events_by_key, cached_at=None):
+        cached_at = cached_at or time.time()
+        with self._get_connection() as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO listings (location, events_date, cached_at, data) VALUES (?, ?, ?, ?)",
+                [
+                    (location, events_date.isoformat(), cached_at, encode_events(events, cached_at, self._codec))
+                    for (location, events_date), events in events_by_key.items()
+                ]
+            )
+
+    def get_all_events(self, since=None):
+        """
+        Yields ((location, date), events, cached_at) for the listings of `since` (default: today) onwards
+        """
+        rows = self._get_connection().execute(
+            "SELECT location, events_date, data FROM listings WHERE events_date >= ? ORDER BY events_date",
+            ((since or date.today()).isoformat(),)
+        ).fetchall()
+        for location, events_date, data in rows:
+            events_date = date.fromisoformat(events_date)
+            events, cached_at = decode_events(data, events_date)
+            yield (location, events_date), events, cached_at
+
+    def prune(self, before=None):
+        """
+        Deletes the listings of the days before `before` (default: today)
+        """
+        with self._get_connection() as connection:
+            return connection.execute(
+                "DELETE FROM listings WHERE events_date < ?", ((before or date.today()).isoformat(),)
+            ).rowcount
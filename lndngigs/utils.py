@@ -1,6 +1,12 @@
+import json
 import os
+import threading
+import uuid
+from concurrent.futures import Future
 from datetime import date, timedelta, datetime
 
+from redis import Redis
+
 
 class ValidationException(Exception):
     pass
@@ -48,3 +54,122 @@ class Config:
     def __init__(self):
         self.REDIS_URL = self.get("REDIS_URL", default=None)
         self.DEBUG = self.get("DEBUG", convert=bool, default=False)
+        self.HTTP_CONCURRENCY = self.get("HTTP_CONCURRENCY", convert=int, default=20)
+        self.HTTP_LIMIT_PER_HOST = self.get("HTTP_LIMIT_PER_HOST", convert=int, default=10)
+        self.HTTP_CONNECT_TIMEOUT = self.get("HTTP_CONNECT_TIMEOUT", convert=float, default=5)
+        self.HTTP_READ_TIMEOUT = self.get("HTTP_READ_TIMEOUT", convert=float, default=15)
+        self.HTTP_REQUEST_TIMEOUT = self.get("HTTP_REQUEST_TIMEOUT", convert=float, default=20)
+        self.HTTP_RETRIES = self.get("HTTP_RETRIES", convert=int, default=2)
+        self.HTTP_LATENCY_TARGET = self.get("HTTP_LATENCY_TARGET", convert=float, default=2)
+        self.HTTP_HEDGE = self.get("HTTP_HEDGE", convert=lambda value: bool(int(value)), default=False)
+        self.CRAWL_TIMEOUT = self.get("CRAWL_TIMEOUT", convert=float, default=25)
+        self.CACHE_CODEC = self.get("CACHE_CODEC", default="json+zlib")
+        self.LOCAL_CACHE_SIZE = self.get("LOCAL_CACHE_SIZE", convert=int, default=256)
+        self.LOCAL_CACHE_TTL = self.get("LOCAL_CACHE_TTL", convert=int, default=60)
+        self.EVENT_CACHE_TTL = self.get("EVENT_CACHE_TTL", convert=int, default=7 * 24 * 60 * 60)
+        self.PAGE_REVALIDATION_TTL = self.get("PAGE_REVALIDATION_TTL", convert=int, default=7 * 24 * 60 * 60)
+        self.DELTA_REFRESH = self.get("DELTA_REFRESH", convert=lambda value: bool(int(value)), default=True)
+        self.ENRICHMENT_PROVIDER = self.get("ENRICHMENT_PROVIDER", default=None)
+        self.LASTFM_API_KEY = self.get("LASTFM_API_KEY", default=None)
+        self.ENRICHMENT_CONCURRENCY = self.get("ENRICHMENT_CONCURRENCY", convert=int, default=4)
+        self.ENRICHMENT_TIMEOUT = self.get("ENRICHMENT_TIMEOUT", convert=float, default=5)
+        self.ARTIST_CACHE_TTL = self.get("ARTIST_CACHE_TTL", convert=int, default=30 * 24 * 60 * 60)
+        self.SNAPSHOT_PATH = self.get("SNAPSHOT_PATH", default=None)
+        self.SNAPSHOT_PRELOAD = self.get("SNAPSHOT_PRELOAD", convert=lambda value: bool(int(value)), default=True)
+        self.EVENT_LOOP = self.get("EVENT_LOOP", default="asyncio")
+        self.PARSE_WORKERS = self.get("PARSE_WORKERS", convert=int, default=0)
+        self.PARSE_EXECUTOR = self.get("PARSE_EXECUTOR", default="process")
+        self.REFRESH_QUEUE = self.get("REFRESH_QUEUE", convert=lambda value: bool(int(value)), default=False)
+        self.JOB_VISIBILITY_TIMEOUT = self.get("JOB_VISIBILITY_TIMEOUT", convert=int, default=2 * 60)
+        self.JOB_MAX_ATTEMPTS = self.get("JOB_MAX_ATTEMPTS", convert=int, default=3)
+        self.WORKER_PROCESSES = self.get("WORKER_PROCESSES", convert=int, default=2)
+        self.WARMER_REQUESTS_PER_MINUTE = self.get("WARMER_REQUESTS_PER_MINUTE", convert=int, default=300)
+        self.WARMER_REFRESH_INTERVAL = self.get("WARMER_REFRESH_INTERVAL", convert=int, default=30 * 60)
+
+
+class SingleFlight:
+    """
+    Process-wide registry of in-flight calls: concurrent callers for the same key share the result of the first one.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def join(self, key):
+        """
+        Returns a tuple (future, is_leader).
+        The leader is expected to complete the future and then `leave` the key, anyone else should wait for the future.
+        """
+        with self._lock:
+            if key in self._calls:
+                return self._calls[key], False
+            future = self._calls[key] = Future()
+            return future, True
+
+    def leave(self, key):
+        with self._lock:
+            self._calls.pop(key, None)
+
+
+class RedisLease:
+    """
+    Cross-process lease on a key: only one holder at a time, expiring after `ttl` in case the holder dies.
+    """
+    def __init__(self, redis_client: Redis, name, ttl=timedelta(minutes=2)):
+        self._redis_client = redis_client
+        self._name = name
+        self._ttl = ttl
+        self._token = uuid.uuid4().hex.encode("utf-8")
+        self.acquired = False
+
+    def acquire(self):
+        self.acquired = bool(self._redis_client.set(self._name, self._token, nx=True, px=self._ttl))
+        return self.acquired
+
+    def is_held(self):
+        return bool(self._redis_client.exists(self._name))
+
+    def release(self):
+        if not self.acquired:
+            return
+
+        def delete_if_owned(pipe):
+            if pipe.get(self._name) == self._token:
+                pipe.multi()
+                pipe.delete(self._name)
+
+        self._redis_client.transaction(delete_if_owned, self._name)
+        self.acquired = False
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+
+class CommandMessagesQueue:
+    """
+    FIFO queue of JSON messages, backed by a Redis list
+    """
+    def __init__(self, redis_client: Redis, queue_name="commands"):
+        self._redis_client = redis_client
+        self._queue_name = queue_name
+
+    def push(self, message):
+        self._redis_client.lpush(self._queue_name, json.dumps(message))
+
+    def pop(self, timeout=None):
+        """
+        Oldest message, None if the queue is empty (after waiting up to `timeout` seconds)
+        """
+        if timeout is None:
+            data = self._redis_client.rpop(self._queue_name)
+        else:
+            popped = self._redis_client.brpop(self._queue_name, timeout=timeout)
+            data = popped[1] if popped else None
+        return json.loads(data.decode("utf-8")) if data is not None else None
+
+    def __len__(self):
+        return self._redis_client.llen(self._queue_name)
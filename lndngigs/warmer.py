@@ -0,0 +1,166 @@
+"""
+Keeps every (location, date) cache key warm, so that user requests never trigger a crawl.
+
+    python -m lndngigs.warmer
+"""
+import asyncio
+import math
+import time
+from datetime import date, timedelta
+
+from redis import Redis
+
+from lndngigs.async_event_listing import HttpClient
+from lndngigs.concurrency import run_blocking
+from lndngigs.event_listing import CachedEventListing, SongkickScraper
+from lndngigs.factories import get_logger, get_redis_client, get_cached_event_listing, get_async_event_listing, \
+    get_http_client
+from lndngigs.utils import Config
+
+
+class UpstreamBudget:
+    """
+    Maximum number of upstream requests per minute, shared by all the warmers through Redis
+    """
+    def __init__(self, redis_client: Redis, requests_per_minute, key_prefix="upstream-budget"):
+        self._redis_client = redis_client
+        self._requests_per_minute = requests_per_minute
+        self._key_prefix = key_prefix
+
+    def _window_key_name(self):
+        return "{}:{}".format(self._key_prefix, int(time.time() // 60))
+
+    @staticmethod
+    def _seconds_to_next_window():
+        return 60 - time.time() % 60
+
+    def remaining(self):
+        spent = self._redis_client.get(self._window_key_name())
+        return self._requests_per_minute - int(spent or 0)
+
+    def try_spend(self, requests=1):
+        """
+        Charges the requests to the current window, returns False if they exceed the budget
+        """
+        key_name = self._window_key_name()
+        pipeline = self._redis_client.pipeline()
+        pipeline.incrby(key_name, requests)
+        pipeline.expire(key_name, 120)
+        spent, _ = pipeline.execute()
+        return spent <= self._requests_per_minute
+
+    async def acquire(self):
+        # Charged as each request is made, so that a single crawl cannot overrun the budget
+        while not await run_blocking(self.try_spend):
+            await asyncio.sleep(self._seconds_to_next_window())
+
+    def wait(self):
+        while self.remaining() <= 0:
+            time.sleep(self._seconds_to_next_window())
+
+
+class CacheWarmer:
+    def __init__(self, logger, cached_event_listing: CachedEventListing, http_client: HttpClient, budget: UpstreamBudget,
+                 refresh_interval=timedelta(minutes=30), retry_interval=timedelta(minutes=5), days=28):
+        self._logger = logger
+        self._cached_event_listing = cached_event_listing
+        # Every upstream request of the refreshes is charged to the budget
+        http_client.before_request = budget.acquire
+        self._budget = budget
+        self._refresh_interval = refresh_interval
+        self._retry_interval = retry_interval
+        self._days = days
+        # Keys whose refresh failed are not retried before then
+        self._retry_at = {}
+
+    def get_keys(self):
+        today = date.today()
+        return [
+            (location, today + timedelta(days=days))
+            for location in SongkickScraper.LOCATIONS.values()
+            for days in range(self._days + 1)
+        ]
+
+    def get_refresh_interval(self, events_date):
+        # Events far in the future rarely change: refresh them less often
+        days_ahead = (events_date - date.today()).days
+        return self._refresh_interval * (1 + days_ahead / 7)
+
+    def get_due_keys(self):
+        """
+        Keys that need a refresh, the most popular and closest in time first
+        """
+        popularity = self._cached_event_listing.get_popularity()
+        refreshed_at = self._cached_event_listing.get_refreshed_at()
+        now = time.time()
+
+        def priority(key):
+            location, events_date = key
+            days_ahead = (events_date - date.today()).days
+            return math.log1p(popularity.get(location, 0)) + 1 / (1 + days_ahead)
+
+        due_keys = [
+            (location, events_date)
+            for location, events_date in self.get_keys()
+            if now - refreshed_at.get(self._cached_event_listing.get_cache_key_name(location, events_date), 0)
+            >= self.get_refresh_interval(events_date).total_seconds()
+            and self._retry_at.get((location, events_date), 0) <= now
+        ]
+
+        return sorted(due_keys, key=priority, reverse=True)
+
+    def refresh(self, location, events_date):
+        """
+        Returns True if the events were refreshed
+        """
+        self._budget.wait()
+        events = self._cached_event_listing.refresh_events(location, events_date)
+        if events is None:
+            self._retry_at[(location, events_date)] = time.time() + self._retry_interval.total_seconds()
+            return False
+        self._retry_at.pop((location, events_date), None)
+        self._logger.info("{} events refreshed for {} in {}".format(len(events), events_date, location))
+        return True
+
+    def run_once(self):
+        """
+        Returns the number of keys refreshed
+        """
+        self._cached_event_listing.prune_refreshed_at()
+        self._retry_at = {key: retry_at for key, retry_at in self._retry_at.items() if key[1] >= date.today()}
+        due_keys = self.get_due_keys()
+        self._logger.debug("{} keys due for refresh".format(len(due_keys)))
+        return sum(self.refresh(location, events_date) for location, events_date in due_keys)
+
+    def run_forever(self, idle_interval=timedelta(seconds=30)):
+        while True:
+            # Nothing due, or nothing could be refreshed
+            if not self.run_once():
+                time.sleep(idle_interval.total_seconds())
+
+
+def main():
+    config = Config()
+    logger = get_logger(config.DEBUG)
+    redis_client = get_redis_client(config)
+    if not redis_client:
+        raise Exception("Cannot warm up the cache without REDIS_URL")
+
+    warmer = CacheWarmer(
+        logger=logger,
+        # Crawls may have to wait for the next budget window: no user is waiting for them, so they have no deadline
+        # (a crawl cut short would be discarded as partial, and then retried)
+        cached_event_listing=get_cached_event_listing(
+            logger=logger,
+            event_listing=get_async_event_listing(logger=logger, redis_client=redis_client, crawl_deadline=False),
+            redis_client=redis_client
+        ),
+        http_client=get_http_client(),
+        budget=UpstreamBudget(redis_client=redis_client, requests_per_minute=config.WARMER_REQUESTS_PER_MINUTE),
+        refresh_interval=timedelta(seconds=config.WARMER_REFRESH_INTERVAL)
+    )
+    warmer.run_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,36 @@
-from flask import Flask, request, jsonify
+import atexit
+import time
+
+from flask import Flask, Response, request, jsonify, g
 
 from lndngigs.factories import *
+from lndngigs.metrics import registry, REQUEST_SECONDS
+from lndngigs.responses import get_gigs_response, iter_ndjson, get_ndjson_headers, parse_bulk_locations, \
+    parse_bulk_dates, render_bulk_gigs, render_indexed_gigs
+from lndngigs.services import Services
 from lndngigs.utils import Config, ValidationException
 
 
 def build_app(logger, redis_client):
     app = Flask(__name__)
+    # Listings, the event loop running their crawls and the clients are shared by all the requests of the worker
+    services = app.extensions["lndngigs"] = Services(logger=logger, redis_client=redis_client)
+
+    if services.cached_event_listing is not None and get_snapshot_store() is not None and Config().SNAPSHOT_PRELOAD:
+        services.cached_event_listing.preload_snapshot()
+
+    @app.before_request
+    def start_timer():
+        g.started_at = time.perf_counter()
+
+    @app.after_request
+    def observe_latency(response):
+        # Streamed responses are timed until their headers are ready
+        if request.endpoint in ("gigs", "bulk_gigs"):
+            REQUEST_SECONDS.observe(
+                time.perf_counter() - g.started_at, handler=request.endpoint, status=response.status_code
+            )
+        return response
 
     @app.route("/")
     def index():
@@ -14,15 +39,7 @@ def build_app(logger, redis_client):
     @app.route("/gigs", defaults={"location": "london", "events_date": "today"})
     @app.route("/gigs/<location>/<events_date>", methods=['GET'])
     def gigs(location, events_date):
-        if request.args.get("mode") == "nocache" or not redis_client:
-            event_listing = get_event_listing_lite_no_cache(logger=logger)
-
-        else:
-            event_listing = get_event_listing_lite(
-                logger=logger,
-                redis_client=redis_client
-            )
-
+        event_listing = services.get_event_listing(use_cache=request.args.get("mode") != "nocache")
 
         try:
             parsed_location = event_listing.parse_event_location(location)
@@ -38,12 +55,78 @@ def build_app(logger, redis_client):
                 "error": "Invalid date: {}".format(ex)
             }), 406
 
-        events = [
-            event.to_dict()
-            for event in event_listing.get_events(location=parsed_location, events_date=parsed_events_date)
-        ]
+        if request.args.get("format") == "ndjson":
+            # Events are streamed while they are scraped, the cache is populated once the stream is over
+            entry = event_listing.get_entry(location=parsed_location, events_date=parsed_events_date)
+            return Response(iter_ndjson(entry.events), status=200, headers=get_ndjson_headers(entry))
+
+        response = get_gigs_response(
+            event_listing,
+            location=parsed_location,
+            events_date=parsed_events_date,
+            if_none_match=request.headers.get("If-None-Match"),
+            accept_encoding=request.headers.get("Accept-Encoding")
+        )
+
+        return Response(response.body, status=response.status, headers=response.headers)
+
+    @app.route("/gigs/<locations>", methods=['GET'])
+    def bulk_gigs(locations):
+        event_listing = services.get_event_listing(use_cache=request.args.get("mode") != "nocache")
+
+        try:
+            parsed_locations = parse_bulk_locations(event_listing, locations)
+        except ValidationException as ex:
+            return jsonify({
+                "error": "Invalid location: {}".format(ex)
+            }), 406
+
+        try:
+            dates = parse_bulk_dates(event_listing, request.args.get("from"), request.args.get("to"))
+        except ValidationException as ex:
+            return jsonify({
+                "error": "Invalid date: {}".format(ex)
+            }), 406
+
+        events_by_key = event_listing.get_events_bulk([
+            (location_id, events_date)
+            for location_id in parsed_locations.values()
+            for events_date in dates
+        ])
+
+        return jsonify(render_bulk_gigs(parsed_locations, dates, events_by_key)), 200
+
+    @app.route("/artists/<artist>/gigs", methods=['GET'])
+    def artist_gigs(artist):
+        if not redis_client:
+            return jsonify({"error": "The events index is not available"}), 503
+
+        try:
+            entries = get_event_index(redis_client).get_artist_events(artist)
+        except ValidationException as ex:
+            return jsonify({
+                "error": "Invalid artist: {}".format(ex)
+            }), 406
+
+        return jsonify(render_indexed_gigs(entries)), 200
+
+    @app.route("/venues/<venue_id>/gigs", methods=['GET'])
+    def venue_gigs(venue_id):
+        if not redis_client:
+            return jsonify({"error": "The events index is not available"}), 503
+
+        try:
+            entries = get_event_index(redis_client).get_venue_events(venue_id)
+        except ValidationException as ex:
+            return jsonify({
+                "error": "Invalid venue: {}".format(ex)
+            }), 406
+
+        return jsonify(render_indexed_gigs(entries)), 200
 
-        return jsonify({"gigs": events}), 200
+    @app.route("/metrics")
+    def metrics():
+        return Response(registry.render(), status=200, headers={"Content-Type": registry.CONTENT_TYPE})
 
     return app
 
@@ -51,3 +134,4 @@ def build_app(logger, redis_client):
 if __name__ == 'lndngigs.web':
     config = Config()
     app = build_app(logger=get_logger(config.DEBUG), redis_client=get_redis_client(config))
+    atexit.register(app.extensions["lndngigs"].close)
@@ -0,0 +1,113 @@
+"""
+Scrape workers: crawl the (location, date) jobs queued by the web workers and cache their events,
+so that scraping capacity scales independently of the web replicas.
+
+    python -m lndngigs.worker
+"""
+import multiprocessing
+import signal
+import sys
+import time
+from datetime import date, timedelta
+
+from lndngigs.event_listing import CachedEventListing
+from lndngigs.factories import get_logger, get_redis_client, get_event_listing_lite, get_scrape_job_queue
+from lndngigs.job_queue import ScrapeJobQueue
+from lndngigs.utils import Config
+
+
+class ScrapeWorker:
+    def __init__(self, logger, queue: ScrapeJobQueue, cached_event_listing: CachedEventListing,
+                 requeue_interval=timedelta(seconds=30)):
+        self._logger = logger
+        self._queue = queue
+        self._cached_event_listing = cached_event_listing
+        self._requeue_interval = requeue_interval
+        self._requeued_at = 0
+
+    def requeue_expired(self):
+        if time.time() - self._requeued_at >= self._requeue_interval.total_seconds():
+            self._requeued_at = time.time()
+            requeued = self._queue.requeue_expired()
+            if requeued:
+                self._logger.warning("{} expired jobs queued again".format(requeued))
+            self._logger.info("Scrape jobs: {pending} pending, {processing} processing, {failed} failed".format(
+                **self._queue.stats()
+            ))
+
+    def run_once(self, timeout=1):
+        """
+        Processes the next job, returns False if there was none
+        """
+        self.requeue_expired()
+
+        job = self._queue.reserve(timeout=timeout)
+        if job is None:
+            return False
+
+        if job.payload is None:
+            # Nothing to do: e.g. completed by a worker that overran its visibility timeout
+            self._logger.warning("Job `{}` has no payload, skipped".format(job.key))
+            self._queue.ack(job)
+            return True
+
+        location, events_date = ScrapeJobQueue.get_scrape(job)
+        if events_date < date.today():
+            self._queue.ack(job)
+            return True
+
+        try:
+            events = self._cached_event_listing.refresh_events(location, events_date, raise_errors=True)
+        except Exception:
+            self._logger.warning("Job `{}` failed (attempt {})".format(job.key, job.attempts))
+            self._queue.fail(job)
+        else:
+            self._queue.ack(job)
+            if events is not None:
+                self._logger.info("{} events refreshed for {} in {}".format(len(events), events_date, location))
+        return True
+
+    def run_forever(self, error_interval=timedelta(seconds=1)):
+        while True:
+            try:
+                self.run_once()
+            except Exception:
+                # e.g. Redis is unavailable: the worker carries on, and the job (if any) expires and is queued again
+                self._logger.exception("Could not process the next job")
+                time.sleep(error_interval.total_seconds())
+
+
+def run_worker():
+    config = Config()
+    logger = get_logger(config.DEBUG)
+    redis_client = get_redis_client(config)
+    if not redis_client:
+        raise Exception("Cannot process scrape jobs without REDIS_URL")
+
+    ScrapeWorker(
+        logger=logger,
+        queue=get_scrape_job_queue(redis_client),
+        cached_event_listing=get_event_listing_lite(logger=logger, redis_client=redis_client)
+    ).run_forever()
+
+
+def main():
+    # Not daemonic, so that workers can start their own parse process pool: they are terminated on shutdown instead
+    processes = [multiprocessing.Process(target=run_worker) for _ in range(Config().WORKER_PROCESSES)]
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for process in processes:
+            if process.pid is not None:
+                process.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date
+
+import fakeredis
+import pytest
+
+from benchmarks.fixture_pages import FixturePages
+from benchmarks.parse_bench import FixtureEventListing
+from lndngigs.enrichment import ArtistEnricher, ArtistMetadataCache, StubMetadataProvider
+from lndngigs.entities import ArtistWithMeta
+from lndngigs.event_cache import EventPageCache
+from lndngigs.revalidation import RevalidationStore
+from tests.conftest import FakeAsyncEventListing, listing_page, event_page
+
+
+def test_crawl_discovers_all_pages_once(pages):
+    event_listing = FakeAsyncEventListing(pages)
+    events = list(event_listing.get_events("london", date.today()))
+
+    assert sorted(event.artists[0].name for event in events) == \
+        ["goldfrapp", "massive-attack", "portishead", "radiohead", "tricky"]
+    assert sorted(event_listing.fetched_urls) == sorted(pages)
+
+
+def test_events_are_yielded_before_the_crawl_completes(pages):
+    slow_page = "http://www.songkick.com/metro-areas/london?page=4"
+    event_listing = FakeAsyncEventListing(pages, delays={slow_page: 5})
+
+    start = time.time()
+    events = event_listing.get_events("london", date.today())
+    first_event = next(events)
+    events.close()
+
+    assert first_event.venue.name == "Roundhouse"
+    assert time.time() - start < 1
+
+
+def test_bulk_crawl_is_shared_and_partitioned_by_date():
+    base_url = "http://www.songkick.com"
+    saturday, sunday, monday = date(2016, 3, 12), date(2016, 3, 13), date(2016, 3, 14)
+    event_listing = FakeAsyncEventListing({
+        base_url + "/metro-areas/london": listing_page([1, 2, 3]),
+        base_url + "/metro-areas/bristol": listing_page([4]),
+        base_url + "/concerts/1": event_page("radiohead", saturday),
+        base_url + "/concerts/2": event_page("portishead", sunday),
+        base_url + "/concerts/3": event_page("tricky", sunday),
+        base_url + "/concerts/4": event_page("massive-attack", saturday),
+    })
+
+    events_by_key = event_listing.get_events_bulk([
+        ("london", saturday), ("london", sunday), ("london", monday), ("bristol", saturday)
+    ])
+
+    assert len(event_listing.fetched_urls) == 6
+    assert {key: sorted(event.artists[0].name for event in events) for key, events in events_by_key.items()} == {
+        ("london", saturday): ["radiohead"],
+        ("london", sunday): ["portishead", "tricky"],
+        ("london", monday): [],
+        ("bristol", saturday): ["massive-attack"],
+    }
+
+
+def test_bulk_crawl_leaves_out_locations_that_fail(pages):
+    # Nothing is served for bristol: its first listing page fails
+    event_listing = FakeAsyncEventListing(pages)
+
+    events_by_key = event_listing.get_events_bulk([("london", date.today()), ("bristol", date.today())])
+
+    assert list(events_by_key) == [("london", date.today())]
+    assert len(events_by_key[("london", date.today())]) == 5
+
+
+def test_cached_concert_pages_are_not_fetched(pages):
+    event_cache = EventPageCache(fakeredis.FakeRedis())
+    list(FakeAsyncEventListing(pages, event_cache=event_cache).get_events("london", date.today()))
+
+    event_listing = FakeAsyncEventListing(pages, event_cache=event_cache)
+    events = list(event_listing.get_events("london", date.today()))
+
+    assert sorted(event.artists[0].name for event in events) == \
+        ["goldfrapp", "massive-attack", "portishead", "radiohead", "tricky"]
+    assert all("/concerts/" not in url for url in event_listing.fetched_urls)
+    assert event_cache.hits == 5
+
+
+class CountingEventPageCache(EventPageCache):
+    def __init__(self, redis_client):
+        super().__init__(redis_client)
+        self.writes = []
+
+    def cache_events(self, events):
+        self.writes.append((threading.current_thread(), sorted(event.link for event in events)))
+        super().cache_events(events)
+
+
+def test_scraped_concert_pages_are_cached_once_per_crawl_off_the_event_loop(pages):
+    base_url = "http://www.songkick.com"
+    pages[base_url + "/concerts/5"] = "<html><body><p>Service Unavailable</p></body></html>"
+    event_cache = CountingEventPageCache(fakeredis.FakeRedis())
+    list(FakeAsyncEventListing(pages, event_cache=event_cache).get_events("london", date.today()))
+
+    [(thread, urls)] = event_cache.writes
+    assert thread is not threading.current_thread()
+    # The concert page that did not parse into a complete event is not cached
+    assert urls == [base_url + "/concerts/{}".format(n) for n in range(1, 5)]
+
+
+def test_unchanged_pages_are_not_downloaded_nor_parsed_again(pages):
+    revalidation_store = RevalidationStore(fakeredis.FakeRedis())
+    first_crawl = FakeAsyncEventListing(pages, revalidation_store=revalidation_store)
+    events = sorted(first_crawl.get_events("london", date.today()))
+
+    second_crawl = FakeAsyncEventListing(pages, revalidation_store=revalidation_store)
+    assert sorted(second_crawl.get_events("london", date.today())) == events
+    assert first_crawl.last_crawl_stats.saved_parses == 0
+    assert second_crawl.last_crawl_stats.not_modified == len(pages)
+    assert second_crawl.last_crawl_stats.saved_parses == len(pages)
+    assert second_crawl.last_crawl_stats.saved_bytes == first_crawl.last_crawl_stats.bytes_fetched
+
+
+class CountingRevalidationStore(RevalidationStore):
+    def __init__(self, redis_client):
+        super().__init__(redis_client)
+        self.lookups = []
+        self.writes = []
+
+    def get_many(self, urls):
+        self.lookups.append((threading.current_thread(), sorted(urls)))
+        return super().get_many(urls)
+
+    def set_many(self, versions):
+        self.writes.append((threading.current_thread(), sorted(versions)))
+        super().set_many(versions)
+
+
+def test_page_versions_are_read_per_listing_page_and_written_once_off_the_event_loop(pages):
+    revalidation_store = CountingRevalidationStore(fakeredis.FakeRedis())
+    event_listing = FakeAsyncEventListing(pages, revalidation_store=revalidation_store)
+    list(event_listing.get_events("london", date.today()))
+
+    # The first listing page, then one lookup for the pages linked by each of the 4 listing pages
+    assert len(revalidation_store.lookups) == 5
+    assert sorted(url for _, urls in revalidation_store.lookups for url in urls) == sorted(pages)
+    assert [urls for _, urls in revalidation_store.writes] == [sorted(pages)]
+    assert all(
+        thread is not threading.current_thread()
+        for thread, _ in revalidation_store.lookups + revalidation_store.writes
+    )
+
+
+def test_delta_refresh_only_scrapes_new_concerts(pages):
+    base_url = "http://www.songkick.com"
+    cached_events = [
+        event for event in FakeAsyncEventListing(pages).get_events("london", date.today())
+        if event.link != base_url + "/concerts/5"
+    ]
+    pages[base_url + "/metro-areas/london?page=3"] = listing_page([])
+
+    event_listing = FakeAsyncEventListing(pages)
+    events = event_listing.get_events_delta("london", date.today(), cached_events)
+
+    assert sorted(event.artists[0].name for event in events) == ["goldfrapp", "massive-attack", "portishead", "radiohead"]
+    assert [url for url in event_listing.fetched_urls if "/concerts/" in url] == [base_url + "/concerts/5"]
+
+
+def test_crawled_events_are_enriched(pages):
+    pages["http://www.songkick.com/concerts/5"] = event_page("radiohead")
+    provider = StubMetadataProvider(batch_size=10)
+    event_listing = FakeAsyncEventListing(pages, enricher=ArtistEnricher(logging.getLogger("test"), provider))
+
+    events = list(event_listing.get_events("london", date.today()))
+
+    assert len(events) == 5
+    assert all(isinstance(artist, ArtistWithMeta) for event in events for artist in event.artists)
+    assert provider.lookups_count == 4
+
+
+def test_crawls_go_on_without_their_redis_caches_during_an_outage(pages):
+    server = fakeredis.FakeServer()
+    server.connected = False
+    redis_client = fakeredis.FakeRedis(server=server)
+    provider = StubMetadataProvider(batch_size=10)
+    event_listing = FakeAsyncEventListing(
+        pages,
+        event_cache=EventPageCache(redis_client),
+        revalidation_store=RevalidationStore(redis_client),
+        enricher=ArtistEnricher(
+            logging.getLogger("test"), provider, metadata_cache=ArtistMetadataCache(redis_client)
+        )
+    )
+
+    events = list(event_listing.get_events("london", date.today()))
+
+    assert len(events) == 5
+    assert all(isinstance(artist, ArtistWithMeta) for event in events for artist in event.artists)
+    assert sorted(event_listing.fetched_urls) == sorted(pages)
+
+
+@pytest.mark.parametrize("executor_class", [ThreadPoolExecutor, ProcessPoolExecutor])
+def test_pages_parsed_in_an_executor_match_the_inline_parse(executor_class):
+    fixture_pages = FixturePages()
+
+    async def crawl(parse_executor):
+        event_listing = FixtureEventListing(fixture_pages, parse_executor=parse_executor)
+        return sorted([event async for event in event_listing.iter_events("24426-uk-london", date.today())])
+
+    inline_events = asyncio.run(crawl(None))
+    with executor_class(max_workers=2) as executor:
+        events = asyncio.run(crawl(executor))
+
+    assert inline_events
+    assert events == inline_events
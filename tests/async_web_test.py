@@ -0,0 +1,91 @@
+import asyncio
+import json
+import logging
+from datetime import date
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+from lndngigs.async_web import build_app
+from lndngigs.factories import get_cached_event_listing
+
+
+@pytest.fixture(autouse=True)
+def no_local_cache(monkeypatch):
+    # The local cache is shared by the whole process, it would leak entries across tests
+    monkeypatch.setenv("LOCAL_CACHE_SIZE", "0")
+
+
+def request(redis_client, path):
+    async def get():
+        async with TestClient(TestServer(build_app(logger=logging.getLogger("test"), redis_client=redis_client))) as client:
+            response = await client.get(path)
+            return response.status, response.headers, await response.json() if response.content_type == "application/json" else await response.text()
+
+    return asyncio.run(get())
+
+
+def test_index_endpoint(redis_client):
+    status, _, body = request(redis_client, "/")
+    assert status == 200
+    assert body == "Hello from lndnGigs!"
+
+
+def test_gigs_endpoint_validates_location_and_date(redis_client):
+    status, _, body = request(redis_client, "/gigs/atlantis/today")
+    assert status == 406
+    assert body["error"].startswith("Invalid location")
+
+    status, _, body = request(redis_client, "/gigs/london/yesterday")
+    assert status == 406
+    assert body["error"].startswith("Invalid date")
+
+
+def test_gigs_endpoint_serves_cached_events(redis_client, event):
+    get_cached_event_listing(logging.getLogger("test"), None, redis_client).cache_events("24426-uk-london", date.today(), [event])
+
+    status, headers, body = request(redis_client, "/gigs/london/today")
+
+    assert status == 200
+    assert headers["X-Cache"] == "HIT"
+    assert body == {"gigs": [event.to_dict()]}
+
+
+def test_gigs_endpoint_serves_compressed_body_and_not_modified(redis_client, event):
+    get_cached_event_listing(logging.getLogger("test"), None, redis_client).cache_events("24426-uk-london", date.today(), [event])
+
+    async def get():
+        async with TestClient(TestServer(build_app(logger=logging.getLogger("test"), redis_client=redis_client))) as client:
+            response = await client.get("/gigs/london/today", headers={"Accept-Encoding": "gzip"})
+            assert response.status == 200
+            assert response.headers["Content-Encoding"] == "gzip"
+            assert await response.json() == {"gigs": [event.to_dict()]}
+
+            not_modified = await client.get("/gigs/london/today", headers={"If-None-Match": response.headers["ETag"]})
+            assert not_modified.status == 304
+            assert not_modified.headers["ETag"] == response.headers["ETag"]
+
+    asyncio.run(get())
+
+
+def test_gigs_endpoint_streams_ndjson(redis_client, event):
+    get_cached_event_listing(logging.getLogger("test"), None, redis_client).cache_events("24426-uk-london", date.today(), [event, event])
+
+    status, headers, body = request(redis_client, "/gigs/london/today?format=ndjson")
+
+    assert status == 200
+    assert headers["Content-Type"] == "application/x-ndjson"
+    assert [json.loads(line) for line in body.splitlines()] == [event.to_dict(), event.to_dict()]
+
+
+def test_artist_and_venue_endpoints_serve_indexed_events(redis_client, event):
+    get_cached_event_listing(logging.getLogger("test"), None, redis_client).cache_events("24426-uk-london", date.today(), [event])
+
+    for path in ("/artists/radiohead/gigs", "/artists/1-radiohead/gigs", "/venues/1-roundhouse/gigs"):
+        status, _, body = request(redis_client, path)
+        assert status == 200
+        assert body == {"gigs": [dict(event.to_dict(), location="london")]}
+
+    status, _, body = request(redis_client, "/artists/blur/gigs")
+    assert status == 200
+    assert body == {"gigs": []}
@@ -0,0 +1,228 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import fakeredis
+import pytest
+
+from lndngigs.event_listing import CacheEntry, CachedEventListing, consume_events
+from lndngigs.local_cache import LocalCache
+from lndngigs.responses import iter_ndjson
+from lndngigs.utils import SingleFlight
+from tests.conftest import EventListingMock
+
+
+def fire_concurrent_misses(cached_event_listings, location, events_date):
+    with ThreadPoolExecutor(max_workers=len(cached_event_listings)) as executor:
+        return list(executor.map(
+            lambda cached_event_listing: list(cached_event_listing.get_events(location, events_date)),
+            cached_event_listings
+        ))
+
+
+def test_concurrent_misses_in_one_process_crawl_once(redis_client, events):
+    event_listing = EventListingMock(events, delay=0.2)
+    single_flight = SingleFlight()
+    cached_event_listings = [
+        CachedEventListing(
+            logger=logging.getLogger("test"),
+            event_listing=event_listing,
+            redis_client=redis_client,
+            cache_key_prefix="test",
+            single_flight=single_flight
+        )
+        for _ in range(20)
+    ]
+
+    results = fire_concurrent_misses(cached_event_listings, "london", events[0].date)
+
+    assert event_listing.crawls == 1
+    assert all(result == events for result in results)
+
+
+def test_concurrent_misses_across_processes_crawl_once(redis_client, events):
+    event_listing = EventListingMock(events, delay=0.2)
+    cached_event_listings = [
+        CachedEventListing(
+            logger=logging.getLogger("test"),
+            event_listing=event_listing,
+            redis_client=redis_client,
+            cache_key_prefix="test",
+            lease_poll_interval=0.01,
+            single_flight=SingleFlight()  # A registry per instance simulates a process each
+        )
+        for _ in range(20)
+    ]
+
+    results = fire_concurrent_misses(cached_event_listings, "london", events[0].date)
+
+    assert event_listing.crawls == 1
+    assert all(result == events for result in results)
+
+
+@pytest.mark.parametrize("processes", [1, 4])
+def test_concurrent_misses_share_partial_events_without_crawling_again(redis_client, events, processes):
+    event_listing = EventListingMock(events, delay=0.2, partial=True)
+    single_flights = [SingleFlight() for _ in range(processes)]
+    cached_event_listings = [
+        CachedEventListing(
+            logger=logging.getLogger("test"),
+            event_listing=event_listing,
+            redis_client=redis_client,
+            cache_key_prefix="test",
+            lease_poll_interval=0.01,
+            single_flight=single_flights[n % processes]
+        )
+        for n in range(8)
+    ]
+
+    with ThreadPoolExecutor(max_workers=len(cached_event_listings)) as executor:
+        results = list(executor.map(
+            lambda cached_event_listing: consume_events(cached_event_listing.get_events("london", events[0].date)),
+            cached_event_listings
+        ))
+
+    assert event_listing.crawls == 1
+    assert all(result == (events, True) for result in results)
+    assert cached_event_listings[0].get_cached_entry("london", events[0].date) is None
+
+
+def test_stale_events_are_served_while_refreshed_in_background(redis_client, events):
+    event_listing = EventListingMock(events)
+    refresh_executor = ThreadPoolExecutor(max_workers=1)
+    cached_event_listing = CachedEventListing(
+        logger=logging.getLogger("test"),
+        event_listing=event_listing,
+        redis_client=redis_client,
+        cache_key_prefix="test",
+        soft_ttl=timedelta(seconds=0),
+        refresh_executor=refresh_executor
+    )
+    events_date = events[0].date
+
+    assert cached_event_listing.get_entry("london", events_date).status == CacheEntry.MISS
+    assert list(cached_event_listing.get_events("london", events_date)) == events
+
+    # Upstream changes: the stale events are served straight away, the refreshed ones on the next request
+    event_listing._events = events * 2
+    entry = cached_event_listing.get_entry("london", events_date)
+    assert entry.status == CacheEntry.STALE
+    assert entry.events == events
+
+    refresh_executor.shutdown(wait=True)
+    assert cached_event_listing.get_cached_events("london", events_date) == events * 2
+    assert event_listing.crawls == 2
+
+
+def test_local_cache_serves_hot_keys_and_is_invalidated_by_other_processes(redis_client, events):
+    def build_cached_event_listing(local_cache):
+        return CachedEventListing(
+            logger=logging.getLogger("test"),
+            event_listing=EventListingMock(events),
+            redis_client=redis_client,
+            cache_key_prefix="test",
+            local_cache=local_cache
+        )
+
+    local_cache = LocalCache(max_size=10)
+    cached_event_listing = build_cached_event_listing(local_cache)
+    events_date = events[0].date
+
+    assert list(cached_event_listing.get_events("london", events_date)) == events
+    assert list(cached_event_listing.get_events("london", events_date)) == events
+    assert local_cache.hits == 1
+
+    # Another process rewrites the key
+    local_cache.listen_for_invalidations(redis_client, cached_event_listing.invalidations_channel)
+    try:
+        build_cached_event_listing(LocalCache()).cache_events("london", events_date, events * 2)
+        deadline = time.time() + 5
+        while local_cache.invalidations == 0 and time.time() < deadline:
+            time.sleep(0.01)
+    finally:
+        local_cache.stop_listening()
+
+    assert list(cached_event_listing.get_events("london", events_date)) == events * 2
+
+
+def test_local_cache_subscribes_once_redis_is_back():
+    server = fakeredis.FakeServer()
+    server.connected = False
+    local_cache = LocalCache(max_size=10)
+    listener = local_cache.listen_for_invalidations(fakeredis.FakeRedis(server=server), "test", retry_interval=0.01)
+    try:
+        assert not listener.subscribed
+        local_cache.set("london", "served during the outage")
+
+        server.connected = True
+        deadline = time.time() + 5
+        while not listener.subscribed and time.time() < deadline:
+            time.sleep(0.01)
+
+        assert listener.subscribed
+        # Invalidations might have been missed in the meantime
+        assert local_cache.get("london") is None
+    finally:
+        local_cache.stop_listening()
+
+
+def test_streamed_miss_is_cached_only_when_the_stream_finishes(redis_client, events):
+    cached_event_listing = CachedEventListing(
+        logger=logging.getLogger("test"),
+        event_listing=EventListingMock(events * 3),
+        redis_client=redis_client,
+        cache_key_prefix="test"
+    )
+
+    lines = iter_ndjson(cached_event_listing.get_entry("london", events[0].date).events)
+    next(lines)
+    lines.close()
+    assert cached_event_listing.get_cached_entry("london", events[0].date) is None
+
+    lines = iter_ndjson(cached_event_listing.get_entry("london", events[0].date).events)
+    assert len(list(lines)) == 3
+    assert cached_event_listing.get_cached_events("london", events[0].date) == events * 3
+
+
+def test_bulk_reads_hits_in_one_round_trip_and_caches_misses(redis_client, events):
+    class BulkEventListingMock(EventListingMock):
+        def get_events_bulk(self, keys):
+            self.crawled.append(tuple(keys))
+            return {key: self._events for key in keys}
+
+    event_listing = BulkEventListingMock(events)
+    cached_event_listing = CachedEventListing(
+        logger=logging.getLogger("test"),
+        event_listing=event_listing,
+        redis_client=redis_client,
+        cache_key_prefix="test"
+    )
+    cached_event_listing.cache_events("london", events[0].date, [])
+    keys = [("london", events[0].date), ("bristol", events[0].date), ("leeds", events[0].date)]
+
+    assert cached_event_listing.get_events_bulk(keys) == {keys[0]: [], keys[1]: events, keys[2]: events}
+    assert event_listing.crawls == 1
+    assert set(cached_event_listing.get_cached_entries(keys)) == set(keys)
+
+
+def test_delta_refresh_diffs_against_the_cached_events(redis_client, events):
+    class DeltaEventListingMock(EventListingMock):
+        def get_events_delta(self, location, events_date, cached_events):
+            self.cached_events = cached_events
+            return cached_events + self._events
+
+    event_listing = DeltaEventListingMock(events)
+    cached_event_listing = CachedEventListing(
+        logger=logging.getLogger("test"),
+        event_listing=event_listing,
+        redis_client=redis_client,
+        cache_key_prefix="test",
+        delta_refresh=True
+    )
+    cached_event_listing.cache_events("london", events[0].date, events)
+
+    assert cached_event_listing.refresh_events("london", events[0].date) == events * 2
+    assert event_listing.cached_events == events
+    assert event_listing.crawls == 0
+    assert cached_event_listing.get_cached_events("london", events[0].date) == events * 2
@@ -0,0 +1,73 @@
+import json
+from datetime import date
+
+import pytest
+
+from lndngigs.codecs import get_codec, encode_events, decode_events, encode_event, decode_event, CodecException, \
+    render_events_json
+from lndngigs.entities import Event, Venue, Artist, ArtistWithMeta
+
+
+@pytest.fixture()
+def events():
+    return [
+        Event(
+            link="http://www.songkick.com/concerts/1-radiohead-at-roundhouse",
+            artists=[
+                Artist(url="http://www.songkick.com/artists/1-radiohead", name="Radiohead"),
+                ArtistWithMeta(url="http://www.songkick.com/artists/2-die-vogel", name="Die Vögel", tags=["techno"], image_url=None),
+            ],
+            venue=Venue(url="http://www.songkick.com/venues/1-roundhouse", name="Roundhouse", address="Chalk Farm Road"),
+            date=date(2016, 3, 12)
+        ),
+        Event(link="http://elsewhere.com/concerts/2", artists=[], venue=None, date=date(2016, 3, 12)),
+    ]
+
+
+@pytest.mark.parametrize("codec_name", ["json", "msgpack", "json+zlib", "msgpack+zlib"])
+def test_events_round_trip(events, codec_name):
+    try:
+        codec = get_codec(codec_name)
+    except CodecException:
+        pytest.skip("{} is not available".format(codec_name))
+
+    decoded_events, cached_at = decode_events(encode_events(events, 1457740800.5, codec), date(2016, 3, 12))
+
+    assert decoded_events == events
+    assert [[type(artist) for artist in event.artists] for event in decoded_events] == [[Artist, ArtistWithMeta], []]
+    assert cached_at == 1457740800.5
+
+
+def test_legacy_json_entries_are_decoded(events):
+    legacy_data = json.dumps([event.to_dict() for event in events]).encode("utf-8")
+
+    decoded_events, cached_at = decode_events(legacy_data, date(2016, 3, 12))
+
+    assert decoded_events == events
+    assert cached_at is None
+
+
+def test_single_event_keeps_its_date(events):
+    event, cached_at = decode_event(encode_event(events[0], 1234.5, get_codec("json+zlib")))
+    assert event == events[0]
+    assert cached_at == 1234.5
+
+
+def test_decoded_listings_share_artists_and_venues(events):
+    events = events + [events[0]._replace(link="http://www.songkick.com/concerts/3-radiohead-at-roundhouse")]
+
+    decoded_events, _ = decode_events(encode_events(events, 1234.5, get_codec("json")), date(2016, 3, 12))
+
+    assert decoded_events[0].artists[0] is decoded_events[2].artists[0]
+    assert decoded_events[0].venue is decoded_events[2].venue
+    assert not hasattr(decoded_events[0], "__dict__")
+
+
+@pytest.mark.parametrize("partial", [False, True])
+def test_events_json_matches_their_dictionaries(events, partial):
+    events = events + [events[0]._replace(venue=Venue(url=None, name='The "Roundhouse"', address=None))]
+    body = {"gigs": [event.to_dict() for event in events]}
+    if partial:
+        body["partial"] = True
+
+    assert render_events_json(events, partial=partial) == json.dumps(body, separators=(",", ":")).encode("utf-8")
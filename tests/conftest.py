@@ -0,0 +1,128 @@
+"""
+Fixtures shared by the tests: a fakeredis client, a cached event, a listing mock,
+and a fake Songkick listing served from memory for the crawl tests
+"""
+import asyncio
+import logging
+import threading
+import time
+from datetime import date
+
+import fakeredis
+import pytest
+
+from lndngigs.async_event_listing import AsyncEventListingLite, Page
+from lndngigs.codecs import get_etag
+from lndngigs.entities import Artist, Event, Venue
+
+
+@pytest.fixture()
+def redis_client():
+    return fakeredis.FakeRedis()
+
+
+@pytest.fixture()
+def event():
+    return Event(
+        link="http://www.songkick.com/concerts/1-radiohead-at-roundhouse",
+        artists=[Artist(url="http://www.songkick.com/artists/1-radiohead", name="Radiohead")],
+        venue=Venue(url="http://www.songkick.com/venues/1-roundhouse", name="Roundhouse", address="Chalk Farm Road"),
+        date=date.today()
+    )
+
+
+@pytest.fixture()
+def events(event):
+    return [event]
+
+
+class EventListingMock:
+    """
+    The same events for any location and date. Crawls can be slow (`delay` seconds), partial,
+    and the first `failures` of them fail.
+    """
+    def __init__(self, events=(), delay=0, failures=0, partial=False):
+        self._events = list(events)
+        self._delay = delay
+        self._failures = failures
+        self._partial = partial
+        self._lock = threading.Lock()
+        # (location, date) of every crawl
+        self.crawled = []
+
+    @property
+    def crawls(self):
+        return len(self.crawled)
+
+    def get_events(self, location, events_date):
+        with self._lock:
+            self.crawled.append((location, events_date))
+            failing = self._failures > 0
+            self._failures -= failing
+        time.sleep(self._delay)
+        if failing:
+            raise Exception("Upstream is down")
+        yield from self._events
+        return self._partial
+
+
+def listing_page(concert_ids, page_numbers=()):
+    return "<html><body>{}<div class='pagination'>{}</div></body></html>".format(
+        "".join("<a href='/concerts/{0}'>Concert {0}</a>".format(concert_id) for concert_id in concert_ids),
+        "".join("<a href='/metro-areas/london?page={0}'>{0}</a>".format(page) for page in page_numbers),
+    )
+
+
+def event_page(artist, events_date=None):
+    return (
+        "<html><body>"
+        "<time datetime='{1}T19:00:00+0000'></time>"
+        "<div class='line-up'><a href='/artists/{0}'>{0}</a></div>"
+        "<div class='location'><a href='/venues/1-roundhouse'>Roundhouse</a></div>"
+        "<p class='venue-hcard'><span>Chalk Farm Road</span><span>London</span></p>"
+        "</body></html>"
+    ).format(artist, events_date or date.today())
+
+
+class FakeAsyncEventListing(AsyncEventListingLite):
+    def __init__(self, pages, delays=None, event_cache=None, revalidation_store=None, enricher=None, event_loop=None):
+        super().__init__(
+            logger=logging.getLogger("test"),
+            event_loop=event_loop or asyncio.new_event_loop(),
+            event_cache=event_cache,
+            revalidation_store=revalidation_store,
+            enricher=enricher
+        )
+        self.pages = pages
+        self.delays = delays or {}
+        self.fetched_urls = []
+
+    def get_events_listing_url(self, location, events_date, until_date=None):
+        return "http://www.songkick.com/metro-areas/{}".format(location)
+
+    async def fetch_url(self, url):
+        self.fetched_urls.append(url)
+        await asyncio.sleep(self.delays.get(url, 0))
+        return self.pages[url].encode("utf-8")
+
+    async def fetch_page(self, url, etag=None, last_modified=None):
+        content = await self.fetch_url(url)
+        if etag == get_etag(content):
+            return Page(status=304, content=b"", etag=etag, last_modified=None)
+        return Page(status=200, content=content, etag=get_etag(content), last_modified=None)
+
+
+@pytest.fixture()
+def pages():
+    base_url = "http://www.songkick.com"
+    return {
+        base_url + "/metro-areas/london": listing_page([1, 2], page_numbers=[1, 2, 3]),
+        base_url + "/metro-areas/london?page=2": listing_page([3], page_numbers=[1, 2, 3, 4]),
+        base_url + "/metro-areas/london?page=3": listing_page([4]),
+        base_url + "/metro-areas/london?page=4": listing_page([5]),
+        base_url + "/concerts/1": event_page("radiohead"),
+        base_url + "/concerts/2": event_page("portishead"),
+        base_url + "/concerts/3": event_page("massive-attack"),
+        base_url + "/concerts/4": event_page("tricky"),
+        base_url + "/concerts/5": event_page("goldfrapp"),
+    }
@@ -0,0 +1,111 @@
+import asyncio
+import logging
+import threading
+import time
+from datetime import date
+
+import fakeredis
+import pytest
+
+import lndngigs.factories
+from lndngigs.enrichment import ArtistEnricher, ArtistMetadata, ArtistMetadataCache, StubMetadataProvider
+from lndngigs.entities import Artist, ArtistWithMeta, Event, Venue
+from lndngigs.utils import Config
+
+
+def get_event(concert_id, *artist_names):
+    return Event(
+        link="http://www.songkick.com/concerts/{}".format(concert_id),
+        artists=[Artist(url="http://www.songkick.com/artists/{}".format(name.lower()), name=name) for name in artist_names],
+        venue=Venue(url="http://www.songkick.com/venues/1-roundhouse", name="Roundhouse", address="Chalk Farm Road"),
+        date=date.today()
+    )
+
+
+@pytest.fixture()
+def metadata_cache():
+    return ArtistMetadataCache(fakeredis.FakeRedis(), cache_key_prefix="test:artists")
+
+
+@pytest.fixture()
+def metadata():
+    return {
+        "Radiohead": ArtistMetadata(tags=["rock"], image_url="http://lndngigs/radiohead.jpg"),
+        "Portishead": ArtistMetadata(tags=["trip-hop"], image_url=None),
+    }
+
+
+def test_artists_are_looked_up_once_and_cached(metadata, metadata_cache):
+    provider = StubMetadataProvider(metadata, batch_size=2)
+    enricher = ArtistEnricher(logging.getLogger("test"), provider, metadata_cache)
+    events = [get_event(1, "Radiohead", "Portishead"), get_event(2, "Radiohead", "Unknown"), get_event(3, "Portishead")]
+
+    enriched_events = asyncio.run(enricher.enrich(events))
+
+    assert enriched_events[0].artists == [
+        ArtistWithMeta(url="http://www.songkick.com/artists/radiohead", name="Radiohead", tags=["rock"], image_url="http://lndngigs/radiohead.jpg"),
+        ArtistWithMeta(url="http://www.songkick.com/artists/portishead", name="Portishead", tags=["trip-hop"], image_url=None),
+    ]
+    assert enriched_events[1].artists[1] == events[1].artists[1]
+    assert provider.lookups_count == 3
+    assert provider.requests_count == 2
+
+    # Unknown artists are cached too
+    assert asyncio.run(enricher.enrich(events)) == enriched_events
+    assert provider.lookups_count == 3
+    assert enricher.last_stats.cached == 3
+
+
+def test_lookups_past_the_deadline_leave_plain_artists(metadata):
+    enricher = ArtistEnricher(logging.getLogger("test"), StubMetadataProvider(metadata, latency=5), timeout=0.1)
+    events = [get_event(1, "Radiohead")]
+
+    start = time.monotonic()
+    assert asyncio.run(enricher.enrich(events)) == events
+    assert time.monotonic() - start < 1
+    assert enricher.last_stats.timed_out == 1
+
+
+def test_lookups_are_rate_limited(metadata):
+    provider = StubMetadataProvider(metadata, batch_size=1, requests_per_second=20)
+    enricher = ArtistEnricher(logging.getLogger("test"), provider, concurrency=10)
+    events = [get_event(concert_id, "Artist{}".format(concert_id)) for concert_id in range(6)]
+
+    start = time.monotonic()
+    asyncio.run(enricher.enrich(events))
+
+    assert provider.requests_count == 6
+    assert time.monotonic() - start >= 0.2
+
+
+def test_metadata_cache_is_read_and_written_off_the_event_loop(metadata):
+    class ThreadRecordingCache(ArtistMetadataCache):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.threads = []
+
+        def get_metadata(self, urls):
+            self.threads.append(threading.current_thread())
+            return super().get_metadata(urls)
+
+        def cache_metadata(self, artists_metadata):
+            self.threads.append(threading.current_thread())
+            super().cache_metadata(artists_metadata)
+
+    metadata_cache = ThreadRecordingCache(fakeredis.FakeRedis(), cache_key_prefix="test:artists")
+    enricher = ArtistEnricher(logging.getLogger("test"), StubMetadataProvider(metadata), metadata_cache)
+
+    asyncio.run(enricher.enrich([get_event(1, "Radiohead")]))
+
+    assert len(metadata_cache.threads) == 2
+    assert threading.current_thread() not in metadata_cache.threads
+
+
+def test_lastfm_does_not_share_the_songkick_http_client(monkeypatch):
+    monkeypatch.setenv("LASTFM_API_KEY", "key")
+    monkeypatch.setenv("ENRICHMENT_PROVIDER", "lastfm")
+
+    provider = lndngigs.factories.get_metadata_provider(Config())
+
+    assert provider._http_client is lndngigs.factories.get_metadata_http_client()
+    assert provider._http_client is not lndngigs.factories.get_http_client()
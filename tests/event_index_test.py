@@ -0,0 +1,112 @@
+import logging
+import time
+from datetime import date, timedelta
+
+import pytest
+
+from lndngigs.entities import Artist, Event, Venue
+from lndngigs.event_index import EventIndex, normalize_term
+from lndngigs.event_listing import CachedEventListing
+from lndngigs.utils import ValidationException
+
+
+def get_event(artist_id, artist_name, venue_id, events_date):
+    return Event(
+        link="http://www.songkick.com/concerts/{}-at-{}".format(artist_id, venue_id),
+        artists=[Artist(url="http://www.songkick.com/artists/{}".format(artist_id), name=artist_name)],
+        venue=Venue(url="http://www.songkick.com/venues/{}".format(venue_id), name=venue_id, address=None),
+        date=events_date
+    )
+
+
+@pytest.fixture()
+def event_index(redis_client):
+    return EventIndex(redis_client, cache_key_prefix="test:index")
+
+
+@pytest.fixture()
+def cached_event_listing(redis_client, event_index):
+    return CachedEventListing(
+        logger=logging.getLogger("test"),
+        event_listing=None,
+        redis_client=redis_client,
+        cache_key_prefix="test",
+        event_index=event_index
+    )
+
+
+def test_terms_are_normalized():
+    assert normalize_term(" Sigur Rós ") == "sigur-rós"
+    assert normalize_term("AC/DC") == "ac-dc"
+
+
+def test_cached_events_are_indexed_by_artist_and_venue(cached_event_listing, event_index):
+    today, tomorrow = date.today(), date.today() + timedelta(days=1)
+    radiohead_today = get_event("1-radiohead", "Radiohead", "1-roundhouse", today)
+    radiohead_tomorrow = get_event("1-radiohead", "Radiohead", "2-o2-arena", tomorrow)
+    blur = get_event("2-blur", "Blur", "1-roundhouse", today)
+
+    cached_event_listing.cache_events_bulk({
+        ("24426-uk-london", today): [radiohead_today, blur],
+        ("24426-uk-london", tomorrow): [radiohead_tomorrow],
+    })
+
+    assert event_index.get_artist_events("RADIOHEAD") == [
+        ("24426-uk-london", radiohead_today.to_dict()),
+        ("24426-uk-london", radiohead_tomorrow.to_dict()),
+    ]
+    assert event_index.get_artist_events("1-radiohead") == event_index.get_artist_events("radiohead")
+    assert event_index.get_venue_events("1-roundhouse") == [
+        ("24426-uk-london", radiohead_today.to_dict()),
+        ("24426-uk-london", blur.to_dict()),
+    ]
+
+    with pytest.raises(ValidationException):
+        event_index.get_artist_events(" / ")
+
+
+def test_recached_listings_replace_their_index_entries(cached_event_listing, event_index, redis_client):
+    radiohead = get_event("1-radiohead", "Radiohead", "1-roundhouse", date.today())
+    blur = get_event("2-blur", "Blur", "1-roundhouse", date.today())
+
+    cached_event_listing.cache_events("24426-uk-london", date.today(), [radiohead, blur])
+    cached_event_listing.cache_events("24426-uk-london", date.today(), [blur])
+
+    assert event_index.get_artist_events("radiohead") == []
+    assert event_index.get_venue_events("1-roundhouse") == [("24426-uk-london", blur.to_dict())]
+
+    cached_event_listing.cache_events("24426-uk-london", date.today(), [])
+
+    assert event_index.get_venue_events("1-roundhouse") == []
+    assert redis_client.keys("test:index:*") == []
+
+
+def test_index_entries_expire_with_their_listing(redis_client, event_index):
+    radiohead = get_event("1-radiohead", "Radiohead", "1-roundhouse", date.today())
+
+    event_index.index_events_bulk(redis_client, {("24426-uk-london", date.today()): [radiohead]}, expires_at=0)
+
+    assert event_index.get_artist_events("radiohead") == []
+
+
+def test_older_listings_never_shorten_the_expiry_of_terms(redis_client, event_index):
+    today, tomorrow = date.today(), date.today() + timedelta(days=1)
+    now = time.time()
+
+    pipeline = redis_client.pipeline()
+    event_index.index_events_bulk(
+        pipeline, {("24426-uk-london", today): [get_event("1-radiohead", "Radiohead", "1-roundhouse", today)]},
+        expires_at=now + 3600
+    )
+    pipeline.execute()
+    # e.g. a listing restored from the snapshot, cached earlier
+    pipeline = redis_client.pipeline()
+    event_index.index_events_bulk(
+        pipeline, {("24426-uk-london", tomorrow): [get_event("1-radiohead", "Radiohead", "2-o2-arena", tomorrow)]},
+        expires_at=now + 60
+    )
+    pipeline.execute()
+
+    assert redis_client.ttl(event_index.get_term_key_name("artist", "radiohead")) > 3000
+    assert redis_client.ttl(event_index.get_term_key_name("venue", "2-o2-arena")) <= 61
+    assert len(event_index.get_artist_events("radiohead")) == 2
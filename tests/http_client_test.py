@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import time
+from datetime import date
+
+import pytest
+
+from benchmarks.fixture_pages import FixturePages
+from benchmarks.stub_server import StubServer, StubHttpClient
+from lndngigs.async_event_listing import AsyncEventListingLite, CrawlStats, HttpClient, UpstreamStatusError
+from lndngigs.concurrency import AdaptiveLimiter
+
+
+def test_server_errors_are_retried():
+    async def fetch_all():
+        async with StubServer(latency=0, error_rate=0.3, seed=1) as server:
+            http_client = HttpClient(retries=5, retry_backoff=0.01)
+            pages = await asyncio.gather(*[http_client.fetch_page(server.base_url) for _ in range(50)])
+            await http_client.close()
+            return http_client, pages
+
+    http_client, pages = asyncio.run(fetch_all())
+
+    assert all(page.status == 200 for page in pages)
+    assert http_client.retries_count > 0
+
+
+def test_error_responses_raise_once_retries_are_exhausted():
+    async def fetch():
+        async with StubServer(latency=0, failing_paths=["/down"]) as server:
+            http_client = HttpClient(retries=2, retry_backoff=0.01)
+            try:
+                with pytest.raises(UpstreamStatusError) as ex:
+                    await http_client.fetch_page(server.base_url + "/down")
+                return http_client, ex.value, server.requests_count
+            finally:
+                await http_client.close()
+
+    http_client, ex, requests_count = asyncio.run(fetch())
+
+    assert ex.status == 503
+    assert requests_count == 3
+    assert http_client.retries_count == 2
+
+
+def test_failing_concert_pages_make_the_crawl_partial():
+    failing_concert = "/concerts/27000001-event-27000001"
+
+    async def crawl():
+        async with StubServer(pages=FixturePages(), latency=0, failing_paths=[failing_concert]) as server:
+            http_client = StubHttpClient(server.base_url, retries=1, retry_backoff=0.01)
+            event_listing = AsyncEventListingLite(logger=logging.getLogger("test"), event_loop=None, http_client=http_client)
+            stats = CrawlStats()
+            events = await event_listing.scrape_events(
+                date.today(), event_listing.get_events_listing_url("24426-uk-london", date.today()), stats
+            )
+            await http_client.close()
+            return stats, events
+
+    stats, events = asyncio.run(crawl())
+
+    assert stats.partial
+    assert stats.failed_pages == 1
+    assert events
+    assert not any(event.link.endswith(failing_concert) for event in events)
+
+
+def test_stalled_requests_are_retried_after_their_deadline():
+    async def fetch_all():
+        async with StubServer(latency=0, stall_rate=0.2, stall=5, seed=1) as server:
+            http_client = HttpClient(request_timeout=0.2, retries=5, retry_backoff=0.01)
+            start = time.monotonic()
+            pages = await asyncio.gather(*[http_client.fetch_page(server.base_url) for _ in range(20)])
+            elapsed = time.monotonic() - start
+            await http_client.close()
+            return elapsed, pages
+
+    elapsed, pages = asyncio.run(fetch_all())
+
+    assert all(page.status == 200 for page in pages)
+    assert elapsed < 3
+
+
+def test_hedged_requests_cut_the_tail_latency():
+    async def fetch(http_client, url):
+        start = time.monotonic()
+        await http_client.fetch_page(url)
+        return time.monotonic() - start
+
+    async def fetch_all():
+        async with StubServer(latency=0.01, stall_rate=0.02, stall=1.5, seed=3) as server:
+            http_client = HttpClient(hedge=True, retries=0, latency_target=5)
+            # Latencies observed so far set the hedging threshold
+            await asyncio.gather(*[fetch(http_client, server.base_url) for _ in range(100)])
+            latencies = await asyncio.gather(*[fetch(http_client, server.base_url) for _ in range(60)])
+            await http_client.close()
+            return http_client, latencies
+
+    http_client, latencies = asyncio.run(fetch_all())
+
+    assert http_client.hedged_requests_count > 0
+    assert max(latencies) < 0.75
+
+
+def test_crawl_deadline_returns_partial_events():
+    async def crawl():
+        async with StubServer(pages=FixturePages(), latency=0, stall_rate=0.2, stall=5, seed=1) as server:
+            http_client = StubHttpClient(server.base_url, retries=0)
+            event_listing = AsyncEventListingLite(
+                logger=logging.getLogger("test"),
+                event_loop=None,
+                http_client=http_client,
+                crawl_timeout=0.5
+            )
+            stats = CrawlStats()
+            start = time.monotonic()
+            events = await event_listing.scrape_events(
+                date.today(), event_listing.get_events_listing_url("24426-uk-london", date.today()), stats
+            )
+            elapsed = time.monotonic() - start
+            await http_client.close()
+            return stats, events, elapsed
+
+    stats, events, elapsed = asyncio.run(crawl())
+
+    assert stats.partial
+    assert 0 < len(events) < 120
+    assert elapsed < 2
+
+
+def test_limiter_backs_off_on_overload_and_recovers():
+    limiter = AdaptiveLimiter(initial_limit=10, max_limit=10, latency_target=0.5)
+
+    async def request(latency, overloaded=False):
+        await limiter.acquire()
+        limiter.release(latency, overloaded=overloaded)
+
+    asyncio.run(request(0.01, overloaded=True))
+    assert limiter.limit == 5
+
+    async def recover():
+        await asyncio.gather(*[request(0.01) for _ in range(50)])
+
+    asyncio.run(recover())
+    assert limiter.limit == 10
+
+
+def test_latency_percentiles_include_slow_responses():
+    limiter = AdaptiveLimiter(initial_limit=10, latency_target=0.5)
+
+    async def requests():
+        for n in range(100):
+            await limiter.acquire()
+            # One in ten responses is slower than the target, one more is an error
+            limiter.release(2.0 if n % 10 == 0 else 0.1, overloaded=n % 10 == 1)
+
+    asyncio.run(requests())
+
+    assert limiter.get_latency_percentile(50) == 0.1
+    assert limiter.get_latency_percentile(95) == 2.0
@@ -0,0 +1,162 @@
+import logging
+import time
+from datetime import date, timedelta
+
+import pytest
+
+from lndngigs.event_listing import CachedEventListing
+from lndngigs.job_queue import ScrapeJobQueue
+from lndngigs.utils import CommandMessagesQueue
+from lndngigs.worker import ScrapeWorker
+from tests.conftest import EventListingMock
+
+
+def build_worker(redis_client, queue, event_listing):
+    return ScrapeWorker(
+        logger=logging.getLogger("test"),
+        queue=queue,
+        cached_event_listing=CachedEventListing(
+            logger=logging.getLogger("test"),
+            event_listing=event_listing,
+            redis_client=redis_client,
+            cache_key_prefix="test"
+        )
+    )
+
+
+def test_command_messages_queue(redis_client):
+    queue = CommandMessagesQueue(redis_client=redis_client)
+    queue.push({"foo": "bar"})
+    queue.push({"foo": "baz"})
+    assert len(queue) == 2
+    assert queue.pop() == {"foo": "bar"}
+    assert queue.pop(timeout=1) == {"foo": "baz"}
+    assert queue.pop() is None
+
+
+def test_jobs_are_deduplicated_until_done(redis_client):
+    queue = ScrapeJobQueue(redis_client)
+
+    assert queue.enqueue_scrape("london", date.today())
+    assert not queue.enqueue_scrape("london", date.today())
+    assert queue.enqueue_scrape("bristol", date.today())
+
+    job = queue.reserve(timeout=0)
+    assert ScrapeJobQueue.get_scrape(job) == ("london", date.today())
+    assert not queue.enqueue_scrape("london", date.today())
+
+    queue.ack(job)
+    assert queue.enqueue_scrape("london", date.today())
+    assert queue.stats() == {"pending": 2, "processing": 0, "failed": 0}
+
+
+def test_jobs_not_acknowledged_in_time_are_queued_again(redis_client):
+    queue = ScrapeJobQueue(redis_client, visibility_timeout=timedelta(seconds=0.1))
+    queue.enqueue_scrape("london", date.today())
+
+    first_attempt = queue.reserve(timeout=0)
+    assert queue.reserve(timeout=0) is None
+    assert queue.requeue_expired() == 0
+
+    time.sleep(0.2)
+    assert queue.requeue_expired() == 1
+    second_attempt = queue.reserve(timeout=0)
+    assert second_attempt.key == first_attempt.key
+    assert second_attempt.attempts == 2
+
+
+def test_jobs_reserved_without_a_deadline_get_a_grace_period(redis_client):
+    queue = ScrapeJobQueue(redis_client, visibility_timeout=timedelta(seconds=0.1))
+    queue.enqueue_scrape("london", date.today())
+    # Reserved, but the deadline is not set yet
+    redis_client.rpoplpush(queue.pending_key_name, queue.processing_key_name)
+
+    assert queue.requeue_expired() == 0
+    assert queue.stats() == {"pending": 0, "processing": 1, "failed": 0}
+
+    time.sleep(0.2)
+    assert queue.requeue_expired() == 1
+    assert queue.reserve(timeout=0).key == "london:{}".format(date.today().isoformat())
+
+
+def test_jobs_completed_after_they_expired_are_left_to_their_next_run(redis_client):
+    queue = ScrapeJobQueue(redis_client, visibility_timeout=timedelta(seconds=0.1))
+    queue.enqueue_scrape("london", date.today())
+    first_attempt = queue.reserve(timeout=0)
+    time.sleep(0.2)
+    assert queue.requeue_expired() == 1
+
+    assert not queue.ack(first_attempt)
+    assert not queue.fail(first_attempt)
+
+    second_attempt = queue.reserve(timeout=0)
+    assert ScrapeJobQueue.get_scrape(second_attempt) == ("london", date.today())
+    assert queue.ack(second_attempt)
+    assert queue.stats() == {"pending": 0, "processing": 0, "failed": 0}
+
+
+def test_worker_skips_jobs_without_payload_and_survives_errors(redis_client, events):
+    queue = ScrapeJobQueue(redis_client)
+    worker = build_worker(redis_client, queue, EventListingMock(events))
+    redis_client.lpush(queue.pending_key_name, "london:2016-03-12")
+
+    assert worker.run_once(timeout=0)
+    assert queue.stats() == {"pending": 0, "processing": 0, "failed": 0}
+
+    queue.enqueue_scrape("london", date.today())
+    calls = []
+
+    def run_once():
+        calls.append(None)
+        if len(calls) == 1:
+            raise ConnectionError("Redis is down")
+        if len(calls) == 3:
+            raise KeyboardInterrupt
+        return ScrapeWorker.run_once(worker, timeout=0)
+
+    worker.run_once = run_once
+    with pytest.raises(KeyboardInterrupt):
+        worker.run_forever(error_interval=timedelta(0))
+    assert len(calls) == 3
+    assert queue.stats() == {"pending": 0, "processing": 0, "failed": 0}
+
+
+def test_worker_retries_failed_jobs_then_gives_up(redis_client, events):
+    queue = ScrapeJobQueue(redis_client, max_attempts=2)
+    worker = build_worker(redis_client, queue, EventListingMock(events, failures=5))
+    queue.enqueue_scrape("london", date.today())
+
+    assert worker.run_once(timeout=0)
+    assert queue.stats() == {"pending": 1, "processing": 0, "failed": 0}
+    assert worker.run_once(timeout=0)
+    assert queue.stats() == {"pending": 0, "processing": 0, "failed": 1}
+    assert not worker.run_once(timeout=0)
+
+
+def test_worker_caches_the_events(redis_client, events):
+    queue = ScrapeJobQueue(redis_client)
+    worker = build_worker(redis_client, queue, EventListingMock(events, failures=1))
+    queue.enqueue_scrape("london", date.today())
+
+    while worker.run_once(timeout=0):
+        pass
+
+    assert queue.stats() == {"pending": 0, "processing": 0, "failed": 0}
+    cached_event_listing = CachedEventListing(logging.getLogger("test"), None, redis_client, cache_key_prefix="test")
+    assert cached_event_listing.get_cached_events("london", date.today()) == events
+
+
+def test_stale_entries_are_refreshed_through_the_queue(redis_client, events):
+    queue = ScrapeJobQueue(redis_client)
+    cached_event_listing = CachedEventListing(
+        logger=logging.getLogger("test"),
+        event_listing=EventListingMock(events),
+        redis_client=redis_client,
+        cache_key_prefix="test",
+        soft_ttl=timedelta(0),
+        refresh_queue=queue
+    )
+    cached_event_listing.cache_events("london", date.today(), events)
+
+    assert list(cached_event_listing.get_events("london", date.today())) == events
+    assert ScrapeJobQueue.get_scrape(queue.reserve(timeout=0)) == ("london", date.today())
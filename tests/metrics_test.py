@@ -0,0 +1,124 @@
+import asyncio
+import logging
+from datetime import date, timedelta
+
+import fakeredis
+from aiohttp.test_utils import TestClient, TestServer
+
+from benchmarks.fixture_pages import FixturePages
+from benchmarks.stub_server import StubServer, StubHttpClient
+from lndngigs.async_event_listing import AsyncEventListingLite, CrawlStats
+from lndngigs.async_web import build_app
+from lndngigs.event_listing import CachedEventListing
+from lndngigs.metrics import MetricsRegistry, registry
+from tests.conftest import EventListingMock
+
+
+def test_metrics_are_rendered_in_the_prometheus_format():
+    metrics = MetricsRegistry()
+    requests = metrics.counter("requests_total", "Requests", ["status"])
+    latency = metrics.histogram("latency_seconds", "Latency", buckets=(0.1, 1))
+
+    requests.inc(status="HIT")
+    requests.inc(2, status="HIT")
+    latency.observe(0.05)
+    latency.observe(0.5)
+
+    assert metrics.render().splitlines() == [
+        "# HELP requests_total Requests",
+        "# TYPE requests_total counter",
+        'requests_total{status="HIT"} 3',
+        "# HELP latency_seconds Latency",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{le="0.1"} 1',
+        'latency_seconds_bucket{le="1"} 2',
+        'latency_seconds_bucket{le="+Inf"} 2',
+        "latency_seconds_sum 0.55",
+        "latency_seconds_count 2",
+    ]
+
+
+def test_hooks_receive_the_recorded_samples():
+    metrics = MetricsRegistry()
+    latency = metrics.histogram("latency_seconds", "Latency", ["stage"])
+
+    with metrics.recorded() as samples:
+        with latency.time(stage="parse"):
+            pass
+    latency.observe(1, stage="parse")
+
+    assert [(sample.name, sample.labels) for sample in samples] == [("latency_seconds", {"stage": "parse"})]
+    assert samples[0].value >= 0
+    assert latency.get_count(stage="parse") == 2
+
+
+def test_cache_lookups_are_counted_by_location_and_status(redis_client, events):
+    cached_event_listing = CachedEventListing(
+        logger=logging.getLogger("test"),
+        event_listing=EventListingMock(events),
+        redis_client=redis_client,
+        cache_key_prefix="test",
+        soft_ttl=timedelta(minutes=10),
+        refresh_executor=None
+    )
+
+    with registry.recorded() as samples:
+        list(cached_event_listing.get_events("24426-uk-london", date.today()))
+        list(cached_event_listing.get_events("24426-uk-london", date.today()))
+
+    cache_requests = [sample.labels for sample in samples if sample.name == "lndngigs_cache_requests_total"]
+    assert cache_requests == [
+        {"location": "24426-uk-london", "status": "MISS"},
+        {"location": "24426-uk-london", "status": "HIT"},
+    ]
+    redis_operations = [sample.labels["operation"] for sample in samples if sample.name == "lndngigs_redis_seconds"]
+    assert redis_operations == ["get", "set", "get"]
+
+
+def test_crawls_record_fetches_parse_times_and_fan_out():
+    async def crawl():
+        async with StubServer(pages=FixturePages(), latency=0) as server:
+            http_client = StubHttpClient(server.base_url)
+            event_listing = AsyncEventListingLite(
+                logger=logging.getLogger("test"),
+                event_loop=None,
+                http_client=http_client
+            )
+            stats = CrawlStats()
+            await event_listing.scrape_events(
+                date.today(), event_listing.get_events_listing_url("24426-uk-london", date.today()), stats
+            )
+            await http_client.close()
+            return stats
+
+    with registry.recorded() as samples:
+        stats = asyncio.run(crawl())
+
+    def get_samples(name, **labels):
+        return [sample for sample in samples if sample.name == name and all(sample.labels[k] == v for k, v in labels.items())]
+
+    assert len(get_samples("lndngigs_upstream_fetch_seconds")) == stats.pages_fetched
+    assert sum(sample.value for sample in get_samples("lndngigs_upstream_fetch_bytes")) == stats.bytes_fetched
+    assert len(get_samples("lndngigs_parse_seconds", page_type="listing")) == stats.listing_pages
+    assert len(get_samples("lndngigs_parse_seconds", page_type="event")) == stats.event_pages
+    assert [sample.value for sample in get_samples("lndngigs_crawl_pages")] == [stats.listing_pages, stats.event_pages]
+    assert stats.listing_pages > 1
+    assert stats.listing_pages + stats.event_pages == stats.pages_fetched
+
+
+def test_metrics_endpoint_exposes_the_gigs_latency():
+    async def get():
+        async with TestClient(TestServer(build_app(logger=logging.getLogger("test"), redis_client=fakeredis.FakeRedis()))) as client:
+            await client.get("/gigs/atlantis/today")
+            response = await client.get("/metrics")
+            return response.status, response.headers["Content-Type"], await response.text()
+
+    with registry.recorded() as samples:
+        status, content_type, body = asyncio.run(get())
+
+    assert status == 200
+    assert content_type.startswith("text/plain")
+    assert [sample.labels for sample in samples if sample.name == "lndngigs_request_seconds"] == [
+        {"handler": "gigs", "status": 406}
+    ]
+    assert 'lndngigs_request_seconds_count{handler="gigs",status="406"}' in body
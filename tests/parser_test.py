@@ -0,0 +1,81 @@
+import logging
+import os
+from datetime import date
+
+import pytest
+
+from lndngigs.event_listing import SongkickScraper
+
+FIXTURES_PATH = os.path.join(os.path.dirname(__file__), "fixtures", "songkick")
+
+
+def read_fixture(file_name):
+    with open(os.path.join(FIXTURES_PATH, file_name), "rb") as f:
+        return f.read().decode("utf-8")
+
+
+@pytest.mark.parametrize("file_name", [name for name in sorted(os.listdir(FIXTURES_PATH)) if name.startswith("concert-")])
+def test_xpath_event_page_parser_matches_css(file_name):
+    url = "http://www.songkick.com/concerts/{}".format(file_name)
+    content = read_fixture(file_name)
+
+    xpath_event = SongkickScraper.parse_event_page_xpath(url, content, date.today())
+    css_event = SongkickScraper.parse_event_page_css(url, content, date.today())
+
+    assert xpath_event.artists
+    assert xpath_event == css_event
+    assert [type(artist) for artist in xpath_event.artists] == [type(artist) for artist in css_event.artists]
+    assert type(xpath_event.venue) == type(css_event.venue)
+
+
+@pytest.mark.parametrize("file_name", [name for name in sorted(os.listdir(FIXTURES_PATH)) if name.startswith("metro-area-")])
+def test_xpath_event_listing_page_parser_matches_css(file_name):
+    url = "http://www.songkick.com/metro-areas/24426-uk-london"
+    content = read_fixture(file_name)
+
+    event_urls, page_urls = SongkickScraper.parse_event_listing_page_xpath(url, content)
+    assert event_urls
+    assert page_urls
+    assert (event_urls, page_urls) == SongkickScraper.parse_event_listing_page_css(url, content)
+
+
+def test_xpath_parsers_match_css_on_any_container_element():
+    event_content = (
+        "<html><body>"
+        "<time datetime='2016-03-12T19:00:00+0000'></time>"
+        "<ul class='line-up'><li><a href='/artists/1-radiohead'>Radiohead</a></li></ul>"
+        "<section class='location'><a href='/venues/1-roundhouse'>Roundhouse</a></section>"
+        "<p class='venue-hcard'><span>Chalk Farm Road</span><span>London</span></p>"
+        "</body></html>"
+    )
+    listing_content = (
+        "<html><body>"
+        "<a href='/concerts/1'>Concert 1</a>"
+        "<nav class='pagination'><a href='/metro-areas/24426-uk-london?page=2'>2</a></nav>"
+        "</body></html>"
+    )
+    event_url = "http://www.songkick.com/concerts/1"
+    listing_url = "http://www.songkick.com/metro-areas/24426-uk-london"
+
+    xpath_event = SongkickScraper.parse_event_page_xpath(event_url, event_content, None)
+    assert xpath_event.artists and xpath_event.venue
+    assert xpath_event == SongkickScraper.parse_event_page_css(event_url, event_content, None)
+
+    event_urls, page_urls = SongkickScraper.parse_event_listing_page_xpath(listing_url, listing_content)
+    assert page_urls
+    assert (event_urls, page_urls) == SongkickScraper.parse_event_listing_page_css(listing_url, listing_content)
+
+
+def test_parser_is_selectable(monkeypatch):
+    content = read_fixture("concert-2.html")
+    for parser in ("css", "xpath"):
+        monkeypatch.setattr(SongkickScraper, "PARSER", parser)
+        event = SongkickScraper.parse_event_page(logging.getLogger("test"), "http://www.songkick.com/concerts/2", content, date.today())
+        assert "Die Vögel" in [artist.name for artist in event.artists]
+
+
+@pytest.mark.parametrize("parser", ["css", "xpath"])
+def test_event_date_is_read_from_the_page_when_unknown(parser):
+    parse_event_page = getattr(SongkickScraper, "parse_event_page_{}".format(parser))
+    event = parse_event_page("http://www.songkick.com/concerts/1", read_fixture("concert-1.html"), None)
+    assert event.date == date(2016, 3, 12)
@@ -0,0 +1,61 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import pytest
+
+from lndngigs.concurrency import BackgroundEventLoop
+from lndngigs.services import Services
+from tests.conftest import FakeAsyncEventListing
+
+
+@pytest.fixture()
+def background_loop():
+    background_loop = BackgroundEventLoop()
+    yield background_loop
+    background_loop.close()
+
+
+def test_coroutines_from_many_threads_are_multiplexed_on_one_loop(background_loop):
+    async def get_running_loop():
+        await asyncio.sleep(0.2)
+        return asyncio.get_running_loop()
+
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        event_loops = list(executor.map(lambda _: background_loop.run(get_running_loop()), range(10)))
+
+    assert set(event_loops) == {background_loop.event_loop}
+    assert time.time() - start < 1
+
+
+def test_unknown_event_loops_are_rejected():
+    with pytest.raises(Exception):
+        BackgroundEventLoop(implementation="unknown")
+
+
+def test_request_threads_submit_crawls_to_the_background_loop(background_loop, pages):
+    slow_page = "http://www.songkick.com/metro-areas/london?page=4"
+    event_listing = FakeAsyncEventListing(pages, delays={slow_page: 0.3}, event_loop=background_loop.event_loop)
+
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        results = list(executor.map(lambda _: list(event_listing.get_events("london", date.today())), range(5)))
+    # The thread that built the listing does not run the loop either
+    results.append(list(event_listing.get_events("london", date.today())))
+
+    assert [len(events) for events in results] == [5] * 6
+    assert time.time() - start < 1.5
+
+
+def test_services_without_cache_serve_the_scraper():
+    services = Services(logger=logging.getLogger("test"), redis_client=None)
+    try:
+        assert services.cached_event_listing is None
+        assert services.get_event_listing() is services.event_listing_no_cache
+    finally:
+        services.close()
+
+    assert services.background_loop.event_loop.is_closed()
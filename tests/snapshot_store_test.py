@@ -0,0 +1,97 @@
+import logging
+import time
+from datetime import date, timedelta
+
+import fakeredis
+import pytest
+
+from lndngigs.event_listing import CacheEntry, CachedEventListing
+from lndngigs.snapshot_store import SnapshotStore
+from tests.conftest import EventListingMock
+
+
+@pytest.fixture()
+def snapshot_store(tmp_path):
+    return SnapshotStore(str(tmp_path / "snapshot.db"))
+
+
+def get_cached_event_listing(event_listing, redis_client, snapshot_store):
+    return CachedEventListing(
+        logger=logging.getLogger("test"),
+        event_listing=event_listing,
+        redis_client=redis_client,
+        cache_key_prefix="test",
+        soft_ttl=timedelta(minutes=10),
+        snapshot_store=snapshot_store
+    )
+
+
+def test_snapshots_are_stored_and_pruned(snapshot_store, events):
+    yesterday = date.today() - timedelta(days=1)
+    snapshot_store.cache_events_bulk({("london", date.today()): events, ("london", yesterday): events}, cached_at=1234.5)
+
+    assert snapshot_store.get_events("london", date.today()) == (events, 1234.5)
+    assert snapshot_store.get_events("berlin", date.today()) is None
+    assert [key for key, _, _ in snapshot_store.get_all_events()] == [("london", date.today())]
+
+    assert snapshot_store.prune() == 1
+    assert snapshot_store.get_events("london", yesterday) is None
+
+
+def test_redis_misses_are_served_from_the_snapshot(snapshot_store, events, redis_client):
+    event_listing = EventListingMock(events)
+    cached_event_listing = get_cached_event_listing(event_listing, redis_client, snapshot_store)
+
+    assert list(cached_event_listing.get_events("london", date.today())) == events
+    redis_client.flushall()
+
+    entry = cached_event_listing.get_entry("london", date.today())
+    assert entry.status == CacheEntry.HIT
+    assert list(entry.events) == events
+    assert event_listing.crawls == 1
+
+
+def test_redis_outages_are_served_from_the_snapshot(snapshot_store, events):
+    server = fakeredis.FakeServer()
+    event_listing = EventListingMock(events)
+    cached_event_listing = get_cached_event_listing(event_listing, fakeredis.FakeRedis(server=server), snapshot_store)
+    list(cached_event_listing.get_events("london", date.today()))
+
+    server.connected = False
+
+    assert cached_event_listing.get_cached_response("london", date.today()) is None
+    assert list(cached_event_listing.get_events("london", date.today())) == events
+    assert cached_event_listing.get_events_bulk([("london", date.today())]) == {("london", date.today()): events}
+    # Not cached anywhere yet: crawled without a lease, and cached in the snapshot only
+    assert list(cached_event_listing.get_events("berlin", date.today())) == events
+    assert event_listing.crawls == 2
+    assert snapshot_store.get_events("berlin", date.today())[0] == events
+
+
+def test_listings_are_cached_in_the_snapshot_without_redis(snapshot_store, events, caplog):
+    event_listing = EventListingMock(events)
+    cached_event_listing = get_cached_event_listing(event_listing, None, snapshot_store)
+
+    assert list(cached_event_listing.get_events("london", date.today())) == events
+    assert list(cached_event_listing.get_events("london", date.today())) == events
+    assert cached_event_listing.get_cached_response("london", date.today()) is None
+    assert cached_event_listing.get_events_bulk([("london", date.today())]) == {("london", date.today()): events}
+    assert cached_event_listing.preload_snapshot() == 0
+    assert event_listing.crawls == 1
+    # Redis is not configured rather than unavailable
+    assert not [record for record in caplog.records if record.levelno >= logging.WARNING]
+
+
+def test_snapshot_preload_restores_missing_listings(snapshot_store, events, redis_client):
+    cached_at = time.time() - 60
+    snapshot_store.cache_events_bulk({("london", date.today()): events}, cached_at=cached_at)
+    cached_event_listing = get_cached_event_listing(EventListingMock(), redis_client, snapshot_store)
+
+    assert cached_event_listing.preload_snapshot() == 1
+    assert cached_event_listing.preload_snapshot() == 0
+
+    snapshot_store.cache_events_bulk({("london", date.today()): []})
+    entry = cached_event_listing.get_cached_entry("london", date.today())
+    assert list(entry.events) == events
+    assert entry.cached_at == cached_at
+    assert cached_event_listing.get_cached_response("london", date.today()).status == CacheEntry.HIT
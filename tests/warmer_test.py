@@ -0,0 +1,121 @@
+import asyncio
+import logging
+import time
+from datetime import date, timedelta
+
+import pytest
+
+from benchmarks.stub_server import StubServer
+from lndngigs.async_event_listing import HttpClient, UpstreamStatusError
+from lndngigs.event_listing import CachedEventListing
+from lndngigs.factories import get_async_event_listing
+from lndngigs.utils import Config
+from lndngigs.warmer import CacheWarmer, UpstreamBudget
+from tests.conftest import EventListingMock
+
+
+def build_warmer(redis_client, event_listing, http_client=None, requests_per_minute=100, days=1):
+    cached_event_listing = CachedEventListing(
+        logger=logging.getLogger("test"),
+        event_listing=event_listing,
+        redis_client=redis_client,
+        cache_key_prefix="test",
+        delta_refresh=False
+    )
+    warmer = CacheWarmer(
+        logger=logging.getLogger("test"),
+        cached_event_listing=cached_event_listing,
+        http_client=http_client or HttpClient(),
+        budget=UpstreamBudget(redis_client, requests_per_minute=requests_per_minute, key_prefix="test-budget"),
+        days=days
+    )
+    return warmer, cached_event_listing
+
+
+def test_popular_locations_and_closest_dates_are_refreshed_first(redis_client):
+    warmer, cached_event_listing = build_warmer(redis_client, EventListingMock())
+    redis_client.zincrby(cached_event_listing.popularity_key_name, 10, "24475-uk-manchester")
+    redis_client.zincrby(cached_event_listing.popularity_key_name, 5, "24426-uk-london")
+
+    due_keys = warmer.get_due_keys()
+
+    today, tomorrow = date.today(), date.today() + timedelta(days=1)
+    assert due_keys[:4] == [
+        ("24475-uk-manchester", today),
+        ("24475-uk-manchester", tomorrow),
+        ("24426-uk-london", today),
+        ("24426-uk-london", tomorrow),
+    ]
+    assert len(due_keys) == len(warmer.get_keys())
+
+
+def test_recently_refreshed_keys_are_not_due(redis_client):
+    warmer, cached_event_listing = build_warmer(redis_client, EventListingMock())
+    today = date.today()
+    cached_event_listing.cache_events("24426-uk-london", today, [])
+
+    due_keys = warmer.get_due_keys()
+
+    assert ("24426-uk-london", today) not in due_keys
+    assert ("24426-uk-london", today + timedelta(days=1)) in due_keys
+
+
+def test_refreshed_at_of_past_days_is_pruned(redis_client):
+    warmer, cached_event_listing = build_warmer(redis_client, EventListingMock(), days=0)
+    yesterday = date.today() - timedelta(days=1)
+    cached_event_listing.cache_events("24426-uk-london", yesterday, [])
+    cached_event_listing.cache_events("24426-uk-london", date.today(), [])
+
+    warmer.run_once()
+
+    assert set(cached_event_listing.get_refreshed_at()) == {
+        cached_event_listing.get_cache_key_name(location, date.today()) for location, _ in warmer.get_keys()
+    }
+
+
+def test_failed_keys_are_not_retried_straight_away(redis_client):
+    event_listing = EventListingMock(failures=1000)
+    warmer, _ = build_warmer(redis_client, event_listing, days=0)
+
+    assert warmer.run_once() == 0
+    assert len(event_listing.crawled) == len(warmer.get_keys())
+    assert warmer.get_due_keys() == []
+
+    assert warmer.run_once() == 0
+    assert len(event_listing.crawled) == len(warmer.get_keys())
+
+
+def test_every_upstream_request_is_charged_to_the_budget(redis_client):
+    http_client = HttpClient(retries=2, retry_backoff=0.01)
+    warmer, _ = build_warmer(redis_client, EventListingMock(), http_client=http_client, requests_per_minute=10)
+
+    async def fetch():
+        async with StubServer(latency=0, failing_paths=["/down"]) as server:
+            try:
+                await http_client.fetch_page(server.base_url)
+                with pytest.raises(UpstreamStatusError):
+                    await http_client.fetch_page(server.base_url + "/down")
+            finally:
+                await http_client.close()
+
+    asyncio.run(fetch())
+
+    # One request, then one request and two retries
+    assert UpstreamBudget(redis_client, requests_per_minute=10, key_prefix="test-budget").remaining() == 6
+
+
+def test_requests_over_budget_are_refused(redis_client):
+    budget = UpstreamBudget(redis_client, requests_per_minute=2, key_prefix="test-budget")
+    if 60 - time.time() % 60 < 1:
+        time.sleep(1)
+
+    assert budget.try_spend()
+    assert budget.try_spend()
+    assert not budget.try_spend()
+    assert budget.remaining() <= 0
+
+
+def test_warmer_crawls_have_no_deadline():
+    # They may have to wait for the next budget window half way through
+    assert get_async_event_listing(logging.getLogger("test"), crawl_deadline=False)._crawl_timeout is None
+    assert get_async_event_listing(logging.getLogger("test"))._crawl_timeout == Config().CRAWL_TIMEOUT
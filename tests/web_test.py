@@ -0,0 +1,146 @@
+import json
+import logging
+from datetime import date, timedelta
+
+import fakeredis
+import pytest
+
+import lndngigs.factories
+from lndngigs.factories import get_cached_event_listing
+from lndngigs.web import build_app
+
+
+@pytest.fixture(autouse=True)
+def no_local_cache(monkeypatch):
+    # The local cache is shared by the whole process, it would leak entries across tests
+    monkeypatch.setenv("LOCAL_CACHE_SIZE", "0")
+    monkeypatch.setattr(lndngigs.factories, "_local_cache", None)
+
+
+@pytest.fixture()
+def app(redis_client):
+    app = build_app(logger=logging.getLogger("test"), redis_client=redis_client)
+    yield app
+    app.extensions["lndngigs"].close()
+
+
+@pytest.fixture()
+def client(app):
+    return app.test_client()
+
+
+# `/gigs/london/today` is redirected to `/gigs`, which defaults to it
+GIGS_PATH = "/gigs/london/{}".format(date.today().isoformat())
+
+
+def cache_events(redis_client, events, events_date=None):
+    get_cached_event_listing(logging.getLogger("test"), None, redis_client).cache_events(
+        "24426-uk-london", events_date or date.today(), events
+    )
+
+
+def test_index_endpoint(client):
+    response = client.get("/")
+    assert response.status_code == 200
+    assert response.get_data(as_text=True) == "Hello from lndnGigs!"
+
+
+def test_gigs_endpoint_validates_location_and_date(client):
+    response = client.get("/gigs/atlantis/today")
+    assert response.status_code == 406
+    assert response.get_json()["error"].startswith("Invalid location")
+
+    response = client.get("/gigs/london/yesterday")
+    assert response.status_code == 406
+    assert response.get_json()["error"].startswith("Invalid date")
+
+
+def test_gigs_endpoint_serves_cached_responses_and_counts_them(app, client, redis_client, event):
+    cache_events(redis_client, [event])
+
+    for _ in range(10):
+        response = client.get(GIGS_PATH)
+        assert response.status_code == 200
+        assert response.headers["X-Cache"] == "HIT"
+        assert response.get_json() == {"gigs": [event.to_dict()]}
+
+    assert app.extensions["lndngigs"].cached_event_listing.get_popularity() == {"24426-uk-london": 10.0}
+
+
+def test_gigs_endpoint_serves_compressed_body_and_not_modified(client, redis_client, event):
+    cache_events(redis_client, [event])
+
+    response = client.get(GIGS_PATH, headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["Content-Encoding"] == "gzip"
+
+    not_modified = client.get(GIGS_PATH, headers={"If-None-Match": response.headers["ETag"]})
+    assert not_modified.status_code == 304
+    assert not_modified.headers["ETag"] == response.headers["ETag"]
+
+
+def test_gigs_endpoint_streams_ndjson(client, redis_client, event):
+    cache_events(redis_client, [event, event])
+
+    response = client.get(GIGS_PATH + "?format=ndjson")
+
+    assert response.status_code == 200
+    assert response.headers["Content-Type"] == "application/x-ndjson"
+    assert [json.loads(line) for line in response.get_data(as_text=True).splitlines()] == [event.to_dict()] * 2
+
+
+def test_bulk_gigs_endpoint_serves_cached_days(client, redis_client, event):
+    tomorrow = date.today() + timedelta(days=1)
+    cache_events(redis_client, [event])
+    cache_events(redis_client, [], events_date=tomorrow)
+
+    response = client.get("/gigs/london?from=today&to=tomorrow")
+
+    assert response.status_code == 200
+    assert response.get_json() == {
+        "gigs": {"london": {date.today().isoformat(): [event.to_dict()], tomorrow.isoformat(): []}}
+    }
+
+    response = client.get("/gigs/london?from=tomorrow&to=today")
+    assert response.status_code == 406
+
+
+def test_artist_and_venue_endpoints_serve_indexed_events(client, redis_client, event):
+    cache_events(redis_client, [event])
+
+    for path in ("/artists/radiohead/gigs", "/artists/1-radiohead/gigs", "/venues/1-roundhouse/gigs"):
+        response = client.get(path)
+        assert response.status_code == 200
+        assert response.get_json() == {"gigs": [dict(event.to_dict(), location="london")]}
+
+    assert client.get("/artists/blur/gigs").get_json() == {"gigs": []}
+
+
+def test_metrics_endpoint_exposes_request_latency(client, redis_client, event):
+    cache_events(redis_client, [event])
+    client.get(GIGS_PATH)
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert 'lndngigs_request_seconds_count{handler="gigs",status="200"}' in response.get_data(as_text=True)
+    assert 'lndngigs_cache_requests_total{location="24426-uk-london",status="HIT"}' in response.get_data(as_text=True)
+
+
+def test_app_starts_and_serves_the_snapshot_while_redis_is_down(monkeypatch, tmp_path, event):
+    monkeypatch.setenv("SNAPSHOT_PATH", str(tmp_path / "snapshot.db"))
+    monkeypatch.setenv("LOCAL_CACHE_SIZE", "16")
+    monkeypatch.setattr(lndngigs.factories, "_snapshot_store", None)
+    lndngigs.factories.get_snapshot_store().cache_events_bulk({("24426-uk-london", date.today()): [event]})
+    server = fakeredis.FakeServer()
+    server.connected = False
+
+    app = build_app(logger=logging.getLogger("test"), redis_client=fakeredis.FakeRedis(server=server))
+    try:
+        response = app.test_client().get(GIGS_PATH)
+        assert response.status_code == 200
+        assert response.get_json() == {"gigs": [event.to_dict()]}
+        assert not lndngigs.factories._local_cache._listener.subscribed
+    finally:
+        lndngigs.factories._local_cache.stop_listening()
+        app.extensions["lndngigs"].close()